@@ -0,0 +1,41 @@
+"""
+本物の JMA 予報 / 警報 / AMeDAS の応答を bench/fixtures/ に保存する
+（スタンドインサーバーは fixtures にあるものを優先して返す）
+
+    python bench/record_fixtures.py
+"""
+import os
+import sys
+import urllib.request
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import main  # noqa: E402
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+
+def record(url, *parts):
+    path = os.path.join(FIXTURE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with urllib.request.urlopen(url, timeout=15) as res:
+            body = res.read()
+        with open(path, "wb") as f:
+            f.write(body)
+        print(f"OK {url}", flush=True)
+    except Exception as e:
+        print(f"NG {url}: {e}", flush=True)
+
+
+if __name__ == "__main__":
+    now = datetime.now(main.JST)
+    for code in main.group_areas_by(main.TARGET_AREAS, "jma_code"):
+        record(f"https://www.jma.go.jp/bosai/forecast/data/forecast/{code}.json", "forecast", f"{code}.json")
+        record(f"https://www.jma.go.jp/bosai/warning/data/warning/{code}.json", "warning", f"{code}.json")
+    for code in main.group_areas_by(main.TARGET_AREAS, "amedas_code"):
+        for url, _ in main.amedas_block_urls(code, now):
+            hh = url.rsplit("_", 1)[1].split(".")[0]
+            record(url.replace(main.JMA_BASE_URL, "https://www.jma.go.jp"), "amedas", f"{code}_{hh}.json")
@@ -0,0 +1,211 @@
+"""
+オフライン・ベンチマーク
+
+ローカルのスタンドインサーバー（bench/standin_server.py）を立て、main.py の接続先をそこへ向けて
+31 / 300 / 3000 エリア（合成）で run_pipeline → write_outputs を実行し、
+実行時間・エンドポイント別リクエスト数・新規TCP接続数・ピークRSS を表にする。
+
+    python bench/run_bench.py
+    python bench/run_bench.py --areas 31 300 --gemini-latency-ms 1500 --gemini-429-rate 0.1
+    python bench/run_bench.py --report bench_output.txt   # 結果をJSONでも保存
+    python bench/run_bench.py --areas 31 --incremental    # 同じ入力で --incremental 再実行し、全日再利用されるか確認
+
+各規模は別プロセスで実行する（ピークRSSを規模ごとに測るため）。
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import standin_server  # noqa: E402
+
+
+def synthetic_areas(base_areas, n):
+    """
+    実エリアを元に n 件の合成エリアを作る
+    予報区/観測所コードは元のまま使い回す（共有取得の効き方を実運用に近づける）
+    """
+    items = list(base_areas.items())
+    out = {}
+    for i in range(n):
+        key, data = items[i % len(items)]
+        rep = i // len(items)
+        area = dict(data)
+        if rep:
+            key = f"{key}_{rep}"
+            area["name"] = f"{data['name']} #{rep}"
+            area["lat"] = round(data["lat"] + 0.01 * rep, 4)
+            area["lon"] = round(data["lon"] + 0.01 * rep, 4)
+        out[key] = area
+    return out
+
+
+def run_worker(n_areas, out_dir, result_file, gemini_rpm, gemini_tpm, incremental=False):
+    """
+    子プロセス側: main を import して1規模ぶん実行し、結果をJSONで書く
+    incremental: 1回目の出力とフィンガープリントを使って --incremental 相当でもう1回実行し、再利用日数を数える
+    """
+    import resource
+
+    sys.path.insert(0, REPO_ROOT)
+    import main
+
+    main.TARGET_AREAS = synthetic_areas(main.TARGET_AREAS, n_areas)
+    main.OUTPUT_PATH = os.path.join(out_dir, "eagle_eye_data.json")
+    main.OUTPUT_V2_PATH = os.path.join(out_dir, "eagle_eye_data.v2.json")
+    main.OUTPUT_SHARD_DIR = os.path.join(out_dir, "areas")
+    main.FINGERPRINT_PATH = os.path.join(out_dir, "eagle_eye_data.fingerprints.json")
+    main.GEMINI_CACHE_ENABLED = False
+    main.HTTP_CACHE = main.HttpCache(os.path.join(out_dir, "http"), main.HTTP_CACHE_MAX_AGE)  # 毎回コールド
+    main.GEMINI_CLIENT = main.GeminiClient(gemini_rpm, gemini_tpm, main.GEMINI_CONCURRENCY)
+    main.INCREMENTAL_STORE = main.IncrementalStore((main.OUTPUT_V2_PATH, main.OUTPUT_PATH), main.FINGERPRINT_PATH, reuse=False) if incremental else None
+
+    def run_once():
+        # main と同じく、エリアが終わるたびに書き進める
+        writer = main.OutputWriter()
+        ai_days = 0
+
+        def on_area(area_key, days):
+            nonlocal ai_days
+            ai_days += sum(1 for d in days if not d.get("is_long_term"))
+            writer.add(area_key, days)
+
+        t0 = time.perf_counter()
+        master_data = asyncio.run(main.run_pipeline(main.TARGET_AREAS, on_area=on_area))
+        t_pipeline = time.perf_counter() - t0
+        written = writer.finish([k for k in main.TARGET_AREAS if k in writer])
+        return master_data, ai_days, written, t_pipeline, time.perf_counter() - t0
+
+    master_data, ai_days, written, t_pipeline, wall = run_once()
+
+    rerun = None
+    if incremental:
+        main.INCREMENTAL_STORE.save()
+        recorded = sum(len(v) for v in json.load(open(main.FINGERPRINT_PATH, encoding="utf-8"))["areas"].values())
+        main.INCREMENTAL_STORE = main.IncrementalStore((main.OUTPUT_V2_PATH, main.OUTPUT_PATH), main.FINGERPRINT_PATH, reuse=True)
+        _, _, _, _, rerun_wall = run_once()
+        rerun = {
+            "wall_sec": round(rerun_wall, 3),
+            "fingerprints": recorded,
+            "reused": main.INCREMENTAL_STORE.reused,
+            "missing": main.INCREMENTAL_STORE.missing,
+        }
+
+    report = main.METRICS.report()
+    result = {
+        "areas": n_areas,
+        "areas_ok": len(master_data),
+        "ai_days": ai_days,
+        "wall_sec": round(wall, 3),
+        "pipeline_sec": round(t_pipeline, 3),
+        "write_sec": round(wall - t_pipeline, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "output_bytes": {os.path.basename(p): os.path.getsize(p) for p in written if os.path.isfile(p)},
+        "stages": report["stages"],
+        "counters": report["counters"],
+        "incremental": rerun,
+    }
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def _http_json(base_url, path, method="GET"):
+    import urllib.request
+    req = urllib.request.Request(base_url + path, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(req, timeout=10) as res:
+        return json.loads(res.read().decode("utf-8"))
+
+
+def run_scale(n_areas, base_url, args):
+    """親プロセス側: 1規模ぶんの子プロセスを起動し、結果とサーバー側の集計をまとめる"""
+    _http_json(base_url, "/__reset", method="POST")
+    env = dict(os.environ)
+    env.update({
+        "EAGLE_EYE_JMA_BASE_URL": base_url,
+        "EAGLE_EYE_OPENMETEO_BASE_URL": base_url,
+        "EAGLE_EYE_GEMINI_BASE_URL": base_url,
+        "GEMINI_API_KEY": "bench",
+    })
+    with tempfile.TemporaryDirectory() as out_dir:
+        result_file = os.path.join(out_dir, "result.json")
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker", str(n_areas),
+            "--out-dir", out_dir, "--result-file", result_file,
+            "--gemini-rpm", str(args.gemini_rpm), "--gemini-tpm", str(args.gemini_tpm),
+        ] + (["--incremental"] if args.incremental else [])
+        log = None if args.verbose else subprocess.DEVNULL
+        proc = subprocess.run(cmd, env=env, stdout=log, stderr=subprocess.STDOUT if log is not None else None)
+        if proc.returncode != 0 or not os.path.exists(result_file):
+            return {"areas": n_areas, "error": f"worker exit {proc.returncode}"}
+        with open(result_file, "r", encoding="utf-8") as f:
+            result = json.load(f)
+
+    result.update(_http_json(base_url, "/__stats"))
+    return result
+
+
+def print_table(results):
+    cols = standin_server.ENDPOINTS
+    header = f"{'areas':>6} {'wall[s]':>9} {'rss[MB]':>8} {'ai_days':>8} {'conns':>6} {'ttft_p50':>8} {'aborted':>7} " + " ".join(f"{c:>13}" for c in cols)
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if "error" in r:
+            print(f"{r['areas']:>6} {r['error']}")
+            continue
+        reqs = r.get("requests", {})
+        ttft = (r["stages"].get("gemini_ttft") or {}).get("p50")
+        print(
+            f"{r['areas']:>6} {r['wall_sec']:>9.2f} {r['peak_rss_mb']:>8.1f} {r['ai_days']:>8} {r.get('connections', 0):>6} "
+            f"{ttft if ttft is not None else '-':>8} {r['counters'].get('gemini_stream_aborted', 0):>7} "
+            + " ".join(f"{reqs.get(c, 0):>13}" for c in cols)
+        )
+    for r in results:
+        inc = r.get("incremental")
+        if inc:
+            # 入力が同じなので、記録したフィンガープリントの日はすべて再利用されるはず
+            ok = inc["reused"] == inc["fingerprints"] and not inc["missing"]
+            mark = "OK" if ok else f"NG (missing {inc['missing']})"
+            print(f"{r['areas']:>6} incremental rerun: {inc['wall_sec']:.2f}s, reused {inc['reused']}/{inc['fingerprints']} days {mark}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eagle Eye offline benchmark")
+    parser.add_argument("--areas", type=int, nargs="+", default=[31, 300, 3000])
+    parser.add_argument("--gemini-rpm", type=float, default=1_000_000, help="ベンチ中の Gemini RPM 上限（既定は実質無制限）")
+    parser.add_argument("--gemini-tpm", type=float, default=1_000_000_000)
+    parser.add_argument("--report", help="結果をJSONで保存するパス")
+    parser.add_argument("--verbose", action="store_true", help="子プロセスのログを表示")
+    parser.add_argument("--incremental", action="store_true", help="同じ入力で差分再実行し、前回のAIレコードが全日再利用されるか確認")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    standin_server.add_config_args(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.out_dir, args.result_file, args.gemini_rpm, args.gemini_tpm, args.incremental)
+        sys.exit(0)
+
+    server, _, base_url = standin_server.start_server(standin_server.config_from_args(args))
+    print(f"stand-in: {base_url}", flush=True)
+    results = []
+    try:
+        for n in args.areas:
+            print(f"▶ {n} areas ...", flush=True)
+            results.append(run_scale(n, base_url, args))
+    finally:
+        server.shutdown()
+
+    print_table(results)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,466 @@
+"""
+JMA / AMeDAS / Open-Meteo / Gemini のローカル・スタンドインサーバー（ベンチマーク用）
+
+- bench/fixtures/ に録画済みJSONがあればそれを返す（bench/record_fixtures.py で作成）
+- 無ければ本物と同じ形の合成データを返す
+- エンドポイントごとに 遅延 / 500エラー率 / 429率（Retry-After付き）を設定できる
+- Gemini は generateContent と streamGenerateContent（alt=sse）の両方。形の崩れた生成を混ぜる率も設定できる
+- GET /__stats でエンドポイント別のリクエスト数・ステータス数、POST /__reset で0に戻す
+
+単体起動:
+    python bench/standin_server.py --port 8765 --gemini-latency-ms 800 --gemini-429-rate 0.05
+"""
+import os
+import re
+import json
+import hashlib
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+JST = timezone(timedelta(hours=9), "JST")
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+ENDPOINTS = ["jma_forecast", "jma_warning", "amedas", "openmeteo", "gemini_search", "gemini_json"]
+STREAM_CHUNK_CHARS = 200   # streamGenerateContent の1イベントあたりの文字数
+STREAM_TTFT_SHARE = 0.2    # ストリーミング時、遅延のうち最初のイベントまでにかける割合（残りはイベント間に均等）
+
+
+class StandinConfig:
+    """エンドポイント別の遅延(ms) / エラー率 / 429率、JSON生成の崩れ率"""
+    def __init__(self, latency_ms=None, error_rate=None, rate_429=None, retry_after=1, bad_json_rate=0.0):
+        self.latency_ms = {k: 0 for k in ENDPOINTS}
+        self.error_rate = {k: 0.0 for k in ENDPOINTS}
+        self.rate_429 = {k: 0.0 for k in ENDPOINTS}
+        self.latency_ms.update(latency_ms or {})
+        self.error_rate.update(error_rate or {})
+        self.rate_429.update(rate_429 or {})
+        self.retry_after = retry_after
+        self.bad_json_rate = bad_json_rate
+
+
+class StandinStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {k: 0 for k in ENDPOINTS}
+            self.statuses = {k: {} for k in ENDPOINTS}
+            self.connections = 0
+
+    def count(self, endpoint, status):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            by_status = self.statuses.setdefault(endpoint, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    def connect(self):
+        with self._lock:
+            self.connections += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "statuses": {k: dict(v) for k, v in self.statuses.items()},
+                "connections": self.connections,
+            }
+
+
+# =========================
+# 合成データ（本物と同じ形）
+# =========================
+def _fixture(*parts):
+    path = os.path.join(FIXTURE_DIR, *parts)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _seed(*keys):
+    return random.Random("|".join(str(k) for k in keys))
+
+
+def synth_jma_forecast(code):
+    rnd = _seed("jma", code)
+    today = datetime.now(JST).replace(hour=0, minute=0, second=0, microsecond=0)
+    days3 = [today + timedelta(days=i) for i in range(3)]
+    days7 = [today + timedelta(days=i) for i in range(1, 8)]
+    six_h = [today + timedelta(hours=6 * i) for i in range(12)]
+    temps_t = [today + timedelta(days=i // 2, hours=9 if i % 2 == 0 else 0) for i in range(4)]
+    fmt = lambda d: d.strftime("%Y-%m-%dT%H:%M:%S+09:00")
+    codes = [100, 101, 200, 201, 300, 313, 400]
+    return [
+        {
+            "timeSeries": [
+                {"timeDefines": [fmt(d) for d in days3], "areas": [{"weatherCodes": [str(rnd.choice(codes)) for _ in days3]}]},
+                {"timeDefines": [fmt(d) for d in six_h], "areas": [{"pops": [str(rnd.randrange(0, 101, 10)) for _ in six_h]}]},
+                {"timeDefines": [fmt(d) for d in temps_t], "areas": [{"temps": [str(rnd.randint(-5, 30)) for _ in temps_t]}]},
+            ]
+        },
+        {
+            "timeSeries": [
+                {
+                    "timeDefines": [fmt(d) for d in days7],
+                    "areas": [{
+                        "weatherCodes": [str(rnd.choice(codes)) for _ in days7],
+                        "pops": [str(rnd.randrange(0, 101, 10)) for _ in days7],
+                    }],
+                },
+                {
+                    "timeDefines": [fmt(d) for d in days7],
+                    "areas": [{
+                        "tempsMin": [str(rnd.randint(-5, 15)) for _ in days7],
+                        "tempsMax": [str(rnd.randint(10, 30)) for _ in days7],
+                    }],
+                },
+            ]
+        },
+    ]
+
+
+def synth_jma_warning(code):
+    rnd = _seed("warning", code)
+    status = "発表" if rnd.random() < 0.2 else "発表なし"
+    return {"warnings": [{"code": "10", "status": status}]}
+
+
+def synth_amedas(code, date_str, block_hour):
+    """3時間ブロック（block_hour〜+2時、現在時刻まで）"""
+    rnd = _seed("amedas", code, date_str, block_hour)
+    now = datetime.now(JST)
+    last = min(block_hour + 2, now.hour) if date_str == now.strftime("%Y%m%d") else block_hour + 2
+    out = {}
+    for h in range(block_hour, last + 1):
+        out[f"{date_str}{h:02d}0000"] = {"temp": [round(rnd.uniform(-5, 30), 1), 0]}
+    return out
+
+
+def synth_openmeteo_one(lat, lon, days):
+    rnd = _seed("om", lat, lon)
+    start = datetime.now(JST).replace(hour=0, minute=0, second=0, microsecond=0)
+    hours = [start + timedelta(hours=i) for i in range(24 * days)]
+    return {
+        "latitude": float(lat),
+        "longitude": float(lon),
+        "timezone": "Asia/Tokyo",
+        "hourly": {
+            "time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+            "temperature_2m": [round(rnd.uniform(-5, 30), 1) for _ in hours],
+            "relative_humidity_2m": [rnd.randint(30, 100) for _ in hours],
+            "precipitation_probability": [rnd.randrange(0, 101, 5) for _ in hours],
+            "weathercode": [rnd.choice([0, 1, 2, 3, 45, 61, 63, 71, 80, 95]) for _ in hours],
+        },
+    }
+
+
+def _canned_day():
+    """AI_DAY_RESPONSE_SCHEMA と同じ形（date / is_long_term は main 側で入れる）"""
+    jobs = ["taxi", "delivery", "restaurant", "retail", "hotel"]
+    return {
+        "rank": "B",
+        "event_traffic_facts": ["（スタンドイン）特段の情報なし"],
+        "peak_windows": {k: "17-21" for k in jobs},
+        "job_actions": {k: "（スタンドイン）天候と交通を見て配置を調整" for k in jobs},
+        "daily_schedule_and_impact": "■Event & Traffic\n（スタンドイン）\n\n■総括\n（スタンドイン）",
+        "timeline": {s: {"advice": {k: "（スタンドイン）" for k in jobs}} for s in ["morning", "daytime", "night"]},
+        "confidence": 50,
+    }
+
+
+def synth_gemini(payload):
+    """プロンプトの中身から、呼び出し元が期待する形の応答テキストを作る"""
+    prompt = ""
+    for content in payload.get("contents", []):
+        for part in content.get("parts", []):
+            prompt += part.get("text", "")
+    is_search = any("googleSearch" in t for t in payload.get("tools", []))
+
+    if is_search:
+        dates = re.findall(r"\d{4}-\d{2}-\d{2}", prompt)
+        text = "\n".join(f"{d}\n- （スタンドイン）交通: 平常運転" for d in dict.fromkeys(dates)) or "（スタンドイン）長期傾向: 平年並み"
+        return "gemini_search", text
+
+    batch_dates = re.findall(r"=== (\d{4}-\d{2}-\d{2}) ===", prompt)
+    if batch_dates:
+        return "gemini_json", json.dumps([_canned_day() for _ in batch_dates], ensure_ascii=False)
+    if "Event/Traffic要約" in prompt:
+        dates = list(dict.fromkeys(re.findall(r"\d{4}-\d{2}-\d{2}", prompt)))
+        return "gemini_json", json.dumps({d: "- （スタンドイン）交通: 平常運転" for d in dates}, ensure_ascii=False)
+    return "gemini_json", json.dumps(_canned_day(), ensure_ascii=False)
+
+
+def bad_generation(text):
+    """形の崩れた生成を作る（前置きの文章 / timeline 抜け）"""
+    if random.random() < 0.5:
+        return "以下がご要望のJSONです。\n" + text
+    data = json.loads(text)
+    day = data[0] if isinstance(data, list) and data else data
+    if isinstance(day, dict):
+        day.pop("timeline", None)
+    return json.dumps(data, ensure_ascii=False)
+
+
+# =========================
+# HTTP
+# =========================
+def make_handler(config, stats):
+    contexts = {}   # cachedContents の名前 → systemInstruction のテキスト
+    contexts_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            # 新しいTCP接続ごとに1回（keep-alive で使い回された分は数えない）
+            stats.connect()
+            super().setup()
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, endpoint, status, body, headers=None):
+            stats.count(endpoint, status)
+            data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_cacheable(self, endpoint, body):
+            """ETag をつけて返す。If-None-Match が一致すれば 304（本文なし）"""
+            data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+            etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                stats.count(endpoint, 304)
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send(endpoint, 200, data, {"ETag": etag})
+
+        def _send_stream(self, endpoint, text, usage, seconds):
+            """text を SSE のイベントに分けて chunked で返す（イベント間に seconds を均等に置く。usage は最後のイベント）"""
+            stats.count(endpoint, 200)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+            try:
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(seconds / (len(pieces) - 1))
+                    event = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                    if i == len(pieces) - 1:
+                        event["usageMetadata"] = usage
+                    data = b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\r\n\r\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # クライアントが途中で打ち切った
+                self.close_connection = True
+
+        def _simulate(self, endpoint, latency_share=1.0):
+            """遅延（の latency_share ぶん）をかけ、設定された確率で 429 / 500 を返す。返したら True"""
+            latency = config.latency_ms.get(endpoint, 0) * latency_share
+            if latency:
+                time.sleep(latency / 1000.0 * random.uniform(0.8, 1.2))
+            r = random.random()
+            if r < config.rate_429.get(endpoint, 0.0):
+                self._send(endpoint, 429, {"error": {"code": 429}}, {"Retry-After": str(config.retry_after)})
+                return True
+            if r < config.rate_429.get(endpoint, 0.0) + config.error_rate.get(endpoint, 0.0):
+                self._send(endpoint, 500, {"error": {"code": 500}})
+                return True
+            return False
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = url.path
+
+            if path == "/__stats":
+                body = json.dumps(stats.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            m = re.match(r"^/bosai/forecast/data/forecast/(\w+)\.json$", path)
+            if m:
+                if self._simulate("jma_forecast"):
+                    return
+                code = m.group(1)
+                body = _fixture("forecast", f"{code}.json") or synth_jma_forecast(code)
+                self._send_cacheable("jma_forecast", body)
+                return
+
+            m = re.match(r"^/bosai/warning/data/warning/(\w+)\.json$", path)
+            if m:
+                if self._simulate("jma_warning"):
+                    return
+                code = m.group(1)
+                body = _fixture("warning", f"{code}.json") or synth_jma_warning(code)
+                self._send_cacheable("jma_warning", body)
+                return
+
+            m = re.match(r"^/bosai/amedas/data/point/(\w+)/(\d{8})_(\d{2})\.json$", path)
+            if m:
+                if self._simulate("amedas"):
+                    return
+                code, date_str, hh = m.group(1), m.group(2), m.group(3)
+                body = _fixture("amedas", f"{code}_{hh}.json") or synth_amedas(code, date_str, int(hh))
+                self._send_cacheable("amedas", body)
+                return
+
+            if path == "/v1/forecast":
+                if self._simulate("openmeteo"):
+                    return
+                q = parse_qs(url.query)
+                lats = q.get("latitude", [""])[0].split(",")
+                lons = q.get("longitude", [""])[0].split(",")
+                days = int(q.get("forecast_days", ["7"])[0])
+                items = [synth_openmeteo_one(la, lo, days) for la, lo in zip(lats, lons)]
+                self._send_cacheable("openmeteo", items if len(items) > 1 else items[0])
+                return
+
+            self._send("unknown", 404, {"error": "not found"})
+
+        def do_DELETE(self):
+            m = re.match(r"^/v1beta/(cachedContents/[^?]+)", self.path)
+            if m:
+                with contexts_lock:
+                    contexts.pop(m.group(1), None)
+                self._send("gemini_context", 200, {})
+                return
+            self._send("unknown", 404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+
+            if self.path == "/__reset":
+                stats.reset()
+                self._send("unknown", 200, {"ok": True})
+                return
+
+            if re.match(r"^/v1beta/cachedContents", self.path):
+                try:
+                    payload = json.loads(raw.decode("utf-8"))
+                    text = payload["systemInstruction"]["parts"][0]["text"]
+                except (ValueError, KeyError, IndexError):
+                    self._send("gemini_context", 400, {"error": {"code": 400}})
+                    return
+                name = "cachedContents/" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+                with contexts_lock:
+                    contexts[name] = text
+                self._send("gemini_context", 200, {"name": name, "model": payload.get("model")})
+                return
+
+            m = re.match(r"^/v1beta/models/[^/:]+:(generateContent|streamGenerateContent)", self.path)
+            if m:
+                streaming = m.group(1) == "streamGenerateContent"
+                try:
+                    payload = json.loads(raw.decode("utf-8"))
+                except ValueError:
+                    self._send("gemini_json", 400, {"error": {"code": 400}})
+                    return
+                cached_tokens = 0
+                if payload.get("cachedContent"):
+                    with contexts_lock:
+                        context = contexts.get(payload["cachedContent"])
+                    if context is None:
+                        self._send("gemini_json", 404, {"error": {"code": 404}})
+                        return
+                    cached_tokens = len(context.encode("utf-8")) // 3
+                endpoint, text = synth_gemini(payload)
+                if endpoint == "gemini_json" and random.random() < config.bad_json_rate:
+                    text = bad_generation(text)
+                if self._simulate(endpoint, STREAM_TTFT_SHARE if streaming else 1.0):
+                    return
+                # promptTokenCount は cachedContent の分も含む（本物と同じ）
+                prompt_tokens = len(raw) // 3 + cached_tokens
+                usage = {
+                    "promptTokenCount": prompt_tokens,
+                    "cachedContentTokenCount": cached_tokens,
+                    "candidatesTokenCount": len(text) // 2,
+                    "totalTokenCount": prompt_tokens + len(text) // 2,
+                }
+                if streaming:
+                    rest = config.latency_ms.get(endpoint, 0) * (1.0 - STREAM_TTFT_SHARE) / 1000.0
+                    self._send_stream(endpoint, text, usage, rest)
+                    return
+                self._send(endpoint, 200, {"candidates": [{"content": {"parts": [{"text": text}]}}], "usageMetadata": usage})
+                return
+
+            self._send("unknown", 404, {"error": "not found"})
+
+    return Handler
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """別スレッドでサーバーを起動して (server, stats, base_url) を返す"""
+    stats = StandinStats()
+    server = ThreadingHTTPServer((host, port), make_handler(config or StandinConfig(), stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, stats, base_url
+
+
+def add_config_args(parser):
+    for ep, default_ms in [("jma", 50), ("openmeteo", 150), ("gemini", 600)]:
+        parser.add_argument(f"--{ep}-latency-ms", type=float, default=default_ms)
+        parser.add_argument(f"--{ep}-error-rate", type=float, default=0.0)
+        parser.add_argument(f"--{ep}-429-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--gemini-bad-json-rate", type=float, default=0.0, help="JSON生成を崩す率（前置きの文章 / timeline 抜け）")
+
+
+def config_from_args(args):
+    def per_endpoint(attr):
+        jma = getattr(args, f"jma_{attr}")
+        om = getattr(args, f"openmeteo_{attr}")
+        gm = getattr(args, f"gemini_{attr}")
+        return {
+            "jma_forecast": jma, "jma_warning": jma, "amedas": jma,
+            "openmeteo": om,
+            "gemini_search": gm, "gemini_json": gm,
+        }
+    return StandinConfig(
+        latency_ms=per_endpoint("latency_ms"),
+        error_rate=per_endpoint("error_rate"),
+        rate_429=per_endpoint("429_rate"),
+        retry_after=args.retry_after,
+        bad_json_rate=args.gemini_bad_json_rate,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eagle Eye stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(config_from_args(args), args.host, args.port)
+    print(f"stand-in: {base_url}", flush=True)
+    print(f"  EAGLE_EYE_JMA_BASE_URL={base_url} EAGLE_EYE_OPENMETEO_BASE_URL={base_url} EAGLE_EYE_GEMINI_BASE_URL={base_url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -4,7 +4,8 @@ import 'package:flutter/services.dart' show rootBundle;
 
 /// ===============================
 /// Eagle Eye - main.dart
-/// - assets/eagle_eye_data.json を読み込み
+/// - assets/areas/manifest.json があれば選択中のエリアのシャードだけ読み込み
+///   （無ければ assets/eagle_eye_data.v2.json → assets/eagle_eye_data.json）
 /// - 職業選択で「ピーク」「打ち手」「時間帯アドバイス」を切替
 /// ===============================
 
@@ -158,6 +159,62 @@ class ForecastDay {
     );
   }
 
+  /// v2 の長期日 ["01月27日 (火)", "B"(, long_term_rules の番号)] を、main.py の expand_long_term_day と同じ中身に展開
+  factory ForecastDay.longTerm(String date, String rank, String longTermText, [Map? rule]) {
+    final dateDisplay = date.split(' ').first;
+    final emptyJobs = {for (final j in kJobs) j.key: ''};
+    if (rule != null) {
+      final advice = (rule['timeline'] is Map) ? rule['timeline'] as Map : const {};
+      SlotWeather slot(String name) => SlotWeather.fromJson({
+            'weather': '☁️',
+            'advice': advice[name],
+          });
+      return ForecastDay(
+        date: date,
+        isLongTerm: true,
+        rank: rank,
+        weatherOverview: WeatherOverview(
+          condition: '☁️',
+          high: '-',
+          low: '-',
+          rain: '-',
+          rainAm: '-',
+          rainPm: '-',
+          rainNight: '-',
+          warning: '-',
+        ),
+        eventTrafficFacts: const [],
+        peakWindows: _asStringMap(rule['peak_windows']),
+        jobActions: _asStringMap(rule['job_actions']),
+        dailyScheduleAndImpact:
+            '【${dateDisplay}の長期予測】\n\n■長期傾向\n$longTermText\n\n■需要の見込み（ルールベース）\n${rule['outlook'] ?? ''}\n',
+        timeline: TimelineSlots(morning: slot('morning'), daytime: slot('daytime'), night: slot('night')),
+        confidence: 0,
+      );
+    }
+    return ForecastDay(
+      date: date,
+      isLongTerm: true,
+      rank: rank,
+      weatherOverview: WeatherOverview(
+        condition: '☁️',
+        high: '-',
+        low: '-',
+        rain: '-',
+        rainAm: '-',
+        rainPm: '-',
+        rainNight: '-',
+        warning: '-',
+      ),
+      eventTrafficFacts: const [],
+      peakWindows: emptyJobs,
+      jobActions: emptyJobs,
+      dailyScheduleAndImpact: '【${dateDisplay}の長期予測】\n\n■長期傾向\n$longTermText\n',
+      timeline: null,
+      confidence: 0,
+    );
+  }
+
   static List<String> _asStringList(dynamic v) {
     if (v is List) {
       return v.map((e) => e.toString().trim()).where((s) => s.isNotEmpty).toList();
@@ -273,30 +330,92 @@ class SlotWeather {
 /// Repository (assetsから読む)
 /// ===============================
 
+class AreaEntry {
+  final String key;
+  final String name;
+  final String file; // assets/ からの相対パス（分割出力のとき）
+
+  const AreaEntry({required this.key, required this.name, required this.file});
+}
+
 class EagleEyeRepo {
-  Future<Map<String, List<ForecastDay>>> load() async {
-    final raw = await rootBundle.loadString('assets/eagle_eye_data.json');
+  static const _manifestPath = 'assets/areas/manifest.json';
+  static const _v2Path = 'assets/eagle_eye_data.v2.json';
 
-    if (raw.trim().isEmpty) {
-      throw const FormatException('assets/eagle_eye_data.json が空です');
+  /// エリア分割出力の一覧（assets/areas/manifest.json）。無ければ null
+  Future<List<AreaEntry>?> loadManifest() async {
+    String raw;
+    try {
+      raw = await rootBundle.loadString(_manifestPath);
+    } catch (_) {
+      return null;
     }
+    final decoded = json.decode(raw);
+    if (decoded is! Map || decoded['areas'] is! Map) return null;
+
+    final out = <AreaEntry>[];
+    (decoded['areas'] as Map).forEach((key, v) {
+      if (v is Map && v['file'] != null) {
+        out.add(AreaEntry(
+          key: key.toString(),
+          name: (v['name'] ?? key).toString(),
+          file: v['file'].toString(),
+        ));
+      }
+    });
+    return out;
+  }
 
+  /// 選択中のエリアのシャードだけ読む
+  Future<List<ForecastDay>> loadArea(AreaEntry area) async {
+    final raw = await rootBundle.loadString('assets/${area.file}', cache: false);
     final decoded = json.decode(raw);
     if (decoded is! Map) {
-      throw Exception('eagle_eye_data.json の形式が不正です（rootがMapではない）');
+      throw Exception('${area.file} の形式が不正です（rootがMapではない）');
     }
+    return _daysFromV2Area(decoded);
+  }
+
+  /// 全エリアぶんを v2（正規化フォーマット）から読む
+  Future<Map<String, List<ForecastDay>>> load() async {
+    final raw = await rootBundle.loadString(_v2Path);
+    if (raw.trim().isEmpty) {
+      throw const FormatException('assets/eagle_eye_data.v2.json が空です');
+    }
+    final decoded = json.decode(raw);
+    if (decoded is! Map || decoded['areas'] is! Map) {
+      throw Exception('eagle_eye_data.v2.json の形式が不正です（areas がない）');
+    }
+    return _fromV2(decoded['areas'] as Map);
+  }
 
+  Map<String, List<ForecastDay>> _fromV2(Map areas) {
     final out = <String, List<ForecastDay>>{};
-    decoded.forEach((areaKey, value) {
-      if (value is List) {
-        out[areaKey.toString()] = value
-            .whereType<Map>()
-            .map((m) => ForecastDay.fromJson(Map<String, dynamic>.from(m)))
-            .toList();
+    areas.forEach((areaKey, area) {
+      if (area is Map && area['days'] is List) {
+        out[areaKey.toString()] = _daysFromV2Area(area);
       }
     });
     return out;
   }
+
+  List<ForecastDay> _daysFromV2Area(Map area) {
+    final longTermText = (area['long_term_text'] ?? '').toString();
+    final rules = (area['long_term_rules'] is List) ? area['long_term_rules'] as List : const [];
+    final days = area['days'];
+    if (days is! List) return const [];
+    final list = <ForecastDay>[];
+    for (final d in days) {
+      if (d is List && d.length >= 2) {
+        final i = (d.length >= 3 && d[2] is int) ? d[2] as int : -1;
+        final rule = (i >= 0 && i < rules.length && rules[i] is Map) ? rules[i] as Map : null;
+        list.add(ForecastDay.longTerm(d[0].toString(), d[1].toString(), longTermText, rule));
+      } else if (d is Map) {
+        list.add(ForecastDay.fromJson(Map<String, dynamic>.from(d)));
+      }
+    }
+    return list;
+  }
 }
 
 /// ===============================
@@ -313,6 +432,8 @@ class AnalysisScreen extends StatefulWidget {
 class _AnalysisScreenState extends State<AnalysisScreen> {
   final _repo = EagleEyeRepo();
 
+  // 分割出力のときは選択中のエリアだけ読み込む（_data には1エリアぶん）
+  List<AreaEntry> _areas = [];
   Map<String, List<ForecastDay>> _data = {};
   String? _areaKey;
   int _dayIndex = 0;
@@ -330,9 +451,25 @@ class _AnalysisScreenState extends State<AnalysisScreen> {
 
   Future<void> _init() async {
     try {
+      final areas = await _repo.loadManifest();
+      if (areas != null && areas.isNotEmpty) {
+        areas.sort((a, b) => a.key.compareTo(b.key));
+        final first = areas.first;
+        final days = await _repo.loadArea(first);
+        setState(() {
+          _areas = areas;
+          _data = {first.key: days};
+          _areaKey = first.key;
+          _dayIndex = 0;
+          _loading = false;
+        });
+        return;
+      }
+
       final data = await _repo.load();
       final keys = data.keys.toList()..sort();
       setState(() {
+        _areas = keys.map((k) => AreaEntry(key: k, name: k, file: '')).toList();
         _data = data;
         _areaKey = keys.isNotEmpty ? keys.first : null;
         _dayIndex = 0;
@@ -346,6 +483,33 @@ class _AnalysisScreenState extends State<AnalysisScreen> {
     }
   }
 
+  Future<void> _selectArea(String key) async {
+    if (_data.containsKey(key)) {
+      setState(() {
+        _areaKey = key;
+        _dayIndex = 0;
+      });
+      return;
+    }
+
+    final area = _areas.firstWhere((a) => a.key == key);
+    setState(() => _loading = true);
+    try {
+      final days = await _repo.loadArea(area);
+      setState(() {
+        _data = {key: days};
+        _areaKey = key;
+        _dayIndex = 0;
+        _loading = false;
+      });
+    } catch (e) {
+      setState(() {
+        _error = e.toString();
+        _loading = false;
+      });
+    }
+  }
+
   @override
   Widget build(BuildContext context) {
     final title = _areaKey == null ? 'Eagle Eye' : _prettyAreaName(_areaKey!);
@@ -481,7 +645,7 @@ class _AnalysisScreenState extends State<AnalysisScreen> {
   }
 
   void _showAreaPicker(BuildContext context) {
-    final keys = _data.keys.toList()..sort();
+    final keys = _areas.map((a) => a.key).toList();
     showModalBottomSheet(
       context: context,
       showDragHandle: true,
@@ -503,10 +667,7 @@ class _AnalysisScreenState extends State<AnalysisScreen> {
                 trailing: selected ? const Icon(Icons.check) : null,
                 onTap: () {
                   Navigator.pop(context);
-                  setState(() {
-                    _areaKey = k;
-                    _dayIndex = 0;
-                  });
+                  _selectArea(k);
                 },
               );
             },
@@ -517,6 +678,9 @@ class _AnalysisScreenState extends State<AnalysisScreen> {
   }
 
   String _prettyAreaName(String areaKey) {
+    for (final a in _areas) {
+      if (a.key == areaKey && a.name != areaKey) return a.name;
+    }
     return areaKey.replaceAll('_', ' ').trim();
   }
 
@@ -1,12 +1,24 @@
 import os
+import csv
 import json
+import math
+import atexit
 import time
-import urllib.request
 import re
+import hashlib
+import asyncio
+import heapq
+import shutil
+import tempfile
+import threading
+from array import array
+from collections.abc import Mapping
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import requests
+from requests.adapters import HTTPAdapter
 
 # =========================
 # 設定
@@ -16,12 +28,122 @@ JST = timezone(timedelta(hours=9), "JST")
 
 RUN_DAYS = 90   # 90日ぶん生成
 AI_DAYS = 7     # 直近7日だけAI（イベント/交通も反映）
-MAX_WORKERS = 4
+AI_BATCH_DAYS = True    # 直近AI_DAYS日を1エリア1回のGemini呼び出しでまとめて生成
+AI_BATCH_TIMEOUT = 180  # まとめ生成は出力が長いのでタイムアウトを長めに
+
+# 実行全体の締切（秒）。間に合わないAIジョブはルールの日にして時間内に終わらせる
+RUN_DEADLINE_SEC = 45 * 60
+DEADLINE_SAFETY = 1.2           # 見積もり時間にかける余裕
+AI_JOB_EST_SEC = 40             # 単発1日ぶんの所要見積もり（初期値。実測で更新）
+AI_BATCH_EST_SEC_PER_DAY = 15   # まとめ生成の1日あたり所要見積もり（初期値。実測で更新）
+AREA_WEIGHT_DEFAULT = 1.0       # TARGET_AREAS に "weight" があれば優先度に使う（大きいほど先）
+# 接続先ごとの同時実行数（asyncio パイプライン）
+JMA_CONCURRENCY = 8
+OPENMETEO_CONCURRENCY = 2
+GEMINI_CONCURRENCY = 8
+OPENMETEO_BULK_CHUNK = 50   # Open-Meteo 複数地点まとめ取得の1リクエストあたり地点数
 
 GEMINI_MODEL = "gemini-2.5-flash"
 
-# Flutter 側は assets/eagle_eye_data.json を読む
+# 接続先（ベンチマークではローカルのスタンドインサーバーに向ける: bench/run_bench.py）
+JMA_BASE_URL = os.environ.get("EAGLE_EYE_JMA_BASE_URL", "https://www.jma.go.jp")
+OPENMETEO_BASE_URL = os.environ.get("EAGLE_EYE_OPENMETEO_BASE_URL", "https://api.open-meteo.com")
+GEMINI_BASE_URL = os.environ.get("EAGLE_EYE_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+
+# HTTP（全フェッチャー共通のセッション）
+HTTP_POOL_MAXSIZE = 16   # 1ホストあたりの keep-alive 接続数（各同時実行数の上限より多め）
+HTTP_TIMEOUTS = {        # エンドポイント別のタイムアウト（秒）
+    "jma_forecast": 15,
+    "jma_warning": 5,
+    "amedas": 10,
+    "openmeteo": 15,
+    "gemini": 75,
+    "gemini_context": 30,
+}
+
+# JMA / AMeDAS / Open-Meteo の条件付きGET用ディスクキャッシュ（ETag / Last-Modified）
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache", "http")
+HTTP_CACHE_MAX_AGE = 3 * 24 * 3600   # これより古いエントリは起動時に消す
+AMEDAS_BLOCK_FINAL_SEC = 30 * 60     # AMeDAS の3時間ブロックは終わってからこの秒数で確定扱い（再取得しない）
+
+# Gemini のレート制御（プランの上限に合わせる）
+GEMINI_RPM = 1000               # 1分あたりリクエスト数
+GEMINI_TPM = 1_000_000          # 1分あたりトークン数
+GEMINI_CHARS_PER_TOKEN = 2      # 送信前のトークン見積もり（日本語は概ね1〜2文字/トークン）
+GEMINI_MAX_RETRY_AFTER = 60     # Retry-After をそのまま待つ上限（秒）
+# サーキットブレーカー: 直近 WINDOW 件のエラー率が THRESHOLD 以上で COOLDOWN 秒間は即失敗（→ ルールの日へ）
+GEMINI_BREAKER_WINDOW = 20
+GEMINI_BREAKER_MIN_CALLS = 8
+GEMINI_BREAKER_THRESHOLD = 0.5
+GEMINI_BREAKER_COOLDOWN = 120
+# JSON を返す呼び出しは streamGenerateContent で受け、形が崩れた時点で打ち切って送り直す
+GEMINI_STREAM = True
+GEMINI_STREAM_IDLE_TIMEOUT = 30   # 次のチャンクが来ないまま待つ上限（秒）。全体の上限は呼び出しごとの timeout
+
+# Flutter 側は assets/eagle_eye_data.v2.json（正規化フォーマット）と assets/areas/ を読む
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "assets", "eagle_eye_data.json")
+OUTPUT_V2_PATH = os.path.join(os.path.dirname(__file__), "assets", "eagle_eye_data.v2.json")
+OUTPUT_SCHEMA_VERSION = 2
+OUTPUT_WRITE_LEGACY = False  # 旧フォーマット（エリア→90日ぶんの完全レコード）も書き出すか（--write-legacy）
+# エリアごとの分割出力（アプリは manifest を読んで選択中のエリアだけ読む）
+OUTPUT_SHARD_DIR = os.path.join(os.path.dirname(__file__), "assets", "areas")
+OUTPUT_MANIFEST_NAME = "manifest.json"
+# 実行レポート（ステージ別の所要時間・HTTPステータス・フォールバック数など）
+# アプリには同梱しない（Actions ではアーティファクトとして残す）
+RUN_REPORT_PATH = os.path.join(os.path.dirname(__file__), ".cache", "run_report.json")
+
+# 差分再生成用: 前回の日別AIレコードを事実セットのハッシュと紐付けて保存するサイドカー
+FINGERPRINT_PATH = os.path.join(os.path.dirname(__file__), "assets", "eagle_eye_data.fingerprints.json")
+
+# チェックポイント（日別AI / エリアが終わるたびに保存し、--resume で続きから再開）
+CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), ".cache", "checkpoints")
+
+# 分割実行（--shard i/N）: 各シャードは担当エリアの部分ファイルを書き、--merge でまとめて最終出力にする
+OUTPUT_PARTIAL_DIR = os.path.join(os.path.dirname(__file__), ".cache", "partials")
+# シャードの割り振りに使う見込みコスト（日別AI 1回 = 1）
+SHARD_COST_AI_DAY = 1.0
+SHARD_COST_SEARCH = 1.0    # イベント検索 / 長期テキスト（エリアごとに1回ずつ）
+SHARD_COST_OFFICE = 0.5    # JMA 予報区の取得（同じ予報区のエリアは同じシャードに寄せる）
+SHARD_REFERENCE_MONDAY = datetime(2026, 6, 8)   # 祝日の無い週。曜日ごとのルールランクでAI日数を見積もる（実行日に依らない割り振りにする）
+
+# 日別AIの固定部分（指示・ルール・構成）は systemInstruction で送り、cachedContents に置けたらその名前だけ送る
+# （置けない＝最小トークン数に足りない等のときは systemInstruction のまま。同じ先頭部分は暗黙キャッシュが効く）
+GEMINI_CONTEXT_CACHE = True
+GEMINI_CONTEXT_CACHE_TTL = 3600   # 秒。切れる少し前に作り直す
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = 1024   # cachedContents に置ける最小トークン数（足りなければ作りに行かない）
+
+# Gemini 応答のディスクキャッシュ（再実行時に成功済みの呼び出しを使い回す）
+GEMINI_CACHE_ENABLED = True
+GEMINI_CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache", "gemini")
+GEMINI_CACHE_MAX_BYTES = 64 * 1024 * 1024
+GEMINI_CACHE_TTL = {
+    "event_search": 3 * 3600,   # イベント/交通の検索（鮮度重視）
+    "event_json": 3 * 3600,     # 検索結果→JSON変換
+    "long_term": 24 * 3600,     # 長期傾向テキスト
+    "ai_day": 6 * 3600,         # 日別AIレポート（事実セットが同じなら再利用）
+}
+
+# ルールベース需要エンジン: ルールのランクがこれ未満の日はAIを呼ばずにルールで作る（"C" なら全日AI）
+AI_MIN_RULE_RANK = "C"
+
+# Event/Traffic 検索をまとめる都市圏（JMA予報区 → 地域）。1エリアしかない地域はエリア単位で検索する
+# TARGET_AREAS に "event_region" があればそちらを優先
+EVENT_REGIONS = {
+    "tokyo": "東京都心（23区・羽田空港）",
+    "kanto_bay": "東京湾岸（千葉・神奈川）",
+    "keihanshin": "京阪神（大阪・京都・神戸）",
+}
+EVENT_REGION_BY_JMA = {
+    "130000": "tokyo",
+    "120000": "kanto_bay",
+    "140000": "kanto_bay",
+    "270000": "keihanshin",
+    "260000": "keihanshin",
+    "280000": "keihanshin",
+}
+# 地域検索に加えてエリア単独の検索もするエリア（イベント依存の大きい所など）
+EVENT_AREA_LOOKUPS = set()
 
 # --- 2026年 祝日定義（必要なら増やしてOK） ---
 HOLIDAYS_2026 = {
@@ -45,45 +167,273 @@ JOB_LABELS_JA = {
 }
 
 # =========================
-# 戦略的30地点定義（そのまま使用）
-# =========================
-TARGET_AREAS = {
-    "hakodate": { "name": "北海道 函館", "jma_code": "014100", "amedas_code": "23411", "lat": 41.7687, "lon": 140.7288, "feature": "観光・夜景・海鮮。冬は雪の影響大。クルーズ船寄港地。" },
-    "sapporo": { "name": "北海道 札幌", "jma_code": "016000", "amedas_code": "14163", "lat": 43.0618, "lon": 141.3545, "feature": "北日本最大の歓楽街ススキノ。雪まつり等のイベント。" },
-    "sendai": { "name": "宮城 仙台", "jma_code": "040000", "amedas_code": "34392", "lat": 38.2682, "lon": 140.8694, "feature": "東北のビジネス拠点。国分町の夜間需要。" },
-    "tokyo_marunouchi": { "name": "東京 丸の内・東京駅", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6812, "lon": 139.7671, "feature": "日本のビジネス中心地。出張・接待・富裕層需要。" },
-    "tokyo_ginza": { "name": "東京 銀座・新橋", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6701, "lon": 139.7630, "feature": "夜の接待需要とサラリーマンの聖地。高級店多し。" },
-    "tokyo_shinjuku": { "name": "東京 新宿・歌舞伎町", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6914, "lon": 139.7020, "feature": "世界一の乗降客数と眠らない街。タクシー需要最強。" },
-    "tokyo_shibuya": { "name": "東京 渋谷・原宿", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6580, "lon": 139.7016, "feature": "若者とインバウンド、IT企業の街。トレンド発信地。" },
-    "tokyo_roppongi": { "name": "東京 六本木・赤坂", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6641, "lon": 139.7336, "feature": "富裕層、外国人、メディア関係者の夜の移動。" },
-    "tokyo_ikebukuro": { "name": "東京 池袋", "jma_code": "130000", "amedas_code": "44132", "lat": 35.7295, "lon": 139.7109, "feature": "埼玉方面への玄関口、サブカルチャー。" },
-    "tokyo_shinagawa": { "name": "東京 品川・高輪", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6285, "lon": 139.7397, "feature": "リニア・新幹線拠点。ホテルとビジネス需要。" },
-    "tokyo_ueno": { "name": "東京 上野", "jma_code": "130000", "amedas_code": "44132", "lat": 35.7141, "lon": 139.7741, "feature": "北の玄関口、美術館、アメ横。観光客多し。" },
-    "tokyo_asakusa": { "name": "東京 浅草", "jma_code": "130000", "amedas_code": "44132", "lat": 35.7119, "lon": 139.7983, "feature": "インバウンド観光の絶対王者。人力車や食べ歩き。" },
-    "tokyo_akihabara": { "name": "東京 秋葉原・神田", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6983, "lon": 139.7731, "feature": "オタク文化とビジネスの融合。電気街。" },
-    "tokyo_omotesando": { "name": "東京 表参道・青山", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6652, "lon": 139.7123, "feature": "ファッション、富裕層のランチ・買い物需要。" },
-    "tokyo_ebisu": { "name": "東京 恵比寿・代官山", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6467, "lon": 139.7101, "feature": "オシャレな飲食需要、タクシー利用率高め。" },
-    "tokyo_odaiba": { "name": "東京 お台場・有明", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6278, "lon": 139.7745, "feature": "ビッグサイトのイベント、観光、デートスポット。" },
-    "tokyo_toyosu": { "name": "東京 豊洲・湾岸", "jma_code": "130000", "amedas_code": "44132", "lat": 35.6568, "lon": 139.7960, "feature": "タワマン住民の生活需要と市場関係。" },
-    "tokyo_haneda": { "name": "東京 羽田空港エリア", "jma_code": "130000", "amedas_code": "44166", "lat": 35.5494, "lon": 139.7798, "feature": "旅行・出張客の送迎需要。天候による遅延影響。" },
-    "chiba_maihama": { "name": "千葉 舞浜(ディズニー)", "jma_code": "120000", "amedas_code": "45156", "lat": 35.6329, "lon": 139.8804, "feature": "ディズニーリゾート。イベントと天候への依存度極大。" },
-    "kanagawa_yokohama": { "name": "神奈川 横浜", "jma_code": "140000", "amedas_code": "46106", "lat": 35.4437, "lon": 139.6380, "feature": "みなとみらい観光とビジネスが融合。中華街。" },
-    "aichi_nagoya": { "name": "愛知 名古屋", "jma_code": "230000", "amedas_code": "51106", "lat": 35.1815, "lon": 136.9066, "feature": "トヨタ系ビジネスと独自の飲食文化。車社会。" },
-    "osaka_kita": { "name": "大阪 キタ (梅田)", "jma_code": "270000", "amedas_code": "62078", "lat": 34.7025, "lon": 135.4959, "feature": "西日本最大のビジネス街兼繁華街。地下街発達。" },
-    "osaka_minami": { "name": "大阪 ミナミ (難波)", "jma_code": "270000", "amedas_code": "62078", "lat": 34.6655, "lon": 135.5011, "feature": "インバウンド人気No.1。食い倒れの街。" },
-    "osaka_hokusetsu": { "name": "大阪 北摂", "jma_code": "270000", "amedas_code": "62078", "lat": 34.7809, "lon": 135.4624, "feature": "伊丹空港/新幹線・ビジネス・高級住宅街。" },
-    "osaka_bay": { "name": "大阪 ベイエリア(USJ)", "jma_code": "270000", "amedas_code": "62078", "lat": 34.6654, "lon": 135.4323, "feature": "USJや海遊館。海風強くイベント依存度高い。" },
-    "osaka_tennoji": { "name": "大阪 天王寺・阿倍野", "jma_code": "270000", "amedas_code": "62078", "lat": 34.6477, "lon": 135.5135, "feature": "ハルカス/通天閣。新旧文化の融合。" },
-    "kyoto_shijo": { "name": "京都 四条河原町", "jma_code": "260000", "amedas_code": "61286", "lat": 35.0037, "lon": 135.7706, "feature": "世界最強の観光都市。インバウンド需要が桁違い。" },
-    "hyogo_kobe": { "name": "兵庫 神戸(三宮)", "jma_code": "280000", "amedas_code": "63518", "lat": 34.6946, "lon": 135.1956, "feature": "オシャレな港町。観光とビジネス。" },
-    "hiroshima": { "name": "広島", "jma_code": "340000", "amedas_code": "67437", "lat": 34.3853, "lon": 132.4553, "feature": "平和公園・宮島。欧米系インバウンド多い。" },
-    "fukuoka": { "name": "福岡 博多・中洲", "jma_code": "400000", "amedas_code": "82182", "lat": 33.5902, "lon": 130.4017, "feature": "アジアの玄関口。屋台文化など夜の需要が強い。" },
-    "okinawa_naha": { "name": "沖縄 那覇", "jma_code": "471000", "amedas_code": "91197", "lat": 26.2124, "lon": 127.6809, "feature": "国際通り。観光客メイン。台風等の天候影響大。" },
-}
+# エリアカタログ（catalog/areas.csv。コードが空のエリアは観測所表から一番近い観測所で補う）
+# =========================
+AREA_CATALOG_PATH = os.environ.get("EAGLE_EYE_AREA_CATALOG", os.path.join(os.path.dirname(__file__), "catalog", "areas.csv"))
+STATION_TABLE_PATH = os.environ.get("EAGLE_EYE_STATION_TABLE", os.path.join(os.path.dirname(__file__), "catalog", "stations.csv"))
+AREA_RESOLUTION_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".cache", "area_resolutions.json")
+
+def _csv_records(path):
+    """コメント行（#）と空行を飛ばして (バイト位置, 1行) を返す（1レコード1行）"""
+    with open(path, "rb") as f:
+        pos = 0
+        for raw in f:
+            line = raw.decode("utf-8-sig" if pos == 0 else "utf-8").rstrip("\r\n")
+            if line.strip() and not line.startswith("#"):
+                yield pos, line
+            pos += len(raw)
+
+def _csv_row(line):
+    return next(csv.reader([line]))
+
+def _unit_vector(lat, lon):
+    """緯度経度 → 単位球上の3次元座標（ユークリッド距離の順 = 大円距離の順）"""
+    la, lo = math.radians(lat), math.radians(lon)
+    return (math.cos(la) * math.cos(lo), math.cos(la) * math.sin(lo), math.sin(la))
+
+class StationIndex:
+    """
+    観測所表（code / office / lat / lon / name）の KD-tree
+    nearest は1点あたり O(log n)（where で絞ったときは条件に合う点が見つかるまで広げる）
+    """
+    def __init__(self, stations):
+        self.stations = stations
+        self._pts = [_unit_vector(st["lat"], st["lon"]) for st in stations]
+        self._tree = self._build(list(range(len(stations))), 0)
+
+    @classmethod
+    def load(cls, path):
+        records = _csv_records(path)
+        header = _csv_row(next(records)[1])
+        stations = []
+        for _, line in records:
+            row = dict(zip(header, _csv_row(line)))
+            stations.append({
+                "code": row["code"].strip(),
+                "office": (row.get("office") or "").strip(),
+                "lat": float(row["lat"]),
+                "lon": float(row["lon"]),
+                "name": row.get("name", ""),
+            })
+        return cls(stations)
+
+    def _build(self, idx, depth):
+        if not idx:
+            return None
+        axis = depth % 3
+        idx.sort(key=lambda i: self._pts[i][axis])
+        mid = len(idx) // 2
+        return (idx[mid], axis, self._build(idx[:mid], depth + 1), self._build(idx[mid + 1:], depth + 1))
+
+    def nearest(self, lat, lon, where=None):
+        """一番近い観測所（where(station) が真のものだけ）。無ければ None"""
+        q = _unit_vector(lat, lon)
+        best_i, best_d = None, float("inf")
+        stack = [self._tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            i, axis, left, right = node
+            p = self._pts[i]
+            d = (q[0] - p[0]) ** 2 + (q[1] - p[1]) ** 2 + (q[2] - p[2]) ** 2
+            if d < best_d and (where is None or where(self.stations[i])):
+                best_i, best_d = i, d
+            diff = q[axis] - p[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            if diff * diff < best_d:
+                stack.append(far)
+            stack.append(near)
+        return self.stations[best_i] if best_i is not None else None
+
+class AreaResolver:
+    """
+    コードが空のエリアを観測所表で補う
+    - amedas_code: 一番近い観測所
+    - jma_code: office のある観測所のうち一番近いものの府県予報区
+    結果は座標ごとにディスクへキャッシュする（観測所表が変わったら作り直す）
+    """
+    def __init__(self, station_path, cache_path):
+        self.station_path = station_path
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._index = None
+        self._cache = None
+        self._table_id = None
+        self._dirty = False
+
+    def _load(self):
+        if self._cache is not None:
+            return
+        with open(self.station_path, "rb") as f:
+            self._table_id = hashlib.sha256(f.read()).hexdigest()[:16]
+        self._cache = {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("table") == self._table_id:
+                self._cache = data.get("points") or {}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"エリア解決キャッシュを読めません: {e}", flush=True)
+
+    def resolve(self, lat, lon):
+        """返り値: {"jma_code", "amedas_code"}（観測所表が空なら空文字）"""
+        key = f"{lat:.4f},{lon:.4f}"
+        with self._lock:
+            self._load()
+            hit = self._cache.get(key)
+            if hit is not None:
+                return dict(hit)
+            if self._index is None:
+                self._index = StationIndex.load(self.station_path)
+            station = self._index.nearest(lat, lon)
+            office = self._index.nearest(lat, lon, where=lambda st: bool(st["office"]))
+            res = {
+                "jma_code": office["office"] if office else "",
+                "amedas_code": station["code"] if station else "",
+            }
+            self._cache[key] = res
+            if not self._dirty:
+                self._dirty = True
+                atexit.register(self.save)
+            return dict(res)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"table": self._table_id, "points": self._cache}
+            self._dirty = False
+        try:
+            write_json_atomic(self.cache_path, data, separators=(",", ":"), sort_keys=True)
+        except Exception as e:
+            print(f"エリア解決キャッシュを書けません: {e}", flush=True)
+
+class AreaCatalog(Mapping):
+    """
+    エリアカタログ（CSV / JSON）を dict[area_key] = エリア定義 として見せる
+    - CSV: 最初はキーの列だけ読んで位置を覚え、各エリアは引かれたときにその1行だけ読む
+    - JSON（{key: {...}} か [{"key": ...}]）: 最初に引かれたときに全体を読む
+    jma_code / amedas_code が空なら AreaResolver で補う。キー順はファイルの順
+    """
+    def __init__(self, path, resolver):
+        self.path = path
+        self.resolver = resolver
+        self._lock = threading.Lock()
+        self._offsets = None
+        self._header = None
+        self._raw = None
+        self._areas = {}
+
+    def _index(self):
+        if self._offsets is not None:
+            return self._offsets
+        with self._lock:
+            if self._offsets is not None:
+                return self._offsets
+            offsets = {}
+            if self.path.endswith(".json"):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, list):
+                    data = {row["key"]: row for row in data}
+                self._raw = data
+                offsets = {k: None for k in data}
+            else:
+                records = _csv_records(self.path)
+                self._header = _csv_row(next(records)[1])
+                for pos, line in records:
+                    key = _csv_row(line)[0] if line.startswith('"') else line.split(",", 1)[0]
+                    if key in offsets:
+                        raise ValueError(f"エリアカタログ {self.path}: キーが重複しています: {key}")
+                    offsets[key] = pos
+            self._offsets = offsets
+        return self._offsets
+
+    def _read_row(self, key):
+        pos = self._index()[key]
+        if self._raw is not None:
+            return dict(self._raw[key])
+        with open(self.path, "rb") as f:
+            f.seek(pos)
+            line = f.readline().decode("utf-8").rstrip("\r\n")
+        return dict(zip(self._header, _csv_row(line)))
+
+    def _build_area(self, key, row):
+        try:
+            area = {
+                "name": str(row["name"]).strip(),
+                "jma_code": str(row.get("jma_code") or "").strip(),
+                "amedas_code": str(row.get("amedas_code") or "").strip(),
+                "lat": float(row["lat"]),
+                "lon": float(row["lon"]),
+                "feature": str(row.get("feature") or "").strip(),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"エリアカタログ {self.path}: {key} の行が不正です ({e})")
+        if row.get("weight") not in (None, ""):
+            area["weight"] = float(row["weight"])
+        if row.get("event_region"):
+            area["event_region"] = str(row["event_region"]).strip()
+        keywords = row.get("keywords")
+        if isinstance(keywords, str):
+            keywords = [kw.strip() for kw in keywords.split("|") if kw.strip()]
+        if keywords:
+            area["keywords"] = list(keywords)
+        if not area["jma_code"] or not area["amedas_code"]:
+            resolved = self.resolver.resolve(area["lat"], area["lon"])
+            area["jma_code"] = area["jma_code"] or resolved["jma_code"]
+            area["amedas_code"] = area["amedas_code"] or resolved["amedas_code"]
+        return area
+
+    def __getitem__(self, key):
+        area = self._areas.get(key)
+        if area is None:
+            area = self._build_area(key, self._read_row(key))
+            self._areas[key] = area
+        return area
+
+    def __contains__(self, key):
+        return key in self._index()
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self):
+        return len(self._index())
+
+TARGET_AREAS = AreaCatalog(AREA_CATALOG_PATH, AreaResolver(STATION_TABLE_PATH, AREA_RESOLUTION_CACHE_PATH))
 
 # =========================
 # 小物ユーティリティ
 # =========================
+@contextmanager
+def atomic_write(path, mode="w"):
+    """一時ファイルに書いてから os.replace で置き換える（途中で落ちても壊れたファイルを残さない）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_bytes_atomic(path, body):
+    with atomic_write(path, "wb") as f:
+        f.write(body)
+    return path
+
+def write_json_atomic(path, obj, **dump_kwargs):
+    with atomic_write(path) as f:
+        json.dump(obj, f, ensure_ascii=False, **dump_kwargs)
+    return path
+
 def round10_percent(v):
     """0-100の数値を10%単位に丸めて文字列 '70%' で返す"""
     try:
@@ -142,43 +492,368 @@ def get_weather_emoji_openmeteo(code):
         pass
     return "☁️"
 
+# =========================
+# 計測（ステージ別の所要時間 / HTTP / サイズ / フォールバック）
+# =========================
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+class RunMetrics:
+    """
+    1回の実行ぶんの計測値を集めて run_report.json に書く
+    - stage: 所要時間（ヒストグラム / p50 / p95）と失敗数
+    - http: エンドポイント別のステータス数とリトライ数
+    - sizes: Gemini のプロンプト/応答の文字数
+    - areas: エリア別の AI / 再利用 / ルール（プレランク）/ フォールバック 日数
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(JST)
+        self.stages = {}
+        self.http = {}
+        self.retries = {}
+        self.sizes = {}
+        self.gemini_usage = {}
+        self.areas = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds, ok=True):
+        with self._lock:
+            st = self.stages.setdefault(stage, {"latencies": [], "errors": 0})
+            st["latencies"].append(seconds)
+            if not ok:
+                st["errors"] += 1
+
+    def http_status(self, endpoint, status):
+        with self._lock:
+            by_status = self.http.setdefault(endpoint, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    def retry(self, endpoint):
+        with self._lock:
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def size(self, kind, prompt_chars, response_chars):
+        with self._lock:
+            sz = self.sizes.setdefault(kind, {"calls": 0, "prompt_chars": 0, "response_chars": 0})
+            sz["calls"] += 1
+            sz["prompt_chars"] += prompt_chars
+            sz["response_chars"] += response_chars
+
+    def gemini_tokens(self, kind, usage):
+        """usageMetadata（prompt / cached / candidates / total）を呼び出しの種類ごとに積み、1回ずつも残す"""
+        usage = usage or {}
+        row = [int(usage.get(k) or 0) for k in ("promptTokenCount", "cachedContentTokenCount", "candidatesTokenCount", "totalTokenCount")]
+        with self._lock:
+            u = self.gemini_usage.setdefault(kind, {"calls": 0, "prompt": 0, "cached": 0, "candidates": 0, "total": 0, "per_call": []})
+            u["calls"] += 1
+            for name, v in zip(("prompt", "cached", "candidates", "total"), row):
+                u[name] += v
+            u["per_call"].append(row)
+
+    def area_day(self, area_key, outcome):
+        with self._lock:
+            a = self.areas.setdefault(area_key, {})
+            a[outcome] = a.get(outcome, 0) + 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stage_summary(self, stage):
+        st = self.stages.get(stage) or {"latencies": [], "errors": 0}
+        vals = sorted(st["latencies"])
+        hist = {}
+        for v in vals:
+            bound = next((b for b in LATENCY_BUCKETS if v <= b), None)
+            label = f"<={bound}s" if bound is not None else f">{LATENCY_BUCKETS[-1]}s"
+            hist[label] = hist.get(label, 0) + 1
+        r3 = lambda x: round(x, 3) if x is not None else None
+        return {
+            "count": len(vals),
+            "errors": st["errors"],
+            "p50": r3(_percentile(vals, 0.5)),
+            "p95": r3(_percentile(vals, 0.95)),
+            "max": r3(vals[-1] if vals else None),
+            "total": r3(sum(vals)),
+            "histogram": hist,
+        }
+
+    def report(self, extra=None):
+        with self._lock:
+            finished = datetime.now(JST)
+            fallback_total = sum(a.get("fallback", 0) for a in self.areas.values())
+            data = {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "finished_at": finished.isoformat(timespec="seconds"),
+                "wall_sec": round((finished - self.started_at).total_seconds(), 3),
+                "stages": {name: self.stage_summary(name) for name in sorted(self.stages)},
+                "http": {k: dict(v) for k, v in sorted(self.http.items())},
+                "retries": dict(sorted(self.retries.items())),
+                "gemini_sizes": {k: dict(v) for k, v in sorted(self.sizes.items())},
+                # per_call は [prompt, cached, candidates, total]
+                "gemini_tokens": {k: dict(v, per_call=list(v["per_call"])) for k, v in sorted(self.gemini_usage.items())},
+                "fallback_days_total": fallback_total,
+                "areas": {k: dict(v) for k, v in self.areas.items()},
+                "counters": dict(sorted(self.counters.items())),
+            }
+        data.update(extra or {})
+        return data
+
+    def write(self, path, extra=None):
+        return write_json_atomic(path, self.report(extra), indent=2)
+
+METRICS = RunMetrics()
+
+def instrumented(stage, ok=lambda result: bool(result)):
+    """関数の所要時間を stage として記録するデコレータ（ok で成功判定）"""
+    def deco(fn):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                try:
+                    success = ok(result)
+                except Exception:
+                    success = False
+                METRICS.observe(stage, time.perf_counter() - started, success)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return deco
+
+# =========================
+# HTTP（接続プールつきの共有セッション）
+# =========================
+class HttpClient:
+    """
+    JMA / AMeDAS / Open-Meteo / Gemini の通信をまとめる窓口
+    - requests.Session を1つ共有し、ホストごとの接続プールで keep-alive（毎回の TCP/TLS 接続をなくす）
+    - gzip を受け付ける
+    - タイムアウトはエンドポイント別（HTTP_TIMEOUTS。呼び出し側で上書き可）
+    - ステータスはエンドポイント別に METRICS へ記録（通信エラーは例外名）
+    """
+    def __init__(self, pool_maxsize=HTTP_POOL_MAXSIZE, timeouts=None):
+        self.timeouts = dict(HTTP_TIMEOUTS if timeouts is None else timeouts)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def request(self, method, url, endpoint, timeout=None, **kwargs):
+        """送ってレスポンスを返す（ステータスに関係なく返す。通信エラーは例外）"""
+        try:
+            res = self.session.request(method, url, timeout=timeout or self.timeouts.get(endpoint, 30), **kwargs)
+        except Exception as e:
+            METRICS.http_status(endpoint, type(e).__name__)
+            raise
+        METRICS.http_status(endpoint, res.status_code)
+        return res
+
+    def get_json(self, url, endpoint, timeout=None):
+        """GET して JSON を返す（200以外 / 通信エラーは例外）"""
+        res = self.request("GET", url, endpoint, timeout)
+        res.raise_for_status()
+        return json.loads(res.content)
+
+    def get_json_cached(self, url, endpoint, parse=None, parse_name=None, immutable=False, timeout=None):
+        """
+        HTTP_CACHE つきの GET（JSON）
+        - キャッシュがあれば If-None-Match / If-Modified-Since をつけ、304 なら保存済みのものを使う
+        - immutable=True（確定済みのデータ）でキャッシュがあれば送信しない
+        - parse: JSON → 結果 の変換。結果は parse_name ごとに保存し、304 のときは解析し直さない
+        200以外 / 通信エラーは例外
+        """
+        cache = HTTP_CACHE if HTTP_CACHE_ENABLED else None
+        meta = cache.load(url) if cache is not None else None
+
+        if meta is not None:
+            if immutable:
+                result = cache.result(url, meta, parse, parse_name)
+                if result is not _MISSING:
+                    METRICS.count(f"http_cache_fresh_{endpoint}")
+                    return result
+            else:
+                headers = {}
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+                res = self.request("GET", url, endpoint, timeout, headers=headers)
+                if res.status_code == 304:
+                    result = cache.result(url, meta, parse, parse_name)
+                    if result is not _MISSING:
+                        METRICS.count(f"http_cache_304_{endpoint}")
+                        cache.touch(url)
+                        return result
+                    res = None
+                if res is not None:
+                    return self._store_response(cache, url, res, parse, parse_name, immutable)
+
+        res = self.request("GET", url, endpoint, timeout)
+        return self._store_response(cache, url, res, parse, parse_name, immutable)
+
+    @staticmethod
+    def _store_response(cache, url, res, parse, parse_name, immutable):
+        res.raise_for_status()
+        data = json.loads(res.content)
+        result = parse(data) if parse else data
+        if cache is not None and (immutable or res.headers.get("ETag") or res.headers.get("Last-Modified")):
+            try:
+                cache.store(url, res.headers, res.content, parse_name if parse else None, result)
+            except Exception as e:
+                print(f"HTTP cache write Err: {e}", flush=True)
+        return result
+
+HTTP = HttpClient()
+
+_MISSING = object()
+
+class HttpCache:
+    """
+    条件付きGET用のディスクキャッシュ（URLごと）
+    - <key>.body: 応答本文
+    - <key>.json: URL / ETag / Last-Modified / 解析済みの結果（parse_name ごと）
+    HTTP_CACHE_MAX_AGE より古いもの（最後に使われた時刻で判定）は最初に使うときに消す
+    """
+    def __init__(self, cache_dir, max_age):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._pruned = False
+
+    def _path(self, url, ext):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:40]
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{ext}")
+
+    def _prune_once(self):
+        with self._lock:
+            if self._pruned:
+                return
+            self._pruned = True
+        if not os.path.isdir(self.cache_dir):
+            return
+        limit = time.time() - self.max_age
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def load(self, url):
+        self._prune_once()
+        try:
+            with open(self._path(url, "json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            return None
+        return meta if meta.get("url") == url else None
+
+    def result(self, url, meta, parse, parse_name):
+        """保存済みの解析結果（無ければ本文を解析して保存）。本文も無ければ _MISSING"""
+        parsed = meta.get("parsed") or {}
+        if parse and parse_name in parsed:
+            return parsed[parse_name]
+        try:
+            with open(self._path(url, "body"), "rb") as f:
+                data = json.loads(f.read())
+        except Exception:
+            return _MISSING
+        if not parse:
+            return data
+        result = parse(data)
+        meta.setdefault("parsed", {})[parse_name] = result
+        try:
+            write_json_atomic(self._path(url, "json"), meta, separators=(",", ":"))
+        except Exception:
+            pass
+        return result
+
+    def store(self, url, headers, body, parse_name=None, parsed=None):
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "parsed": {parse_name: parsed} if parse_name else {},
+        }
+        write_bytes_atomic(self._path(url, "body"), body)
+        write_json_atomic(self._path(url, "json"), meta, separators=(",", ":"))
+
+    def touch(self, url):
+        for ext in ("json", "body"):
+            try:
+                os.utime(self._path(url, ext))
+            except OSError:
+                pass
+
+HTTP_CACHE = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_AGE)
+
 # =========================
 # AMeDAS（今日の実測で最高/最低補正）
 # =========================
+def _amedas_block_temps(data):
+    """AMeDAS 1ブロックぶんの JSON から気温のリストを取り出す"""
+    temps = []
+    for _, vals in (data or {}).items():
+        if isinstance(vals, dict) and "temp" in vals and vals["temp"][0] is not None:
+            temps.append(vals["temp"][0])
+    return temps
+
+def amedas_block_urls(amedas_code, now):
+    """
+    今日0時〜現在の AMeDAS 3時間ブロック（YYYYMMDD_HH.json）の (URL, 確定済みか)
+    終わってから AMEDAS_BLOCK_FINAL_SEC 経ったブロックは中身が変わらないので確定扱い
+    """
+    date_str = now.strftime("%Y%m%d")
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    out = []
+    for hh in range(0, now.hour + 1, 3):
+        block_end = midnight + timedelta(hours=hh + 3)
+        final = (now - block_end).total_seconds() >= AMEDAS_BLOCK_FINAL_SEC
+        out.append((f"{JMA_BASE_URL}/bosai/amedas/data/point/{amedas_code}/{date_str}_{hh:02d}.json", final))
+    return out
+
+@instrumented("amedas")
 def get_amedas_daily_stats(amedas_code):
     """
     今日0時〜現在の1時間値から 最高/最低 を算出
+    確定済みのブロックはディスクキャッシュから（送信しない）、最新ブロックだけ条件付きGET
     """
     if not amedas_code:
         return None
-    today_str = datetime.now(JST).strftime("%Y%m%d")
-    url = f"https://www.jma.go.jp/bosai/amedas/data/point/{amedas_code}/{today_str}_1h.json"
-    try:
-        with urllib.request.urlopen(url, timeout=10) as res:
-            data = json.loads(res.read().decode("utf-8"))
-        temps = []
-        for _, vals in data.items():
-            if isinstance(vals, dict) and "temp" in vals and vals["temp"][0] is not None:
-                temps.append(vals["temp"][0])
-        if temps:
-            return {"max": max(temps), "min": min(temps)}
-    except:
-        pass
+    temps = []
+    for url, final in amedas_block_urls(amedas_code, datetime.now(JST)):
+        try:
+            temps += HTTP.get_json_cached(
+                url, "amedas", parse=_amedas_block_temps, parse_name="temps/v1", immutable=final
+            )
+        except:
+            pass
+    if temps:
+        return {"max": max(temps), "min": min(temps)}
     return None
 
 # =========================
 # JMA 予報
 # =========================
-def get_jma_forecast_data(area_code):
-    forecast_url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{area_code}.json"
-    warning_url = f"https://www.jma.go.jp/bosai/warning/data/warning/{area_code}.json"
-
+def parse_jma_forecast(data, area_code=""):
+    """予報JSON → dict[YYYY-MM-DD] = {code, rain_raw, temp_raw, temp_summary}（壊れていたら読めたところまで）"""
     daily_db = {}
 
     try:
-        with urllib.request.urlopen(forecast_url, timeout=15) as res:
-            data = json.loads(res.read().decode("utf-8"))
-
         # 詳細（data[0]）
         ts_weather = data[0]["timeSeries"][0]
         codes = ts_weather["areas"][0]["weatherCodes"]
@@ -237,230 +912,932 @@ def get_jma_forecast_data(area_code):
     except Exception as e:
         print(f"JMA Parse Error ({area_code}): {e}")
 
+    return daily_db
+
+def parse_jma_warning(w_data):
+    if "warnings" in w_data:
+        for w in w_data["warnings"]:
+            if w.get("status") not in ["発表なし", "解除"]:
+                return "気象警報・注意報 発表中"
+    return "特になし"
+
+@instrumented("jma_forecast", ok=lambda r: bool(r and r[0]))
+def get_jma_forecast_data(area_code):
+    """予報と警報を取得（どちらも条件付きGET。更新が無ければ解析済みの結果を使う）"""
+    forecast_url = f"{JMA_BASE_URL}/bosai/forecast/data/forecast/{area_code}.json"
+    warning_url = f"{JMA_BASE_URL}/bosai/warning/data/warning/{area_code}.json"
+
+    daily_db = {}
+    try:
+        daily_db = HTTP.get_json_cached(
+            forecast_url, "jma_forecast",
+            parse=lambda data: parse_jma_forecast(data, area_code), parse_name="daily_db/v1",
+        )
+    except Exception as e:
+        print(f"JMA Fetch Error ({area_code}): {e}")
+
     warning_text = "特になし"
     try:
-        with urllib.request.urlopen(warning_url, timeout=5) as res:
-            w_data = json.loads(res.read().decode("utf-8"))
-        if "warnings" in w_data:
-            for w in w_data["warnings"]:
-                if w.get("status") not in ["発表なし", "解除"]:
-                    warning_text = "気象警報・注意報 発表中"
-                    break
+        warning_text = HTTP.get_json_cached(warning_url, "jma_warning", parse=parse_jma_warning, parse_name="warning/v1")
     except:
         pass
 
     return daily_db, warning_text
 
+# =========================
+# 実行単位の共有フェッチ（同じ予報区/観測所は1回だけ取得）
+# =========================
+class RunFetchCache:
+    """
+    1回の実行中だけ有効な取得結果の共有置き場
+    - 同じキーの取得は1回だけ（single-flight）
+    - 取得中に来た他スレッドは、その取得の完了を待って同じ結果を受け取る
+    - 返す値はエリア間で共有されるので、呼び出し側で書き換えないこと
+    """
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._values = {}
+
+    def get_or_fetch(self, key, fetch_fn):
+        with self._guard:
+            if key in self._values:
+                return self._values[key]
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._guard:
+                if key in self._values:
+                    return self._values[key]
+            value = fetch_fn()
+            with self._guard:
+                self._values[key] = value
+            return value
+
+    def put(self, key, value):
+        """まとめ取得した結果を先に入れておく（既にあれば上書きしない）"""
+        with self._guard:
+            self._values.setdefault(key, value)
+
+RUN_FETCH = RunFetchCache()
+
+def get_jma_forecast_shared(area_code):
+    """予報区コード単位で1回だけ取得した (daily_db, warning_text) を返す"""
+    return RUN_FETCH.get_or_fetch(("jma", area_code), lambda: get_jma_forecast_data(area_code))
+
+def get_amedas_stats_shared(amedas_code):
+    """観測所コード単位で1回だけ取得した今日の最高/最低を返す"""
+    if not amedas_code:
+        return None
+    today_str = datetime.now(JST).strftime("%Y%m%d")
+    return RUN_FETCH.get_or_fetch(("amedas", amedas_code, today_str), lambda: get_amedas_daily_stats(amedas_code))
+
+def get_openmeteo_shared(lat, lon, days=7):
+    """座標単位で共有。まとめ取得に入っていなければ単発で取得する"""
+    return RUN_FETCH.get_or_fetch(("openmeteo", lat, lon, days), lambda: fetch_openmeteo_hourly(lat, lon, days=days))
+
+def group_areas_by(areas, field):
+    """{コード: [area_key, ...]} にまとめる（空コードは除外）"""
+    groups = {}
+    for area_key, area_data in areas.items():
+        code = area_data.get(field)
+        if code:
+            groups.setdefault(code, []).append(area_key)
+    return groups
+
 # =========================
 # Open-Meteo（時間帯別）
 # =========================
-def fetch_openmeteo_hourly(lat, lon, days=7):
-    url = (
-        "https://api.open-meteo.com/v1/forecast"
+def _openmeteo_url(lat, lon, days):
+    # lat/lon はカンマ区切りの複数地点も可
+    return (
+        f"{OPENMETEO_BASE_URL}/v1/forecast"
         f"?latitude={lat}&longitude={lon}"
         "&hourly=temperature_2m,relative_humidity_2m,precipitation_probability,weathercode"
         "&timezone=Asia%2FTokyo"
         f"&forecast_days={days}"
     )
+
+@instrumented("openmeteo")
+def fetch_openmeteo_hourly(lat, lon, days=7):
+    url = _openmeteo_url(lat, lon, days)
     try:
-        res = requests.get(url, timeout=15)
-        if res.status_code == 200:
-            return res.json()
+        return HTTP.get_json_cached(url, "openmeteo")
     except:
         pass
     return None
 
-def build_slot_weather(openmeteo_json, target_date):
-    if not openmeteo_json:
+@instrumented("openmeteo_bulk", ok=lambda r: bool(r) and all(r.values()))
+def fetch_openmeteo_hourly_bulk(areas, days=7, chunk_size=OPENMETEO_BULK_CHUNK):
+    """
+    複数地点を数回のリクエストにまとめて取得
+    返り値: dict[area_key] = fetch_openmeteo_hourly と同じ形のJSON（取れなかった地点は None）
+    """
+    keys = list(areas.keys())
+    out = {k: None for k in keys}
+
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        lats = ",".join(str(areas[k]["lat"]) for k in chunk)
+        lons = ",".join(str(areas[k]["lon"]) for k in chunk)
+        try:
+            data = HTTP.get_json_cached(_openmeteo_url(lats, lons, days), "openmeteo")
+            # 1地点だけだと配列ではなく単体のオブジェクトで返る
+            if isinstance(data, dict):
+                data = [data]
+            if not isinstance(data, list) or len(data) != len(chunk):
+                print(f"Open-Meteo bulk: 件数不一致 ({len(chunk)}地点)", flush=True)
+                continue
+            for k, item in zip(chunk, data):
+                out[k] = item if isinstance(item, dict) else None
+        except Exception as e:
+            print(f"Open-Meteo bulk Error: {e}", flush=True)
+
+    return out
+
+def prefetch_openmeteo_bulk(areas, days=7):
+    """まとめ取得の結果を共有キャッシュへ。取れなかった地点はエリア処理時に単発取得される"""
+    results = fetch_openmeteo_hourly_bulk(areas, days=days)
+    for area_key, om in results.items():
+        if om:
+            area_data = areas[area_key]
+            RUN_FETCH.put(("openmeteo", area_data["lat"], area_data["lon"], days), om)
+    return results
+
+# 時間帯: (名前, 開始時, 終了時(含まない), 代表にする時刻)
+SLOT_DEFS = [("morning", 6, 12, 9), ("daytime", 12, 18, 15), ("night", 18, 24, 21)]
+_SLOT_OF_HOUR = {h: name for name, start_h, end_h, _ in SLOT_DEFS for h in range(start_h, end_h)}
+
+def _to_float(v):
+    try:
+        return float(v)
+    except:
+        return None
+
+def _to_int(v):
+    try:
+        return int(v)
+    except:
         return None
 
-    hourly = openmeteo_json.get("hourly", {})
+def index_openmeteo_hourly(openmeteo_json):
+    """
+    Open-Meteo の hourly を1回だけ走査して
+    - 日付 → 時間帯 → [(時, index), ...] の表
+    - 数値に変換済みの配列（変換できない値は None）
+    を作る
+    """
+    hourly = (openmeteo_json or {}).get("hourly", {})
     times = hourly.get("time", [])
-    temps = hourly.get("temperature_2m", [])
-    hums = hourly.get("relative_humidity_2m", [])
-    pops = hourly.get("precipitation_probability", [])
-    wcodes = hourly.get("weathercode", [])
+    n = len(times)
 
-    date_str = target_date.strftime("%Y-%m-%d")
-    idxs = [i for i, t in enumerate(times) if isinstance(t, str) and t.startswith(date_str)]
-    if not idxs:
-        return None
+    def column(name, conv):
+        raw = hourly.get(name, [])
+        return [conv(raw[i]) if i < len(raw) else None for i in range(n)]
+
+    columns = {
+        "temp": column("temperature_2m", _to_float),
+        "hum": column("relative_humidity_2m", _to_float),
+        "pop": column("precipitation_probability", _to_float),
+        "wcode": column("weathercode", _to_int),
+    }
 
-    hours = []
-    for i in idxs:
+    table = {}
+    for i, t in enumerate(times):
+        if not isinstance(t, str):
+            continue
+        date_part, _, rest = t.partition("T")
+        slots = table.setdefault(date_part, {})
         try:
-            hh = int(times[i].split("T")[1].split(":")[0])
+            hh = int(rest.split(":")[0])
         except:
-            hh = None
-        hours.append(hh)
-
-    def slot_pack(start_h, end_h, prefer_hour):
-        ids = []
-        for local_i, global_i in enumerate(idxs):
-            hh = hours[local_i]
-            if hh is None:
-                continue
-            if start_h <= hh < end_h:
-                ids.append(global_i)
-
-        if not ids:
-            return {
-                "weather": "☁️",
-                "temp": "-",
-                "temp_high": "-",
-                "temp_low": "-",
-                "humidity": "-",
-                "rain": "-",
-                "wcode": None
-            }
-
-        best_k = None
-        best_diff = 999
-        for k in ids:
-            try:
-                hh = int(times[k].split("T")[1].split(":")[0])
-                d = abs(hh - prefer_hour)
-                if d < best_diff:
-                    best_diff = d
-                    best_k = k
-            except:
-                pass
+            continue
+        slot_name = _SLOT_OF_HOUR.get(hh)
+        if slot_name:
+            slots.setdefault(slot_name, []).append((hh, i))
+    return table, columns
 
-        tvals = []
-        for k in ids:
-            try:
-                tvals.append(float(temps[k]))
-            except:
-                pass
-        t_high = round(max(tvals)) if tvals else None
-        t_low = round(min(tvals)) if tvals else None
+def _slot_values(entries, prefer_hour, columns):
+    """
+    1時間帯ぶんの数値 (代表気温, 最高, 最低, 代表湿度, 最大降水確率, 天気コード) を返す
+    値が無いものは None
+    """
+    if not entries:
+        return None, None, None, None, None, None
 
-        t_rep = None
-        if best_k is not None:
-            try:
-                t_rep = round(float(temps[best_k]))
-            except:
-                t_rep = None
-        if t_rep is None and tvals:
-            t_rep = round(sum(tvals) / len(tvals))
+    temps, hums, pops, wcodes = columns["temp"], columns["hum"], columns["pop"], columns["wcode"]
 
-        hvals = []
-        for k in ids:
-            try:
-                hvals.append(float(hums[k]))
-            except:
-                pass
-        h_rep = None
-        if best_k is not None:
-            try:
-                h_rep = float(hums[best_k])
-            except:
-                h_rep = None
-        if h_rep is None and hvals:
-            h_rep = sum(hvals) / len(hvals)
+    # 代表時刻に一番近いもの（同差なら先のもの）
+    best_k = min(entries, key=lambda e: abs(e[0] - prefer_hour))[1]
 
-        pvals = []
-        for k in ids:
-            try:
-                pvals.append(float(pops[k]))
-            except:
-                pass
-        p_max = max(pvals) if pvals else None
+    tvals = [temps[k] for _, k in entries if temps[k] is not None]
+    t_high = max(tvals) if tvals else None
+    t_low = min(tvals) if tvals else None
+    t_rep = temps[best_k]
+    if t_rep is None and tvals:
+        t_rep = sum(tvals) / len(tvals)
 
-        wcode_val = None
-        if best_k is not None:
-            try:
-                wcode_val = int(wcodes[best_k])
-            except:
-                wcode_val = None
+    h_rep = hums[best_k]
+    if h_rep is None:
+        hvals = [hums[k] for _, k in entries if hums[k] is not None]
+        h_rep = sum(hvals) / len(hvals) if hvals else None
 
-        emoji = get_weather_emoji_openmeteo(wcode_val) if wcode_val is not None else "☁️"
+    pvals = [pops[k] for _, k in entries if pops[k] is not None]
+    p_max = max(pvals) if pvals else None
 
-        return {
-            "weather": emoji,
-            "temp": f"{t_rep}℃" if t_rep is not None else "-",
-            "temp_high": f"{t_high}℃" if t_high is not None else "-",
-            "temp_low": f"{t_low}℃" if t_low is not None else "-",
-            "humidity": round10_percent(h_rep) if h_rep is not None else "-",
-            "rain": round10_percent(p_max) if p_max is not None else "-",
-            "wcode": wcode_val
-        }
+    return t_rep, t_high, t_low, h_rep, p_max, wcodes[best_k]
 
+def format_slot(t_rep, t_high, t_low, h_rep, p_max, wcode_val):
+    """_slot_values の数値を timeline 用の表示文字列にする"""
     return {
-        "morning": slot_pack(6, 12, 9),
-        "daytime": slot_pack(12, 18, 15),
-        "night": slot_pack(18, 24, 21),
+        "weather": get_weather_emoji_openmeteo(wcode_val) if wcode_val is not None else "☁️",
+        "temp": f"{round(t_rep)}℃" if t_rep is not None else "-",
+        "temp_high": f"{round(t_high)}℃" if t_high is not None else "-",
+        "temp_low": f"{round(t_low)}℃" if t_low is not None else "-",
+        "humidity": round10_percent(h_rep) if h_rep is not None else "-",
+        "rain": round10_percent(p_max) if p_max is not None else "-",
+        "wcode": wcode_val
     }
 
 # =========================
-# Gemini 呼び出し（リトライ付き）
+# Gemini 応答キャッシュ（ディスク / TTL付き）
 # =========================
-def _post_json(url, headers, payload, timeout=60, retry=3, backoff=2.0):
-    for i in range(retry):
+class GeminiResponseCache:
+    """
+    (モデル, generationConfig/tools, 正規化したプロンプト) のハッシュをキーに応答テキストを保存
+    - 種別ごとのTTLで期限切れ
+    - 合計サイズが上限を超えたら古い順に削除
+    - 成功した応答だけを入れるので、再実行では失敗した呼び出しだけがAPIを使う
+    """
+    def __init__(self, cache_dir, max_bytes, ttl_by_kind):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_by_kind = ttl_by_kind
+        self._lock = threading.Lock()
+        self._total = None   # キャッシュの合計バイト数（最初の put で数える）
+        self.hits = {}
+        self.misses = {}
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        lines = [line.rstrip() for line in (prompt or "").replace("\r\n", "\n").split("\n")]
+        return "\n".join(lines).strip()
+
+    def make_key(self, model, payload, prompt):
+        body = {k: v for k, v in payload.items() if k != "contents"}
+        raw = json.dumps(
+            {"model": model, "config": body, "prompt": self.normalize_prompt(prompt)},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _count(self, counter, kind):
+        with self._lock:
+            counter[kind] = counter.get(kind, 0) + 1
+
+    def get(self, key, kind):
+        path = self._path(key)
         try:
-            res = requests.post(url, headers=headers, json=payload, timeout=timeout)
-            if res.status_code == 200:
-                return res.json()
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("expires", 0) > time.time():
+                self._count(self.hits, kind)
+                return entry.get("text")
+            size = os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                if self._total is not None:
+                    self._total -= size
         except:
             pass
-        time.sleep(backoff ** i)
-    return None
-
-def call_gemini_search(prompt):
-    if not API_KEY:
-        return None
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={API_KEY}"
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "tools": [{"googleSearch": {}}],
-        "generationConfig": {"temperature": 0.4}
-    }
-    data = _post_json(url, headers, payload, timeout=75, retry=3)
-    if not data:
-        return None
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
-    except:
+        self._count(self.misses, kind)
         return None
 
-def call_gemini_json(prompt):
-    if not API_KEY:
-        return None
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={API_KEY}"
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {"temperature": 0.3, "responseMimeType": "application/json"}
-    }
-    data = _post_json(url, headers, payload, timeout=75, retry=3)
-    if not data:
-        return None
-    try:
-        return data["candidates"][0]["content"]["parts"][0]["text"]
-    except:
-        return None
+    def put(self, key, kind, text):
+        ttl = self.ttl_by_kind.get(kind, 0)
+        if ttl <= 0 or not text:
+            return
+        path = self._path(key)
+        now = time.time()
+        try:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            write_json_atomic(path, {"kind": kind, "created": now, "expires": now + ttl, "text": text})
+            size = os.path.getsize(path)
+        except Exception as e:
+            print(f"Gemini cache write Err: {e}", flush=True)
+            return
+        with self._lock:
+            # 合計は最初の1回だけディレクトリを数え、あとは書いたぶんを足していく
+            if self._total is not None:
+                self._total += size - old_size
+            over = self._total is None or self._total > self.max_bytes
+        if over:
+            self.evict()
 
-def extract_json_block(text):
-    try:
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        if match:
-            return match.group(0)
-    except:
-        pass
-    return text
+    def evict(self):
+        """ディレクトリを数え直し、上限超えなら期限切れ → 作成が古い順に消す（合計もここで取り直す）"""
+        with self._lock:
+            entries = []
+            total = 0
+            now = time.time()
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith(".json"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+
+            if total > self.max_bytes:
+                max_ttl = max(self.ttl_by_kind.values() or [0])
+                for mtime, size, path in sorted(entries):
+                    if total <= self.max_bytes and mtime + max_ttl > now:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except OSError:
+                        pass
+            self._total = total
+
+    def summary_text(self):
+        kinds = sorted(set(self.hits) | set(self.misses))
+        parts = [f"{k} hit {self.hits.get(k, 0)} / miss {self.misses.get(k, 0)}" for k in kinds]
+        total_hit = sum(self.hits.values())
+        total_miss = sum(self.misses.values())
+        return f"Geminiキャッシュ: hit {total_hit} / miss {total_miss}" + (f"（{', '.join(parts)}）" if parts else "")
+
+GEMINI_CACHE = GeminiResponseCache(GEMINI_CACHE_DIR, GEMINI_CACHE_MAX_BYTES, GEMINI_CACHE_TTL)
 
 # =========================
-# Event/Traffic（7日まとめ）
+# Gemini クライアント（レート制御 / AIMD / サーキットブレーカー）
 # =========================
-def fetch_event_traffic_7days(area_name):
+class TokenBucket:
+    """1分あたり rate_per_min を補充するトークンバケツ（スレッド共有）"""
+    def __init__(self, rate_per_min):
+        self.capacity = float(rate_per_min)
+        self.tokens = float(rate_per_min)
+        self.rate = rate_per_min / 60.0
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1.0):
+        # 1回で上限を超える要求は上限ぶんだけ待つ（永遠に待たないように）
+        amount = min(float(amount), self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                self._cond.wait((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        """実際の消費量との差を後から反映（負なら返却）"""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+            self._cond.notify_all()
+
+class AimdLimiter:
     """
-    返り値: dict[YYYY-MM-DD] = "箇条書きテキスト"
-    何も取れなかった日は空文字にする（Flutter側の「今日の判断材料」を出さないため）
+    同時実行数を AIMD で調整する
+    - 成功: 上限を 1/上限 ずつ増やす（加算増）
+    - 429/5xx: 上限を半分にする（乗算減）
     """
-    today = datetime.now(JST).date()
+    def __init__(self, initial, min_limit=1, max_limit=None):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit or initial
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / max(1.0, self.limit))
+            self._cond.notify_all()
+
+    def on_overload(self):
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit / 2.0)
+
+class CircuitBreaker:
+    """
+    直近の結果からエラー率を見て、閾値を超えたら一定時間すべて即失敗にする
+    クールダウン後は1件だけ試し（half-open）、成功すれば復帰
+    """
+    def __init__(self, window, min_calls, threshold, cooldown):
+        self.window = window
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._results = []
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.cooldown:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                if ok:
+                    self._opened_at = None
+                    self._results = []
+                else:
+                    self._opened_at = time.monotonic()
+                return
+
+            self._results.append(ok)
+            self._results = self._results[-self.window:]
+            errors = self._results.count(False)
+            if len(self._results) >= self.min_calls and errors / len(self._results) >= self.threshold:
+                if self._opened_at is None:
+                    print(f"⛔ Gemini サーキットブレーカー作動（直近{len(self._results)}件中{errors}件エラー）→ {self.cooldown}秒 ルールの日へ", flush=True)
+                self._opened_at = time.monotonic()
+
+def _retry_after_seconds(res):
+    """Retry-After（秒数 or HTTP日付）を秒にする。無ければ None"""
+    value = (res.headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except:
+        return None
+
+class GeminiClient:
+    """
+    Gemini への POST を全エリアで共有する窓口
+    - RPM / TPM のトークンバケツで送信ペースを揃える
+    - 429/5xx で同時実行数を絞り、Retry-After があればそれに従う
+    - エラー率が高い間はサーキットブレーカーで即 None（呼び出し側はルールの日へ）
+    """
+    def __init__(self, rpm, tpm, concurrency):
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.concurrency = AimdLimiter(concurrency)
+        self.breaker = CircuitBreaker(
+            GEMINI_BREAKER_WINDOW, GEMINI_BREAKER_MIN_CALLS, GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_COOLDOWN
+        )
+
+    @staticmethod
+    def estimate_tokens(payload):
+        chars = 0
+        for content in payload.get("contents", []) + [payload.get("systemInstruction") or {}]:
+            for part in content.get("parts", []):
+                chars += len(part.get("text", ""))
+        return max(1, chars // GEMINI_CHARS_PER_TOKEN)
+
+    def post_json(self, url, headers, payload, timeout=None, retry=3, backoff=2.0, stream_check=None):
+        """
+        stream_check: JsonStreamCheck を作る関数。渡すと url は streamGenerateContent（SSE）として受けながら形を確認し、
+        崩れた時点で打ち切ってすぐ送り直す（生成の崩れはAPIの不調ではないのでブレーカー / 待ちには数えない）
+        """
+        est_tokens = self.estimate_tokens(payload)
+        for i in range(retry):
+            if not self.breaker.allow():
+                METRICS.count("gemini_breaker_rejected")
+                return None
+
+            self.requests_bucket.acquire(1)
+            self.tokens_bucket.acquire(est_tokens)
+            self.concurrency.acquire()
+            res = None
+            data = None
+            aborted = None
+            try:
+                if stream_check:
+                    res, data, aborted = self._stream(url, headers, payload, timeout, stream_check())
+                else:
+                    res = HTTP.request("POST", url, "gemini", timeout=timeout, headers=headers, json=payload)
+            except:
+                pass
+            finally:
+                self.concurrency.release()
+
+            status = res.status_code if res is not None else None
+            if i > 0:
+                METRICS.retry("gemini")
+            if status == 200 and aborted:
+                METRICS.count("gemini_stream_aborted")
+                print(f"✂️ Gemini 応答を途中で打ち切り（{aborted}）→ 送り直し", flush=True)
+                continue
+            if status == 200:
+                if not stream_check:
+                    try:
+                        data = res.json()
+                    except:
+                        data = None
+                if data is not None:
+                    self.breaker.record(True)
+                    self.concurrency.on_success()
+                    used = (data.get("usageMetadata") or {}).get("totalTokenCount")
+                    if used:
+                        self.tokens_bucket.adjust(used - est_tokens)
+                    return data
+
+            # 400/403/404 などは何度送っても同じなので即終了（APIの健全性とは無関係）
+            if status is not None and 400 <= status < 500 and status not in (408, 429):
+                return None
+
+            self.breaker.record(False)
+            wait = backoff ** i
+            if status == 429 or (status is not None and status >= 500):
+                self.concurrency.on_overload()
+                retry_after = _retry_after_seconds(res)
+                if retry_after is not None:
+                    wait = min(retry_after, GEMINI_MAX_RETRY_AFTER)
+            if i < retry - 1:
+                time.sleep(wait)
+        return None
+
+    @staticmethod
+    def _stream(url, headers, payload, timeout, check):
+        """
+        streamGenerateContent（alt=sse）を読みながらテキストを check に通す
+        最初のテキストまでの時間を gemini_ttft に記録
+        返り値: (res, generateContent と同じ形のdict or None, 打ち切り理由 or None)
+        """
+        started = time.monotonic()
+        deadline = started + (timeout or HTTP.timeouts.get("gemini", 75))
+        res = HTTP.request(
+            "POST", url, "gemini", timeout=(10, GEMINI_STREAM_IDLE_TIMEOUT), headers=headers, json=payload, stream=True
+        )
+        if res.status_code != 200:
+            res.close()
+            return res, None, None
+
+        texts = []
+        usage = None
+        first = None
+        try:
+            for line in res.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                chunk = json.loads(line[5:])
+                usage = chunk.get("usageMetadata") or usage
+                candidate = (chunk.get("candidates") or [{}])[0]
+                for part in (candidate.get("content") or {}).get("parts") or []:
+                    text = part.get("text")
+                    if not text:
+                        continue
+                    if first is None:
+                        first = time.monotonic() - started
+                        METRICS.observe("gemini_ttft", first)
+                    texts.append(text)
+                    reason = check.feed(text)
+                    if reason:
+                        return res, None, reason
+                if time.monotonic() > deadline:
+                    return res, None, "時間切れ"
+            reason = check.finish()
+            if reason:
+                return res, None, reason
+        finally:
+            res.close()
+
+        data = {"candidates": [{"content": {"parts": [{"text": "".join(texts)}]}}]}
+        if usage:
+            data["usageMetadata"] = usage
+        return res, data, None
+
+GEMINI_CLIENT = GeminiClient(GEMINI_RPM, GEMINI_TPM, GEMINI_CONCURRENCY)
+
+class GeminiContextCache:
+    """
+    固定の systemInstruction を cachedContents に置いて名前を返す（同じテキストは実行中1回だけ作る）
+    作れなかったテキスト・最小トークン数に足りないテキストは覚えておき、以後は None（呼び出し側は systemInstruction をそのまま送る）
+    作成のHTTPはロックの外で行い、その間に来た呼び出しも None（作成を待たずに systemInstruction で送る）
+    clear で作ったものを消す（消し忘れても TTL で消える）
+    """
+    _PENDING = object()
+
+    def __init__(self, ttl, enabled=True, min_tokens=GEMINI_CONTEXT_CACHE_MIN_TOKENS):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self._lock = threading.Lock()
+        self._entries = {}   # sha256 → (name / None / 作成中, 期限 monotonic)
+
+    def name_for(self, text):
+        if not (self.enabled and API_KEY):
+            return None
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                name, expires = entry
+                if name is self._PENDING:
+                    return None
+                if name is None or time.monotonic() < expires:
+                    return name
+            if GeminiClient.estimate_tokens({"systemInstruction": {"parts": [{"text": text}]}}) < self.min_tokens:
+                self._entries[key] = (None, 0)
+                METRICS.count("gemini_context_too_small")
+                return None
+            self._entries[key] = (self._PENDING, 0)
+
+        name = self._create(text)
+        with self._lock:
+            self._entries[key] = (name, time.monotonic() + self.ttl - 120)
+        return name
+
+    def _create(self, text):
+        body = {
+            "model": f"models/{GEMINI_MODEL}",
+            "systemInstruction": {"parts": [{"text": text}]},
+            "ttl": f"{self.ttl}s",
+        }
+        try:
+            res = HTTP.request("POST", f"{GEMINI_BASE_URL}/v1beta/cachedContents?key={API_KEY}", "gemini_context", json=body)
+            if res.status_code == 200:
+                name = res.json().get("name")
+                if name:
+                    METRICS.count("gemini_context_created")
+                    return name
+            print(f"Gemini context cache を作れません（{res.status_code}）→ systemInstruction で送る", flush=True)
+        except Exception as e:
+            print(f"Gemini context cache Err: {e}", flush=True)
+        METRICS.count("gemini_context_unavailable")
+        return None
+
+    def clear(self):
+        with self._lock:
+            names = [name for name, _ in self._entries.values() if isinstance(name, str)]
+            self._entries = {}
+        for name in names:
+            try:
+                HTTP.request("DELETE", f"{GEMINI_BASE_URL}/v1beta/{name}?key={API_KEY}", "gemini_context")
+            except Exception:
+                pass
+
+GEMINI_CONTEXT = GeminiContextCache(GEMINI_CONTEXT_CACHE_TTL, GEMINI_CONTEXT_CACHE)
+
+# =========================
+# Gemini 呼び出し（リトライ付き）
+# =========================
+def _call_gemini_cached(prompt, payload, timeout, cache_kind, validate=None, stream_check=None):
+    """
+    キャッシュ確認 → 未ヒットなら generateContent → 成功時だけキャッシュ保存
+    validate: 応答テキストを保存してよいか判定する関数（Falseなら保存しない）
+    stream_check: JsonStreamCheck を作る関数（GEMINI_STREAM なら streamGenerateContent で受けて途中で確認）
+    """
+    use_cache = GEMINI_CACHE_ENABLED and cache_kind
+    if use_cache:
+        cache_key = GEMINI_CACHE.make_key(GEMINI_MODEL, payload, prompt)
+        cached = GEMINI_CACHE.get(cache_key, cache_kind)
+        if cached:
+            return cached
+
+    # systemInstruction は cachedContents に置けたら名前だけ送る（キャッシュキーは中身で作ったものを使う）
+    system = payload.get("systemInstruction")
+    if system:
+        context_name = GEMINI_CONTEXT.name_for(system["parts"][0]["text"])
+        if context_name:
+            payload = {k: v for k, v in payload.items() if k != "systemInstruction"}
+            payload["cachedContent"] = context_name
+
+    if not GEMINI_STREAM:
+        stream_check = None
+    method = "streamGenerateContent?alt=sse&" if stream_check else "generateContent?"
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:{method}key={API_KEY}"
+    headers = {"Content-Type": "application/json"}
+    data = GEMINI_CLIENT.post_json(url, headers, payload, timeout=timeout, retry=3, stream_check=stream_check)
+    if not data:
+        return None
+    METRICS.gemini_tokens(cache_kind or "uncached", data.get("usageMetadata"))
+    try:
+        text = data["candidates"][0]["content"]["parts"][0]["text"]
+    except:
+        return None
+
+    METRICS.size(cache_kind or "uncached", len(prompt), len(text or ""))
+    if use_cache and text and (validate is None or validate(text)):
+        GEMINI_CACHE.put(cache_key, cache_kind, text)
+    return text
+
+def _is_json_text(text):
+    try:
+        json.loads(extract_json_block(text))
+        return True
+    except:
+        return False
+
+@instrumented("gemini_search")
+def call_gemini_search(prompt, cache_kind="event_search"):
+    if not API_KEY:
+        return None
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "tools": [{"googleSearch": {}}],
+        "generationConfig": {"temperature": 0.4}
+    }
+    return _call_gemini_cached(prompt, payload, timeout=75, cache_kind=cache_kind)
+
+@instrumented("gemini_json")
+def call_gemini_json(prompt, timeout=75, cache_kind="ai_day", system=None, schema=None, stream_check=None):
+    """
+    system: 固定の指示（systemInstruction / cachedContents で送る）
+    schema: responseSchema（出力の形を例ではなくスキーマで渡す）
+    stream_check: JsonStreamCheck を作る関数（省略時は「JSON以外の前置きが無いか」だけ見る）
+    """
+    if not API_KEY:
+        return None
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {"temperature": 0.3, "responseMimeType": "application/json"}
+    }
+    if system:
+        payload["systemInstruction"] = {"parts": [{"text": system}]}
+    if schema:
+        payload["generationConfig"]["responseSchema"] = schema
+    return _call_gemini_cached(
+        prompt, payload, timeout=timeout, cache_kind=cache_kind, validate=_is_json_text,
+        stream_check=stream_check or JsonStreamCheck,
+    )
+
+class JsonStreamCheck:
+    """
+    ストリーミングで届くテキストを1文字ずつ見て、JSONの形が崩れたらすぐ理由を返す（値は組み立てない）
+    - 最初の { / [ より前に文章がある（```json の囲みだけは許す）
+    - record_depth の深さのオブジェクトが閉じた時点で required のキーが欠けている
+    - 括弧の対応が合わない
+    feed / finish は問題なければ None、あれば理由の文字列
+    """
+    FENCE = "```json"
+
+    def __init__(self, required=(), record_depth=1, top="{["):
+        self.required = tuple(required)
+        self.record_depth = record_depth
+        self.top = top
+        self._stack = []        # [開き括弧, 見たキーの集合]
+        self._prefix = ""
+        self._in_string = False
+        self._escape = False
+        self._key = None        # 読み取り中のキー（オブジェクトのキー位置の文字列のときだけ list）
+        self._expect_key = False
+        self.started = False
+        self.done = False
+        self.records = 0
+
+    def feed(self, text):
+        for ch in text:
+            reason = self._char(ch)
+            if reason:
+                return reason
+        return None
+
+    def finish(self):
+        if not self.started:
+            return "JSONがない"
+        if not self.done:
+            return "JSONが途中で終わった"
+        return None
+
+    def _char(self, ch):
+        if self.done:
+            return None   # 閉じた後の囲み / 文章は extract_json_block で落とせる
+
+        if not self.started:
+            if ch in "{[":
+                if ch not in self.top:
+                    return f"先頭が {ch}"
+                self.started = True
+                return self._open(ch)
+            self._prefix += ch
+            head = self._prefix.strip()
+            if not self.FENCE.startswith(head):
+                return f"JSONの前に文章: {head[:20]!r}"
+            return None
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+                return None
+            elif ch == '"':
+                self._in_string = False
+                if self._key is not None:
+                    self._stack[-1][1].add("".join(self._key))
+                    self._key = None
+                return None
+            if self._key is not None:
+                self._key.append(ch)
+            return None
+
+        if ch == '"':
+            self._in_string = True
+            if self._expect_key:
+                self._key = []
+                self._expect_key = False
+        elif ch in "{[":
+            return self._open(ch)
+        elif ch in "}]":
+            return self._close(ch)
+        elif ch == ",":
+            self._expect_key = self._stack[-1][0] == "{"
+        return None
+
+    def _open(self, ch):
+        self._stack.append([ch, set()])
+        self._expect_key = ch == "{"
+        return None
+
+    def _close(self, ch):
+        opened, keys = self._stack.pop()
+        if (opened, ch) not in (("{", "}"), ("[", "]")):
+            return "括弧の対応が合わない"
+        self._expect_key = False
+        if opened == "{" and len(self._stack) + 1 == self.record_depth:
+            missing = [k for k in self.required if k not in keys]
+            if missing:
+                return f"{'/'.join(missing)} がない"
+            self.records += 1
+        if not self._stack:
+            self.done = True
+        return None
+
+def extract_json_block(text):
+    """
+    応答から JSON の部分を取り出す（```json の囲み・前後の文章を落とす）
+    最上位はオブジェクトでも配列でもよい。先に始まる方から、読めるものを返す
+    """
+    try:
+        text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text)
+        matches = [m for m in (re.search(r"\{.*\}", text, re.DOTALL), re.search(r"\[.*\]", text, re.DOTALL)) if m]
+        matches.sort(key=lambda m: m.start())
+        for m in matches:
+            try:
+                json.loads(m.group(0))
+                return m.group(0)
+            except ValueError:
+                continue
+        if matches:
+            return matches[0].group(0)
+    except:
+        pass
+    return text
+
+# =========================
+# Event/Traffic（7日まとめ）
+# =========================
+def fetch_event_traffic_7days(area_name, localities=None):
+    """
+    返り値: dict[YYYY-MM-DD] = "箇条書きテキスト"
+    何も取れなかった日は空文字にする（Flutter側の「今日の判断材料」を出さないため）
+    localities: 地域まとめ検索のときの地区名リスト（箇条書きに【地区名】を付けさせる）
+    """
+    today = datetime.now(JST).date()
     dates = [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(AI_DAYS)]
 
+    locality_rule = ""
+    if localities:
+        locality_rule = (
+            f"\n対象地区: {' / '.join(localities)}\n"
+            "各箇条書きの先頭に、関係する地区名を【】で付けること（例:【" + localities[0] + "】）。"
+            "地域全体に関わる情報（路線全体の遅延、広域の警報など）は【全域】とすること。"
+        )
+
     search_prompt = f"""
 あなたはプロの調査員です。
 対象エリア: {area_name}
@@ -474,16 +1851,18 @@ def fetch_event_traffic_7days(area_name):
 
 出力は「日付見出し + 箇条書き」形式で、必ず7日分を作ること。
 日付が分からない情報は該当日付に入れず「不明」枠にまとめること。
-フェイクは書かない。曖昧なら「未確認」と明記。
+フェイクは書かない。曖昧なら「未確認」と明記。{locality_rule}
 """.strip()
 
     text = call_gemini_search(search_prompt)
     if not text:
         return {d: "" for d in dates}
 
+    # 地区名タグは地域まとめ検索の絞り込み（filter_region_events）で使うので、変換で落とさせない
+    keep_tags_rule = "\n各箇条書きの先頭の【地区名】/【全域】は削らず、言い換えずにそのまま残すこと。" if localities else ""
     json_prompt = f"""
 次の文章を解析して、期間内7日分を必ず埋めたJSONに変換してください。
-キーは日付(YYYY-MM-DD)、値はその日のEvent/Traffic要約（箇条書き文字列、改行OK）。
+キーは日付(YYYY-MM-DD)、値はその日のEvent/Traffic要約（箇条書き文字列、改行OK）。{keep_tags_rule}
 期間: {dates[0]} から {dates[-1]}
 文章:
 {text}
@@ -496,7 +1875,7 @@ def fetch_event_traffic_7days(area_name):
 }}
 """.strip()
 
-    jtxt = call_gemini_json(json_prompt)
+    jtxt = call_gemini_json(json_prompt, cache_kind="event_json")
     if not jtxt:
         return {d: "" for d in dates}
 
@@ -509,6 +1888,120 @@ def fetch_event_traffic_7days(area_name):
     except:
         return {d: "" for d in dates}
 
+def area_locality_keywords(area_data):
+    """
+    エリアの地区名キーワード（地域まとめ検索の絞り込み用）
+    TARGET_AREAS に "keywords" があればそれを使い、無ければ name から作る（先頭の都道府県名は除く）
+    例: "東京 新宿・歌舞伎町" → ["新宿", "歌舞伎町"] / "東京 羽田空港エリア" → ["羽田空港"]
+    """
+    if area_data.get("keywords"):
+        return list(area_data["keywords"])
+    parts = [x for x in re.split(r"[\s・()（）]+", area_data.get("name", "")) if x]
+    if len(parts) > 1:
+        parts = parts[1:]
+    out = []
+    for x in parts:
+        if x.endswith("エリア") and len(x) - len("エリア") >= 3:
+            x = x[:-len("エリア")]
+        if len(x) >= 2 and not x.startswith("#"):
+            out.append(x)
+    return out or parts
+
+def event_region_of(area_key, area_data):
+    return area_data.get("event_region") or EVENT_REGION_BY_JMA.get(area_data.get("jma_code")) or area_key
+
+def plan_event_regions(areas):
+    """
+    エリアを Event/Traffic の検索単位（地域）にまとめる
+    返り値: dict[area_key] = {"key", "name", "localities", "members": [(area_key, keywords), ...]}
+    - 2エリア以上の地域: 地域名で1回検索して地区キーワードで絞り込む
+    - 1エリアだけの地域: 従来どおりエリア名で検索（localities は None）
+    """
+    members = {}
+    for area_key, area_data in areas.items():
+        members.setdefault(event_region_of(area_key, area_data), []).append((area_key, area_data))
+
+    plan = {}
+    for region_key, items in members.items():
+        if len(items) == 1:
+            area_key, area_data = items[0]
+            region = {"key": area_key, "name": area_data["name"], "localities": None, "members": []}
+        else:
+            member_kw = [(k, area_locality_keywords(a)) for k, a in items]
+            localities = []
+            for _, kws in member_kw:
+                for kw in kws[:1]:
+                    if kw not in localities:
+                        localities.append(kw)
+            region = {
+                "key": region_key,
+                "name": EVENT_REGIONS.get(region_key, region_key),
+                "localities": localities,
+                "members": member_kw,
+            }
+        for area_key, _ in items:
+            plan[area_key] = region
+    return plan
+
+def fetch_region_events(region):
+    """地域1つぶんの Event/Traffic（実行中は地域ごとに1回だけ取得）"""
+    today_str = datetime.now(JST).strftime("%Y-%m-%d")
+    return RUN_FETCH.get_or_fetch(
+        ("event_region", region["key"], today_str),
+        lambda: fetch_event_traffic_7days(region["name"], region["localities"]),
+    )
+
+def filter_region_events(region_facts, region, area_key):
+    """
+    地域まとめ検索の結果から、そのエリアに関係する行だけを残す
+    - 【全域】/【自エリアの地区名】の付いた行は残し、他エリアの地区名の付いた行は落とす
+    - 地区名の付いていない行: 自エリアのキーワードを含むなら残す / 他エリアのキーワードだけを含むなら落とす /
+      どの地区名も含まないなら地域全体の情報として残す
+    - 残した行の【地区名】は外す（アプリにそのまま出るため）
+    """
+    if not region["localities"]:
+        return dict(region_facts or {})
+    own = []
+    others = []
+    for k, kws in region["members"]:
+        (own if k == area_key else others).extend(kws)
+    tag_re = re.compile(
+        "【(" + "|".join(re.escape(x) for x in ["全域", *region["localities"], *own, *others]) + ")】[ 　]*"
+    )
+
+    out = {}
+    for date_key, text in (region_facts or {}).items():
+        kept = []
+        for line in (text or "").splitlines():
+            tags = tag_re.findall(line)
+            if tags:
+                keep = any(t == "全域" or t in own for t in tags)
+            else:
+                keep = any(kw in line for kw in own) or not any(kw in line for kw in others)
+            if keep:
+                kept.append(tag_re.sub("", line))
+        out[date_key] = "\n".join(kept).strip()
+    return out
+
+def merge_event_facts(base, extra):
+    """日付ごとのテキストを足し合わせる（同じ行は1回）"""
+    out = dict(base or {})
+    for date_key, text in (extra or {}).items():
+        lines = [x for x in (out.get(date_key) or "").splitlines() if x.strip()]
+        for line in (text or "").splitlines():
+            if line.strip() and line not in lines:
+                lines.append(line)
+        out[date_key] = "\n".join(lines)
+    return out
+
+def fetch_event_traffic_for_area(area_key, area_data, plan):
+    """地域まとめ検索を絞り込んだもの（+ EVENT_AREA_LOOKUPS のエリアは単独検索も足す）"""
+    region = plan.get(area_key) or plan_event_regions({area_key: area_data})[area_key]
+    facts = filter_region_events(fetch_region_events(region), region, area_key)
+    if region["localities"] and area_key in EVENT_AREA_LOOKUPS:
+        facts = merge_event_facts(facts, fetch_event_traffic_7days(area_data["name"]))
+    return facts
+
 def to_facts_list(event_traffic_text, max_items=6):
     """
     Geminiが返した箇条書きテキストを、Flutter用の List[str] に正規化
@@ -542,18 +2035,14 @@ def to_facts_list(event_traffic_text, max_items=6):
 # =========================
 # 気温 / 降水
 # =========================
-def decide_high_low(area_data, day_data, is_today):
+def jma_high_low_values(area_data, day_data, is_today):
+    """JMA の予報（今日は AMeDAS の実測で補正）から (最高, 最低) を数値で返す。無ければ None"""
     summary = day_data.get("temp_summary", {}) if day_data else {}
-    high_val = summary.get("max")
-    low_val = summary.get("min")
+    high_val = _to_float(summary.get("max"))
+    low_val = _to_float(summary.get("min"))
 
     t_raw = day_data.get("temp_raw", []) if day_data else []
-    valid_t = []
-    for x in t_raw:
-        try:
-            valid_t.append(float(x))
-        except:
-            pass
+    valid_t = [v for v in (_to_float(x) for x in t_raw) if v is not None]
     if valid_t:
         if high_val is None:
             high_val = max(valid_t)
@@ -561,7 +2050,7 @@ def decide_high_low(area_data, day_data, is_today):
             low_val = min(valid_t)
 
     if is_today:
-        amedas_stats = get_amedas_daily_stats(area_data.get("amedas_code", ""))
+        amedas_stats = get_amedas_stats_shared(area_data.get("amedas_code", ""))
         if amedas_stats:
             actual_min = amedas_stats["min"]
             actual_max = amedas_stats["max"]
@@ -570,21 +2059,22 @@ def decide_high_low(area_data, day_data, is_today):
             if high_val is None or (actual_max > high_val):
                 high_val = actual_max
 
-    str_high = f"{round(float(high_val))}" if high_val is not None else "-"
-    str_low = f"{round(float(low_val))}" if low_val is not None else "-"
-    return str_high, str_low
+    return high_val, low_val
 
-def decide_rain_display_jma(day_data):
+def jma_rain_value(day_data):
+    """JMA の降水確率（その日の最大）を数値で返す。無ければ None"""
     r_raw = day_data.get("rain_raw", []) if day_data else []
-    rain_val = "-"
-    if r_raw:
-        try:
-            vals = [int(x) for x in r_raw if x not in ("-", "", None)]
-            if vals:
-                rain_val = f"{max(vals)}%"
-        except:
-            pass
-    return rain_val
+    try:
+        vals = [int(x) for x in r_raw if x not in ("-", "", None)]
+    except:
+        return None
+    return max(vals) if vals else None
+
+def format_temp_value(v):
+    return f"{round(v)}" if v is not None else "-"
+
+def format_rain_value(v):
+    return f"{int(v)}%" if v is not None else "-"
 
 def decide_rain_am_pm(slot_weather, jma_fallback="-"):
     if slot_weather:
@@ -598,6 +2088,34 @@ def decide_rain_am_pm(slot_weather, jma_fallback="-"):
 # =========================
 # 休日判定（長期ランク用）
 # =========================
+def full_date_label(target_date):
+    """表示用日付 "01月27日 (火)" """
+    weekday_str = ["月", "火", "水", "木", "金", "土", "日"][target_date.weekday()]
+    return f"{target_date.strftime('%m月%d日')} ({weekday_str})"
+
+def date_key_from_label(label, today=None):
+    """
+    表示用日付（"01月27日 (火)"）または YYYY-MM-DD から YYYY-MM-DD を返す。読めなければ None
+    表示用日付には年が無いので today（既定は今日）に一番近い年にする
+    """
+    if not isinstance(label, str):
+        return None
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", label):
+        return label
+    m = re.match(r"(\d{1,2})月(\d{1,2})日", label)
+    if not m:
+        return None
+    today = today or datetime.now(JST).date()
+    candidates = []
+    for year in (today.year - 1, today.year, today.year + 1):
+        try:
+            candidates.append(datetime(year, int(m.group(1)), int(m.group(2))).date())
+        except ValueError:
+            pass
+    if not candidates:
+        return None
+    return min(candidates, key=lambda d: abs((d - today).days)).strftime("%Y-%m-%d")
+
 def base_rank_for_date(target_date):
     date_str = target_date.strftime("%Y-%m-%d")
     rank = "C"
@@ -611,9 +2129,237 @@ def base_rank_for_date(target_date):
         rank = "B"
     return rank
 
+# =========================
+# 天気グリッド（全エリア × 日付 × 時間帯）
+# =========================
+_NA = float("nan")
+
+def _na(v):
+    return _NA if v is None else float(v)
+
+def _val(x):
+    return None if x != x else x
+
+class WeatherGrid:
+    """
+    全エリアの天気を (エリア × 日付 × 時間帯) の列で持つ
+    - 取得が全部終わった後に build_weather_grid で1回だけ作る
+    - 数値の列は array("d")、値が無いところは NaN（天気コードの列は None）
+    - 降水表示 / 時間帯の表示 / 事実セットの天気ブロック / ルールランクは derive_days でまとめて作る
+    日付の列（表示用日付・ランク）は RUN_DAYS 日ぶん、天気の列は先頭 weather_days 日ぶんだけ持つ
+    """
+    SLOTS = [name for name, _, _, _ in SLOT_DEFS]
+
+    def __init__(self, areas, today_dt, run_days=RUN_DAYS, weather_days=AI_DAYS):
+        self.today_dt = today_dt
+        self.area_keys = list(areas)
+        self.area_data = [areas[k] for k in self.area_keys]
+        self.area_index = {k: i for i, k in enumerate(self.area_keys)}
+        self.dates = [today_dt + timedelta(days=i) for i in range(run_days)]
+        self.date_keys = [d.strftime("%Y-%m-%d") for d in self.dates]
+        self.date_index = {k: i for i, k in enumerate(self.date_keys)}
+        self.weather_days = min(weather_days, run_days)
+
+        # 日付（全エリア共通）
+        self.full_dates = [full_date_label(d) for d in self.dates]
+
+        n_area = len(self.area_keys)
+        n_day = n_area * self.weather_days
+        n_slot = n_day * len(self.SLOTS)
+
+        # エリア
+        self.warning = [False] * n_area
+        self.warning_text = ["特になし"] * n_area
+        self.categories = [area_categories(area) for area in self.area_data]
+
+        # エリア × 全日付（ルールベースのランク。天気が無い日はカレンダーとカテゴリだけ）
+        self.rule_ranks = ["C"] * (n_area * run_days)
+
+        # エリア × 日付（JMA）
+        self.jma_code = ["200"] * n_day
+        self.jma_high = array("d", [_NA]) * n_day
+        self.jma_low = array("d", [_NA]) * n_day
+        self.jma_pop = array("d", [_NA]) * n_day
+        self.has_slots = [False] * n_day   # Open-Meteo にその日があるか
+
+        # エリア × 日付 × 時間帯（Open-Meteo）
+        self.temp = array("d", [_NA]) * n_slot
+        self.temp_high = array("d", [_NA]) * n_slot
+        self.temp_low = array("d", [_NA]) * n_slot
+        self.humidity = array("d", [_NA]) * n_slot
+        self.pop = array("d", [_NA]) * n_slot
+        self.wcode = [None] * n_slot
+
+        self._days = None
+
+    def day_pos(self, a, d):
+        return a * self.weather_days + d
+
+    def slot_pos(self, a, d, s):
+        return (a * self.weather_days + d) * len(self.SLOTS) + s
+
+    def fill_area(self, area_key, daily_db, warning_text, om):
+        """1エリアぶんの取得結果を列に書き込む"""
+        a = self.area_index[area_key]
+        area_data = self.area_data[a]
+        self.warning_text[a] = warning_text
+        self.warning[a] = warning_text != "特になし"
+
+        table, columns = index_openmeteo_hourly(om) if om else ({}, None)
+        for d in range(self.weather_days):
+            date_key = self.date_keys[d]
+            day_data = (daily_db or {}).get(date_key, {})
+            p = self.day_pos(a, d)
+
+            self.jma_code[p] = day_data.get("code", "200")
+            high, low = jma_high_low_values(area_data, day_data, is_today=(d == 0))
+            self.jma_high[p] = _na(high)
+            self.jma_low[p] = _na(low)
+            self.jma_pop[p] = _na(jma_rain_value(day_data))
+
+            slots = table.get(date_key)
+            if slots is None:
+                continue
+            self.has_slots[p] = True
+            for s, (name, _, _, prefer_h) in enumerate(SLOT_DEFS):
+                t_rep, t_high, t_low, h_rep, p_max, wcode = _slot_values(slots.get(name), prefer_h, columns)
+                q = self.slot_pos(a, d, s)
+                self.temp[q] = _na(t_rep)
+                self.temp_high[q] = _na(t_high)
+                self.temp_low[q] = _na(t_low)
+                self.humidity[q] = _na(h_rep)
+                self.pop[q] = _na(p_max)
+                self.wcode[q] = wcode
+
+    def rule_rank(self, area_key, d):
+        return self.rule_ranks[self.area_index[area_key] * len(self.dates) + d]
+
+    def rule(self, area_key, d):
+        """d 日目のルール（天気の列が無い日はカレンダーとカテゴリだけ）"""
+        return self._derive_rule(self.area_index[area_key], d)
+
+    def _derive_rule(self, a, d):
+        """ルールベースのスコア（天気の列がある日は天気も使う）"""
+        if d >= self.weather_days:
+            score, slot_scores = rule_day_score(self.categories[a], self.dates[d])
+            return {"rank": rank_from_score(score), "score": score, "slot_scores": slot_scores, "rain_slots": [], "warning": False}
+
+        p = self.day_pos(a, d)
+        if self.has_slots[p]:
+            slot_pops = {name: _val(self.pop[self.slot_pos(a, d, s)]) for s, name in enumerate(self.SLOTS)}
+        else:
+            jma_pop = _val(self.jma_pop[p])
+            slot_pops = {name: jma_pop for name in self.SLOTS}
+        score, slot_scores = rule_day_score(
+            self.categories[a], self.dates[d], slot_pops, self.warning[a],
+            _val(self.jma_high[p]), _val(self.jma_low[p]),
+        )
+        return {
+            "rank": rank_from_score(score),
+            "score": score,
+            "slot_scores": slot_scores,
+            "rain_slots": [name for name, pop in slot_pops.items() if pop is not None and pop >= RULE_RAIN_POP],
+            "warning": self.warning[a],
+        }
+
+    def _derive_day(self, a, d):
+        p = self.day_pos(a, d)
+        w_code = self.jma_code[p]
+        w_emoji = get_weather_emoji_jma(w_code)
+        high = format_temp_value(_val(self.jma_high[p]))
+        low = format_temp_value(_val(self.jma_low[p]))
+        jma_rain = format_rain_value(_val(self.jma_pop[p]))
+        warning_text = self.warning_text[a]
+
+        if self.has_slots[p]:
+            slot_weather = {}
+            for s, name in enumerate(self.SLOTS):
+                q = self.slot_pos(a, d, s)
+                slot_weather[name] = format_slot(
+                    _val(self.temp[q]), _val(self.temp_high[q]), _val(self.temp_low[q]),
+                    _val(self.humidity[q]), _val(self.pop[q]), self.wcode[q],
+                )
+        else:
+            slot_weather = {
+                name: {"weather": w_emoji, "temp": "-", "temp_high": "-", "temp_low": "-", "humidity": "-", "rain": jma_rain, "wcode": None}
+                for name in self.SLOTS
+            }
+
+        rain_am, rain_pm, rain_ng = decide_rain_am_pm(slot_weather, jma_fallback=jma_rain)
+        sw = slot_weather
+        weather_facts = (
+            f"[Weather Overview]\n"
+            f"天気: {w_emoji} (JMA code {w_code})\n"
+            f"最高: {high}℃ / 最低: {low}℃\n"
+            f"降水（Open-Meteo/10%丸め）: 午前{rain_am} / 午後{rain_pm} / 夜{rain_ng}\n"
+            f"警報注意報: {warning_text}\n\n"
+            f"[Time Slots Weather]（Open-Meteo/10%丸め）\n"
+            f"朝(06-12): {sw['morning']['weather']} / 気温 {sw['morning']['temp']}（高{sw['morning']['temp_high']} 低{sw['morning']['temp_low']}）/ 湿度 {sw['morning']['humidity']} / 降水 {sw['morning']['rain']}\n"
+            f"昼(12-18): {sw['daytime']['weather']} / 気温 {sw['daytime']['temp']}（高{sw['daytime']['temp_high']} 低{sw['daytime']['temp_low']}）/ 湿度 {sw['daytime']['humidity']} / 降水 {sw['daytime']['rain']}\n"
+            f"夜(18-24): {sw['night']['weather']} / 気温 {sw['night']['temp']}（高{sw['night']['temp_high']} 低{sw['night']['temp_low']}）/ 湿度 {sw['night']['humidity']} / 降水 {sw['night']['rain']}\n\n"
+        )
+        return {
+            "w_code": w_code,
+            "w_emoji": w_emoji,
+            "high": high,
+            "low": low,
+            "rain_am": rain_am,
+            "rain_pm": rain_pm,
+            "rain_ng": rain_ng,
+            "rain_display": f"午前{rain_am} / 午後{rain_pm}",
+            "warning_text": warning_text,
+            "slot_weather": slot_weather,
+            "weather_facts": weather_facts,
+            "rule": self._derive_rule(a, d),
+        }
+
+    def derive_days(self):
+        """全エリア × 天気のある日 の表示値と、全日付のルールランクをまとめて作る（day_weather で引く）"""
+        self._days = [
+            self._derive_day(a, d)
+            for a in range(len(self.area_keys))
+            for d in range(self.weather_days)
+        ]
+        n_dates = len(self.dates)
+        for a in range(len(self.area_keys)):
+            for d in range(n_dates):
+                if d < self.weather_days:
+                    rank = self._days[self.day_pos(a, d)]["rule"]["rank"]
+                else:
+                    rank = self._derive_rule(a, d)["rank"]
+                self.rule_ranks[a * n_dates + d] = rank
+        return self._days
+
+    def day_weather(self, area_key, date_key):
+        """build_ai_day_context に渡す1日ぶんの天気（天気の列が無い日は None）"""
+        if self._days is None:
+            self.derive_days()
+        a = self.area_index.get(area_key)
+        d = self.date_index.get(date_key)
+        if a is None or d is None or d >= self.weather_days:
+            return None
+        return self._days[self.day_pos(a, d)]
+
+def build_weather_grid(areas, today_dt=None, run_days=RUN_DAYS, weather_days=AI_DAYS):
+    """
+    共有キャッシュにある JMA / AMeDAS / Open-Meteo の結果から全エリアぶんのグリッドを作る
+    （prefetch の後に呼ぶ。未取得のものはここで取得される）
+    """
+    started = time.perf_counter()
+    grid = WeatherGrid(areas, today_dt or datetime.now(JST), run_days, weather_days)
+    for area_key, area_data in areas.items():
+        daily_db, warning_text = get_jma_forecast_shared(area_data["jma_code"])
+        om = get_openmeteo_shared(area_data["lat"], area_data["lon"], days=weather_days)
+        grid.fill_area(area_key, daily_db, warning_text, om)
+    grid.derive_days()
+    METRICS.observe("weather_grid", time.perf_counter() - started)
+    return grid
+
 # =========================
 # 長期テキスト
 # =========================
+LONG_TERM_FALLBACK_TEXT = "長期予報データの取得に失敗しました。平年並みの傾向を参考にしてください。"
+
 def get_long_term_text_safe(area_name):
     start = datetime.now(JST).date()
     end = (start + timedelta(days=RUN_DAYS)).strftime("%Y-%m-%d")
@@ -625,18 +2371,43 @@ def get_long_term_text_safe(area_name):
 自然な日本語の文章で短くまとめてください。
 JSON形式や辞書形式の出力は禁止。読みやすいMarkdownテキストのみ出力。
 """.strip()
-    res = call_gemini_search(prompt)
+    res = call_gemini_search(prompt, cache_kind="long_term")
     if not res:
-        return "長期予報データの取得に失敗しました。平年並みの傾向を参考にしてください。"
+        return LONG_TERM_FALLBACK_TEXT
     return res
 
 def build_long_term_day(target_date, long_term_text):
-    date_display = target_date.strftime("%m月%d日")
-    weekday_str = ["月", "火", "水", "木", "金", "土", "日"][target_date.weekday()]
-    full_date = f"{date_display} ({weekday_str})"
+    return expand_long_term_day(full_date_label(target_date), base_rank_for_date(target_date), long_term_text)
 
-    rank = base_rank_for_date(target_date)
+LONG_TERM_RULE_HEADING = "\n■需要の見込み（ルールベース）\n"
 
+def expand_long_term_day(full_date, rank, long_term_text, rule_plan=None):
+    """
+    表示用日付 "01月27日 (火)" とランクから long_term の1日ぶんを組み立てる
+    rule_plan（long_term_rule_plan）があれば peak_windows / job_actions / timeline と見込みの一言も入れる
+    """
+    date_display = full_date.split(" ")[0]
+    text = f"【{date_display}の長期予測】\n\n■長期傾向\n{long_term_text}\n"
+    if rule_plan:
+        text += f"{LONG_TERM_RULE_HEADING}{rule_plan['outlook']}\n"
+        return {
+            "date": full_date,
+            "is_long_term": True,
+            "rank": rank,
+            "weather_overview": {
+                "condition": "☁️", "high": "-", "low": "-", "rain": "-",
+                "rain_am": "-", "rain_pm": "-", "rain_night": "-", "warning": "-",
+            },
+            "event_traffic_facts": [],
+            "peak_windows": dict(rule_plan["peak_windows"]),
+            "job_actions": dict(rule_plan["job_actions"]),
+            "daily_schedule_and_impact": text,
+            "timeline": {
+                name: dict({f: "☁️" if f == "weather" else "-" for f in TIMELINE_WEATHER_FIELDS}, advice=dict(advice))
+                for name, advice in rule_plan["timeline"].items()
+            },
+            "confidence": 0,
+        }
     return {
         "date": full_date,
         "is_long_term": True,
@@ -654,7 +2425,7 @@ def build_long_term_day(target_date, long_term_text):
         "event_traffic_facts": [],
         "peak_windows": {k: "" for k in JOB_KEYS},
         "job_actions": {k: "" for k in JOB_KEYS},
-        "daily_schedule_and_impact": f"【{date_display}の長期予測】\n\n■長期傾向\n{long_term_text}\n",
+        "daily_schedule_and_impact": text,
         "timeline": None,
         "confidence": 0
     }
@@ -662,275 +2433,1854 @@ def build_long_term_day(target_date, long_term_text):
 # =========================
 # AI生成（1日ぶん）
 # =========================
-def generate_ai_day(area_data, target_date, jma_day_data, warning_text, slot_weather, event_traffic_text):
-    """
-    Flutter(main.dart)のスキーマに合わせたJSONをGeminiで生成する（5職業固定）
-    - peak_windows / job_actions / timeline.*.advice は全職業キー必須
-    - event_traffic_facts は最大6、無ければ []
-    """
-    if not API_KEY:
-        return None
+AI_DAY_RULES = """
+【ルール】
+- フェイク禁止。事実セットにない固有名詞を勝手に作らない。
+- 曖昧なら「未確認」と明記。
+- 命令口調は禁止。
+- 一般論だけは禁止。必ず事実セット（天候/交通/イベント）に結びつける。
+- peak_windows / job_actions / timeline.*.advice は必ず全職業キー（taxi/delivery/restaurant/retail/hotel）を埋める。
+- event_traffic_facts は最大6つ。無ければ []。
+""".strip()
 
-    date_str = target_date.strftime("%Y-%m-%d")
-    date_display = target_date.strftime("%m月%d日")
-    weekday_str = ["月", "火", "水", "木", "金", "土", "日"][target_date.weekday()]
-    full_date = f"{date_display} ({weekday_str})"
+AI_DAY_REPORT_LAYOUT = """
+【daily_schedule_and_impact に含める構成】
+- ■Event & Traffic（事実セットの範囲で段落分け要約）
+- ■総括（短め）
+- ■職業別の打ち手（要点）
+  ・タクシー:
+  ・デリバリー:
+  ・飲食店:
+  ・小売:
+  ・ホテル観光:
+""".strip()
 
-    w_code = (jma_day_data or {}).get("code", "200")
-    w_emoji = get_weather_emoji_jma(w_code)
+# 毎回同じ部分（指示・ルール・構成）。systemInstruction / cachedContents で送り、呼び出しごとには事実セットだけ送る
+AI_DAY_SYSTEM_INSTRUCTION = f"""
+あなたは世界トップクラスの戦略コンサルタントです。
+渡される事実セットから、職業ごとに「意思決定が変わる」具体策を作ってください。
 
-    now_dt = datetime.now(JST)
-    is_today = (target_date.date() == now_dt.date())
+{AI_DAY_RULES}
+- 出力はJSONのみ。形は指定のスキーマに従う（日付・天気・気温・降水の欄はシステム側で事実セットから埋める）。
+- 複数日を頼まれたら、対象日の順に1日ぶんのレコードを並べた配列を返す（欠けは禁止）。
 
-    high, low = decide_high_low(area_data, jma_day_data or {}, is_today=is_today)
+{AI_DAY_REPORT_LAYOUT}
+""".strip()
 
-    jma_rain_fallback = decide_rain_display_jma(jma_day_data or {})
-    if not slot_weather:
-        slot_weather = {
-            "morning": {"weather": w_emoji, "temp": "-", "temp_high": "-", "temp_low": "-", "humidity": "-", "rain": jma_rain_fallback, "wcode": None},
-            "daytime": {"weather": w_emoji, "temp": "-", "temp_high": "-", "temp_low": "-", "humidity": "-", "rain": jma_rain_fallback, "wcode": None},
-            "night": {"weather": w_emoji, "temp": "-", "temp_high": "-", "temp_low": "-", "humidity": "-", "rain": jma_rain_fallback, "wcode": None},
-        }
+def _job_keys_schema():
+    return {"type": "OBJECT", "properties": {k: {"type": "STRING"} for k in JOB_KEYS}, "required": list(JOB_KEYS)}
 
-    rain_am, rain_pm, rain_ng = decide_rain_am_pm(slot_weather, jma_fallback=jma_rain_fallback)
-    rain_display = f"午前{rain_am} / 午後{rain_pm}"
+# 1日ぶんの responseSchema（fill_ai_day が埋める日付・天気の欄は含めない）
+AI_DAY_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "rank": {"type": "STRING", "enum": ["S", "A", "B", "C"]},
+        "event_traffic_facts": {"type": "ARRAY", "items": {"type": "STRING"}, "maxItems": 6},
+        "peak_windows": _job_keys_schema(),
+        "job_actions": _job_keys_schema(),
+        "daily_schedule_and_impact": {"type": "STRING"},
+        "timeline": {
+            "type": "OBJECT",
+            "properties": {
+                name: {"type": "OBJECT", "properties": {"advice": _job_keys_schema()}, "required": ["advice"]}
+                for name in ["morning", "daytime", "night"]
+            },
+            "required": ["morning", "daytime", "night"],
+        },
+        "confidence": {"type": "INTEGER"},
+    },
+    "required": ["rank", "event_traffic_facts", "peak_windows", "job_actions", "daily_schedule_and_impact", "timeline", "confidence"],
+}
 
-    facts_list = to_facts_list(event_traffic_text, max_items=6)
-    facts_text_for_ai = "\n".join([f"- {x}" for x in facts_list]) if facts_list else "(特段の情報なし)"
+def ai_days_batch_schema(n_days):
+    """まとめ生成は対象日の順の配列（日付キーのオブジェクトにすると1日ぶんのスキーマが日数ぶん並ぶ）"""
+    return {"type": "ARRAY", "items": AI_DAY_RESPONSE_SCHEMA, "minItems": n_days, "maxItems": n_days}
 
-    facts = (
-        f"[Area]\n{area_data['name']}\n特徴: {area_data.get('feature','')}\n\n"
-        f"[Date]\n{date_str} / {full_date}\n\n"
-        f"[Weather Overview]\n"
-        f"天気: {w_emoji} (JMA code {w_code})\n"
-        f"最高: {high}℃ / 最低: {low}℃\n"
-        f"降水（Open-Meteo/10%丸め）: 午前{rain_am} / 午後{rain_pm} / 夜{rain_ng}\n"
-        f"警報注意報: {warning_text}\n\n"
-        f"[Time Slots Weather]（Open-Meteo/10%丸め）\n"
-        f"朝(06-12): {slot_weather['morning']['weather']} / 気温 {slot_weather['morning']['temp']}（高{slot_weather['morning']['temp_high']} 低{slot_weather['morning']['temp_low']}）/ 湿度 {slot_weather['morning']['humidity']} / 降水 {slot_weather['morning']['rain']}\n"
-        f"昼(12-18): {slot_weather['daytime']['weather']} / 気温 {slot_weather['daytime']['temp']}（高{slot_weather['daytime']['temp_high']} 低{slot_weather['daytime']['temp_low']}）/ 湿度 {slot_weather['daytime']['humidity']} / 降水 {slot_weather['daytime']['rain']}\n"
-        f"夜(18-24): {slot_weather['night']['weather']} / 気温 {slot_weather['night']['temp']}（高{slot_weather['night']['temp_high']} 低{slot_weather['night']['temp_low']}）/ 湿度 {slot_weather['night']['humidity']} / 降水 {slot_weather['night']['rain']}\n\n"
+def ai_day_stream_check():
+    """1日ぶん: 最上位がオブジェクトで、閉じた時点で必須キーが揃っていること"""
+    return JsonStreamCheck(required=AI_DAY_RESPONSE_SCHEMA["required"], record_depth=1, top="{")
+
+def ai_days_batch_stream_check():
+    """まとめ: 配列（or 日付キーのオブジェクト）の中の1日ぶんが閉じるたびに必須キーを確認"""
+    return JsonStreamCheck(required=AI_DAY_RESPONSE_SCHEMA["required"], record_depth=2, top="[{")
+
+def build_ai_day_context(area_data, target_date, day_weather, event_traffic_text):
+    """
+    1日ぶんのAI生成に使う値（事実セット・安全埋め用の値）をまとめて作る
+    天気は WeatherGrid.day_weather の値をそのまま使う
+    単発生成とまとめ生成の両方で使う
+    """
+    date_str = target_date.strftime("%Y-%m-%d")
+    full_date = full_date_label(target_date)
+
+    w_emoji = day_weather["w_emoji"]
+    high, low = day_weather["high"], day_weather["low"]
+    rain_am, rain_pm, rain_ng = day_weather["rain_am"], day_weather["rain_pm"], day_weather["rain_ng"]
+    rain_display = day_weather["rain_display"]
+    warning_text = day_weather["warning_text"]
+    slot_weather = day_weather["slot_weather"]
+
+    facts_list = to_facts_list(event_traffic_text, max_items=6)
+    facts_text_for_ai = "\n".join([f"- {x}" for x in facts_list]) if facts_list else "(特段の情報なし)"
+
+    facts_area = f"[Area]\n{area_data['name']}\n特徴: {area_data.get('feature','')}\n\n"
+    facts_day = (
+        f"[Date]\n{date_str} / {full_date}\n\n"
+        f"{day_weather['weather_facts']}"
         f"[Event & Traffic Facts]\n{facts_text_for_ai}\n"
     )
 
-    # JSONスキーマ例は dict→json.dumps で安全に混ぜる（f-string事故回避）
-    schema_example = {
-        "date": full_date,
-        "is_long_term": False,
-        "rank": "S/A/B/C",
-        "weather_overview": {
-            "condition": w_emoji,
-            "high": f"最高{high}℃",
-            "low": f"最低{low}℃",
-            "rain": rain_display,
-            "rain_am": rain_am,
-            "rain_pm": rain_pm,
-            "rain_night": rain_ng,
-            "warning": warning_text,
-        },
-        "event_traffic_facts": [],
-        "peak_windows": {k: "" for k in JOB_KEYS},
-        "job_actions": {k: "" for k in JOB_KEYS},
-        "daily_schedule_and_impact": "読みやすいレポート本文（改行OK。最後に職業別の要点も入れる）",
-        "timeline": {
-            "morning": {
-                "weather": slot_weather["morning"]["weather"],
-                "temp": slot_weather["morning"]["temp"],
-                "temp_high": slot_weather["morning"]["temp_high"],
-                "temp_low": slot_weather["morning"]["temp_low"],
-                "humidity": slot_weather["morning"]["humidity"],
-                "rain": slot_weather["morning"]["rain"],
-                "advice": {k: "" for k in JOB_KEYS},
-            },
-            "daytime": {
-                "weather": slot_weather["daytime"]["weather"],
-                "temp": slot_weather["daytime"]["temp"],
-                "temp_high": slot_weather["daytime"]["temp_high"],
-                "temp_low": slot_weather["daytime"]["temp_low"],
-                "humidity": slot_weather["daytime"]["humidity"],
-                "rain": slot_weather["daytime"]["rain"],
-                "advice": {k: "" for k in JOB_KEYS},
-            },
-            "night": {
-                "weather": slot_weather["night"]["weather"],
-                "temp": slot_weather["night"]["temp"],
-                "temp_high": slot_weather["night"]["temp_high"],
-                "temp_low": slot_weather["night"]["temp_low"],
-                "humidity": slot_weather["night"]["humidity"],
-                "rain": slot_weather["night"]["rain"],
-                "advice": {k: "" for k in JOB_KEYS},
-            },
-        },
-        "confidence": 0,
+    return {
+        "date_str": date_str,
+        "full_date": full_date,
+        "w_emoji": w_emoji,
+        "high": high,
+        "low": low,
+        "rain_am": rain_am,
+        "rain_pm": rain_pm,
+        "rain_ng": rain_ng,
+        "rain_display": rain_display,
+        "warning_text": warning_text,
+        "slot_weather": slot_weather,
+        "facts_list": facts_list,
+        "facts_area": facts_area,
+        "facts_day": facts_day,
     }
-    schema_text = json.dumps(schema_example, ensure_ascii=False, indent=2)
 
-    prompt = f"""
-あなたは世界トップクラスの戦略コンサルタントです。
-以下の事実セットから、職業ごとに「意思決定が変わる」具体策を作ってください。
+def fill_ai_day(j, ctx):
+    """
+    Geminiが返した1日ぶんのdictに最低限の安全埋めをする（Flutter側で落ちないように）
+    dictでなければ None
+    """
+    if not isinstance(j, dict):
+        return None
 
-【ルール】
-- フェイク禁止。事実セットにない固有名詞を勝手に作らない。
-- 曖昧なら「未確認」と明記。
-- 命令口調は禁止。
-- 一般論だけは禁止。必ず事実セット（天候/交通/イベント）に結びつける。
-- peak_windows / job_actions / timeline.*.advice は必ず全職業キー（taxi/delivery/restaurant/retail/hotel）を埋める。
-- event_traffic_facts は最大6つ。無ければ []。
+    # date / is_long_term はスキーマに無い（こちらで決める）。モデルが返しても上書きする
+    j["date"] = ctx["full_date"]
+    j["is_long_term"] = False
+    j.setdefault("rank", "C")
 
-【出力はJSONのみ】
-次のスキーマを満たすJSONを返してください（例）:
-{schema_text}
+    wo = j.get("weather_overview") or {}
+    wo.setdefault("condition", ctx["w_emoji"])
+    wo.setdefault("high", f"最高{ctx['high']}℃")
+    wo.setdefault("low", f"最低{ctx['low']}℃")
+    wo.setdefault("rain", ctx["rain_display"])
+    wo.setdefault("rain_am", ctx["rain_am"])
+    wo.setdefault("rain_pm", ctx["rain_pm"])
+    wo.setdefault("rain_night", ctx["rain_ng"])
+    wo.setdefault("warning", ctx["warning_text"])
+    j["weather_overview"] = wo
 
-【daily_schedule_and_impact に含める構成】
-- ■Event & Traffic（事実セットの範囲で段落分け要約）
-- ■総括（短め）
-- ■職業別の打ち手（要点）
-  ・タクシー:
-  ・デリバリー:
-  ・飲食店:
-  ・小売:
-  ・ホテル観光:
+    et = j.get("event_traffic_facts")
+    if not isinstance(et, list):
+        et = ctx["facts_list"]
+    j["event_traffic_facts"] = [str(x).strip() for x in et if str(x).strip()][:6]
 
-【事実セット】
-{facts}
-""".strip()
+    pw = j.get("peak_windows") or {}
+    for k in JOB_KEYS:
+        pw.setdefault(k, "")
+    j["peak_windows"] = {k: str(pw.get(k, "")).strip() for k in JOB_KEYS}
+
+    ja = j.get("job_actions") or {}
+    for k in JOB_KEYS:
+        ja.setdefault(k, "")
+    j["job_actions"] = {k: str(ja.get(k, "")).strip() for k in JOB_KEYS}
+
+    j.setdefault("daily_schedule_and_impact", "")
+
+    tl = j.get("timeline")
+    if not isinstance(tl, dict):
+        tl = {}
 
-    res = call_gemini_json(prompt)
+    slot_weather = ctx["slot_weather"]
+    for slot_name in ["morning", "daytime", "night"]:
+        slot_src = tl.get(slot_name) if isinstance(tl.get(slot_name), dict) else {}
+        base = slot_weather.get(slot_name, {})
+
+        # 天気/温度などは Open-Meteo を優先して固定
+        slot_src["weather"] = str(slot_src.get("weather") or base.get("weather") or "☁️")
+        slot_src["temp"] = str(slot_src.get("temp") or base.get("temp") or "-")
+        slot_src["temp_high"] = str(slot_src.get("temp_high") or base.get("temp_high") or "-")
+        slot_src["temp_low"] = str(slot_src.get("temp_low") or base.get("temp_low") or "-")
+        slot_src["humidity"] = str(slot_src.get("humidity") or base.get("humidity") or "-")
+        slot_src["rain"] = str(slot_src.get("rain") or base.get("rain") or "-")
+
+        advice = slot_src.get("advice") if isinstance(slot_src.get("advice"), dict) else {}
+        for k in JOB_KEYS:
+            advice.setdefault(k, "")
+        slot_src["advice"] = {k: str(advice.get(k, "")).strip() for k in JOB_KEYS}
+
+        tl[slot_name] = slot_src
+
+    j["timeline"] = tl
+    j["confidence"] = int(j.get("confidence") or 0)
+    return j
+
+@instrumented("ai_day")
+def generate_ai_day(area_data, target_date, day_weather, event_traffic_text):
+    """
+    Flutter(main.dart)のスキーマに合わせたJSONをGeminiで生成する（5職業固定）
+    - peak_windows / job_actions / timeline.*.advice は全職業キー必須
+    - event_traffic_facts は最大6、無ければ []
+    """
+    if not API_KEY:
+        return None
+
+    ctx = build_ai_day_context(area_data, target_date, day_weather, event_traffic_text)
+    prompt = f"【事実セット】\n{ctx['facts_area']}{ctx['facts_day']}".strip()
+
+    res = call_gemini_json(
+        prompt, system=AI_DAY_SYSTEM_INSTRUCTION, schema=AI_DAY_RESPONSE_SCHEMA, stream_check=ai_day_stream_check
+    )
     if not res:
         return None
 
     try:
-        j = json.loads(extract_json_block(res))
-
-        # --- 最低限の安全埋め（Flutter側で落ちないように） ---
-        j.setdefault("date", full_date)
-        j.setdefault("is_long_term", False)
-        j.setdefault("rank", "C")
-
-        wo = j.get("weather_overview") or {}
-        wo.setdefault("condition", w_emoji)
-        wo.setdefault("high", f"最高{high}℃")
-        wo.setdefault("low", f"最低{low}℃")
-        wo.setdefault("rain", rain_display)
-        wo.setdefault("rain_am", rain_am)
-        wo.setdefault("rain_pm", rain_pm)
-        wo.setdefault("rain_night", rain_ng)
-        wo.setdefault("warning", warning_text)
-        j["weather_overview"] = wo
-
-        et = j.get("event_traffic_facts")
-        if not isinstance(et, list):
-            et = facts_list
-        j["event_traffic_facts"] = [str(x).strip() for x in et if str(x).strip()][:6]
-
-        pw = j.get("peak_windows") or {}
-        for k in JOB_KEYS:
-            pw.setdefault(k, "")
-        j["peak_windows"] = {k: str(pw.get(k, "")).strip() for k in JOB_KEYS}
+        return fill_ai_day(json.loads(extract_json_block(res)), ctx)
+    except:
+        return None
 
-        ja = j.get("job_actions") or {}
-        for k in JOB_KEYS:
-            ja.setdefault(k, "")
-        j["job_actions"] = {k: str(ja.get(k, "")).strip() for k in JOB_KEYS}
+# =========================
+# AI生成（直近AI_DAYS日をまとめて1回）
+# =========================
+def _parse_ai_days_batch(text, date_strs):
+    """
+    まとめ生成の応答を dict[YYYY-MM-DD] = 1日ぶんのdict(or None) に分解
+    日付キーのオブジェクト / 配列 のどちらでも受ける
+    """
+    out = {d: None for d in date_strs}
+    try:
+        parsed = json.loads(text)
+    except:
+        try:
+            parsed = json.loads(extract_json_block(text))
+        except:
+            return out
 
-        j.setdefault("daily_schedule_and_impact", "")
+    # {"days": [...]} のように1段包まれて返ることがある
+    if isinstance(parsed, dict) and not any(d in parsed for d in date_strs):
+        inner = [v for v in parsed.values() if isinstance(v, (list, dict))]
+        if len(inner) == 1:
+            parsed = inner[0]
 
-        tl = j.get("timeline")
-        if not isinstance(tl, dict):
-            tl = {}
+    if isinstance(parsed, dict):
+        for d in date_strs:
+            out[d] = parsed.get(d)
+    elif isinstance(parsed, list):
+        for i, d in enumerate(date_strs):
+            if i < len(parsed):
+                out[d] = parsed[i]
+    return out
+
+@instrumented("ai_days_batch", ok=lambda r: bool(r) and all(r.values()))
+def generate_ai_days_batch(area_data, day_inputs, retry_single=True):
+    """
+    同じエリアの複数日を1回のGemini呼び出しで生成する
+    day_inputs: [{target_date, day_weather, event_traffic_text}, ...]
+    返り値: dict[YYYY-MM-DD] = 1日ぶんのdict（生成できなかった日は None）
+    - エリア情報は1回だけ送り、日付ごとの事実セットを並べる（指示とスキーマは固定部分）
+    - 壊れていた日だけ generate_ai_day で単発リトライ（retry_single=False なら None のまま返す。
+      AiDayScheduler は締切を見ながら自分のキューで単発に回す）
+    """
+    ctxs = [build_ai_day_context(area_data=area_data, **di) for di in day_inputs]
+    date_strs = [c["date_str"] for c in ctxs]
+    if not API_KEY or not ctxs:
+        return {d: None for d in date_strs}
 
-        for slot_name in ["morning", "daytime", "night"]:
-            slot_src = tl.get(slot_name) if isinstance(tl.get(slot_name), dict) else {}
-            base = slot_weather.get(slot_name, {})
+    facts_by_day = "\n".join([f"=== {c['date_str']} ===\n{c['facts_day']}" for c in ctxs])
 
-            # 天気/温度などは Open-Meteo を優先して固定
-            slot_src["weather"] = str(slot_src.get("weather") or base.get("weather") or "☁️")
-            slot_src["temp"] = str(slot_src.get("temp") or base.get("temp") or "-")
-            slot_src["temp_high"] = str(slot_src.get("temp_high") or base.get("temp_high") or "-")
-            slot_src["temp_low"] = str(slot_src.get("temp_low") or base.get("temp_low") or "-")
-            slot_src["humidity"] = str(slot_src.get("humidity") or base.get("humidity") or "-")
-            slot_src["rain"] = str(slot_src.get("rain") or base.get("rain") or "-")
+    prompt = f"""
+対象日（全{len(date_strs)}日、欠けは禁止）: {", ".join(date_strs)}
 
-            advice = slot_src.get("advice") if isinstance(slot_src.get("advice"), dict) else {}
-            for k in JOB_KEYS:
-                advice.setdefault(k, "")
-            slot_src["advice"] = {k: str(advice.get(k, "")).strip() for k in JOB_KEYS}
+【エリア】
+{ctxs[0]["facts_area"]}
+【日付ごとの事実セット】
+{facts_by_day}
+""".strip()
 
-            tl[slot_name] = slot_src
+    res = call_gemini_json(
+        prompt, timeout=AI_BATCH_TIMEOUT, system=AI_DAY_SYSTEM_INSTRUCTION, schema=ai_days_batch_schema(len(date_strs)),
+        stream_check=ai_days_batch_stream_check,
+    )
+    raw_by_date = _parse_ai_days_batch(res, date_strs) if res else {d: None for d in date_strs}
 
-        j["timeline"] = tl
-        j["confidence"] = int(j.get("confidence") or 0)
-        return j
-    except:
-        return None
+    out = {}
+    for ctx, di in zip(ctxs, day_inputs):
+        d = ctx["date_str"]
+        day = None
+        try:
+            day = fill_ai_day(raw_by_date.get(d), ctx)
+        except:
+            day = None
+
+        if day is None and retry_single:
+            print(f"🔁 {area_data['name']} / {d} まとめ生成NG → 単発リトライ", flush=True)
+            day = generate_ai_day(area_data=area_data, **di)
+        out[d] = day
+    return out
+
+# =========================
+# ルールベース需要エンジン（AIなしで1日ぶんを作る）
+# =========================
+RANK_ORDER = ["C", "B", "A", "S"]
+RULE_RANK_THRESHOLDS = [(3.0, "S"), (2.0, "A"), (1.0, "B")]
+RULE_CONFIDENCE = 30
+RULE_RAIN_POP = 50   # この降水確率(%)以上の時間帯を「雨」として扱う
+
+# feature の文言 → カテゴリ
+FEATURE_CATEGORY_KEYWORDS = {
+    "tourism": ["観光", "インバウンド", "人力車", "美術館", "夜景", "ディズニー", "USJ", "海遊館", "宮島", "国際通り", "食べ歩き", "クルーズ"],
+    "nightlife": ["夜の", "夜間", "歓楽街", "接待", "屋台", "眠らない"],
+    "business": ["ビジネス", "出張", "サラリーマン", "企業"],
+    "transit": ["空港", "新幹線", "玄関口", "送迎", "乗降客", "リニア"],
+    "event": ["イベント", "ビッグサイト", "まつり"],
+    "residential": ["住民", "住宅", "生活"],
+    "weather_sensitive": ["天候", "雪", "台風", "海風"],
+}
+
+# カテゴリごとの時間帯の需要の重み（ピーク時間帯の判定用）
+CATEGORY_SLOT_WEIGHTS = {
+    "tourism": {"morning": 0.5, "daytime": 1.0, "night": 0.5},
+    "nightlife": {"morning": 0.0, "daytime": 0.0, "night": 1.5},
+    "business": {"morning": 1.0, "daytime": 0.5, "night": 0.5},
+    "transit": {"morning": 1.0, "daytime": 0.5, "night": 0.5},
+    "event": {"morning": 0.0, "daytime": 1.0, "night": 0.5},
+    "residential": {"morning": 0.5, "daytime": 0.0, "night": 1.0},
+}
+
+SLOT_LABELS_JA = {"morning": "朝", "daytime": "昼", "night": "夜"}
+
+# 職業 × 時間帯 のピーク時間帯の文言
+RULE_PEAK_WINDOWS = {
+    "taxi": {"morning": "07:00-09:30 通勤・空港送迎", "daytime": "12:00-15:00 観光・商談移動", "night": "21:00-翌1:00 終電前後"},
+    "delivery": {"morning": "07:00-09:00 朝食", "daytime": "11:00-13:30 ランチ", "night": "18:00-21:00 ディナー"},
+    "restaurant": {"morning": "07:00-09:00 モーニング", "daytime": "11:30-13:30 ランチ", "night": "18:30-22:00 ディナー・二次会"},
+    "retail": {"morning": "10:00-12:00 開店直後", "daytime": "13:00-17:00 買い回り", "night": "18:00-20:00 帰宅前"},
+    "hotel": {"morning": "07:00-10:00 チェックアウト", "daytime": "14:00-17:00 チェックイン", "night": "19:00-22:00 当日予約"},
+}
+
+# 職業ごとの打ち手（雨 / 警報 / 通常）
+RULE_JOB_ACTIONS = {
+    "taxi": {
+        "rain": "{rain_slots}の雨で短距離の乗車が増えやすい。駅・繁華街の乗り場近くでの待機が有効。",
+        "warning": "警報・注意報で公共交通の乱れが出ると振替需要が出やすい。駅周辺の状況確認が有効。",
+        "normal": "{peak}帯の需要が中心。{category_hint}",
+    },
+    "delivery": {
+        "rain": "{rain_slots}の雨で注文が増えやすい一方、配達時間が延びやすい。稼働を厚めにし、防水対策を。",
+        "warning": "警報・注意報の時間帯は安全を優先した稼働計画が必要。注文集中に備えた待機場所の確保が有効。",
+        "normal": "食事時間帯（ランチ/ディナー）の稼働が中心。{category_hint}",
+    },
+    "restaurant": {
+        "rain": "{rain_slots}の雨で来店が落ちやすい。テイクアウト・デリバリー導線の強化が有効。",
+        "warning": "警報・注意報で客足が読みにくい。仕込み量は控えめにし、当日の予約状況で調整するのが安全。",
+        "normal": "{peak}帯の客数が中心。{category_hint}",
+    },
+    "retail": {
+        "rain": "{rain_slots}の雨で来店が減りやすい。雨具・日用品の店頭訴求が有効。",
+        "warning": "警報・注意報で客足が落ちやすい。人員配置は最小限から様子を見るのが安全。",
+        "normal": "{peak}帯の来店が中心。{category_hint}",
+    },
+    "hotel": {
+        "rain": "{rain_slots}の雨で館内滞在・飲食の利用が増えやすい。館内サービスの案内が有効。",
+        "warning": "警報・注意報で交通が乱れると当日キャンセル/延泊が出やすい。フロント体制の確保が有効。",
+        "normal": "チェックイン時間帯の対応が中心。{category_hint}",
+    },
+}
+
+CATEGORY_HINTS_JA = {
+    "tourism": "観光客の動きに合わせた対応が効きやすい。",
+    "nightlife": "夜間の人出に合わせた対応が効きやすい。",
+    "business": "平日のビジネス需要に合わせた対応が効きやすい。",
+    "transit": "空港・ターミナルの発着に合わせた対応が効きやすい。",
+    "event": "イベント開催の有無で需要が大きく変わるため、当日の開催情報の確認が有効。",
+    "residential": "住民の生活時間帯に合わせた対応が効きやすい。",
+}
+
+# 時間帯 × 雨/通常 の一言アドバイス
+RULE_SLOT_ADVICE = {
+    "taxi": {"rain": "雨で乗車需要が増えやすい", "normal": "{slot}の通常需要"},
+    "delivery": {"rain": "雨で注文増・配達遅延に注意", "normal": "{slot}の通常需要"},
+    "restaurant": {"rain": "雨で客足減、テイクアウト強化", "normal": "{slot}の来店に備える"},
+    "retail": {"rain": "雨で客足減、雨具の訴求", "normal": "{slot}の来店に備える"},
+    "hotel": {"rain": "雨で館内利用が増えやすい", "normal": "{slot}の館内対応"},
+}
+
+_CATEGORY_CACHE = {}
+
+def area_categories(area_data):
+    """feature の文言からカテゴリ（tourism / nightlife / ...）の集合を返す"""
+    feature = area_data.get("feature", "")
+    cats = _CATEGORY_CACHE.get(feature)
+    if cats is None:
+        cats = frozenset(c for c, words in FEATURE_CATEGORY_KEYWORDS.items() if any(w in feature for w in words))
+        _CATEGORY_CACHE[feature] = cats
+    return cats
+
+def rank_from_score(score):
+    for threshold, rank in RULE_RANK_THRESHOLDS:
+        if score >= threshold:
+            return rank
+    return "C"
+
+def rule_day_score(categories, target_date, slot_pops=None, warning=False, t_high=None, t_low=None):
+    """
+    1日の需要スコアと時間帯ごとのスコアを返す
+    - カレンダー（金土・祝日・祝前日）とエリアのカテゴリだけでも計算できる（天気は分かる日だけ）
+    - slot_pops: {"morning": 降水確率 or None, ...}
+    返り値: (score, {"morning": s, "daytime": s, "night": s})
+    """
+    wd = target_date.weekday()
+    date_str = target_date.strftime("%Y-%m-%d")
+    holiday = date_str in HOLIDAYS_2026
+    holiday_eve = (target_date + timedelta(days=1)).strftime("%Y-%m-%d") in HOLIDAYS_2026
+    day_off = holiday or wd >= 5
+
+    score = 0.0
+    if wd in (4, 5) or holiday or holiday_eve:
+        score += 1.0
+    if "tourism" in categories and day_off:
+        score += 1.0
+    if "nightlife" in categories and (wd in (4, 5) or holiday_eve):
+        score += 1.0
+    if "business" in categories and not day_off:
+        score += 0.5
+    if "event" in categories and day_off:
+        score += 0.5
+
+    slot_scores = {name: 0.0 for name in SLOT_LABELS_JA}
+    for c in categories:
+        for name, w in CATEGORY_SLOT_WEIGHTS.get(c, {}).items():
+            slot_scores[name] += w
+
+    pops = [p for p in (slot_pops or {}).values() if p is not None]
+    if pops and max(pops) >= RULE_RAIN_POP:
+        score += 1.0
+        if "tourism" in categories or "weather_sensitive" in categories:
+            score -= 0.5
+    for name, p in (slot_pops or {}).items():
+        if p is not None and p >= RULE_RAIN_POP:
+            slot_scores[name] += 0.5
+    if warning:
+        score += 1.0
+        if "transit" in categories:
+            score += 0.5
+    if (t_high is not None and t_high >= 33) or (t_low is not None and t_low <= 0):
+        score += 0.5
+
+    return score, slot_scores
+
+def build_rule_day(area_data, target_date, day_weather, event_traffic_text):
+    """
+    ルールベースで1日ぶんの完全レコードを作る（AIが使えない/失敗した日、プレランクで低い日）
+    ランクと時間帯スコアは WeatherGrid が計算済みのものを使う
+    """
+    ctx = build_ai_day_context(area_data, target_date, day_weather, event_traffic_text)
+    rule = day_weather["rule"]
+    peak_slot, job_actions, peak_windows, timeline = rule_day_plan(area_data, rule)
+
+    summary = f"{ctx['full_date']} は {ctx['w_emoji']} 最高{ctx['high']}℃/最低{ctx['low']}℃、降水 {ctx['rain_display']}。"
+    if rule["warning"]:
+        summary += "警報・注意報が発表中。"
+    summary += f"需要のピークは{SLOT_LABELS_JA[peak_slot]}の時間帯の見込み（ルールベース推定）。"
+    lines = [f"【{ctx['full_date'].split(' ')[0]}のルールベース予測】", ""]
+    if ctx["facts_list"]:
+        lines += ["■Event & Traffic"] + [f"- {x}" for x in ctx["facts_list"]] + [""]
+    lines += ["■総括", summary, "", "■職業別の打ち手（要点）"]
+    lines += [f"・{JOB_LABELS_JA[k]}: {job_actions[k]}" for k in JOB_KEYS]
+
+    return fill_ai_day({
+        "rank": rule["rank"],
+        "event_traffic_facts": ctx["facts_list"],
+        "peak_windows": peak_windows,
+        "job_actions": job_actions,
+        "daily_schedule_and_impact": "\n".join(lines) + "\n",
+        "timeline": timeline,
+        "confidence": RULE_CONFIDENCE,
+    }, ctx)
+
+def rule_day_plan(area_data, rule):
+    """
+    ルールのスコアから (ピーク時間帯, job_actions, peak_windows, timeline（advice だけ）) を作る
+    rule: WeatherGrid のルール（rank / slot_scores / rain_slots / warning）
+    """
+    categories = area_categories(area_data)
+    slot_scores = rule["slot_scores"]
+    rain_slots = [name for name in SLOT_LABELS_JA if name in rule["rain_slots"]]
+    peak_slot = max(SLOT_LABELS_JA, key=lambda name: slot_scores.get(name, 0))
+
+    condition = "warning" if rule["warning"] else ("rain" if rain_slots else "normal")
+    category_hint = next((CATEGORY_HINTS_JA[c] for c in CATEGORY_HINTS_JA if c in categories), "")
+    fmt = {
+        "rain_slots": "・".join(SLOT_LABELS_JA[n] for n in rain_slots) or "終日",
+        "peak": SLOT_LABELS_JA[peak_slot],
+        "category_hint": category_hint,
+    }
+
+    job_actions = {k: RULE_JOB_ACTIONS[k][condition].format(**fmt).strip() for k in JOB_KEYS}
+    peak_windows = {}
+    for k in JOB_KEYS:
+        # 飲食/デリバリーは食事時間帯に寄せ、それ以外はエリアのピーク時間帯
+        slot = peak_slot
+        if k in ("delivery", "restaurant") and peak_slot == "morning":
+            slot = "daytime"
+        peak_windows[k] = RULE_PEAK_WINDOWS[k][slot]
+
+    timeline = {}
+    for name in SLOT_LABELS_JA:
+        kind = "rain" if name in rain_slots else "normal"
+        timeline[name] = {
+            "advice": {k: RULE_SLOT_ADVICE[k][kind].format(slot=SLOT_LABELS_JA[name]) for k in JOB_KEYS}
+        }
+    return peak_slot, job_actions, peak_windows, timeline
+
+def long_term_rule_plan(area_data, rule):
+    """
+    天気の無い日（long_term）のルール部分: カレンダーとエリア特性から peak_windows / job_actions / timeline.advice と一言
+    中身はピーク時間帯とカテゴリだけで決まるので、v2 ではエリアごとに数種類にまとまる
+    """
+    peak_slot, job_actions, peak_windows, timeline = rule_day_plan(area_data, rule)
+    return {
+        "peak_windows": peak_windows,
+        "job_actions": job_actions,
+        "timeline": {name: slot["advice"] for name, slot in timeline.items()},
+        "outlook": f"需要のピークは{SLOT_LABELS_JA[peak_slot]}の時間帯の見込み（曜日・祝日とエリア特性からのルールベース推定）。",
+    }
+
+# =========================
+# 差分再生成（事実セットが前回と同じ日はAIを呼ばずに再利用）
+# =========================
+def ai_day_fingerprint(area_data, day_input):
+    """
+    generate_ai_day が使う事実セットのハッシュと、その日の表示用日付を返す
+    モデルが変わったら別物として扱う
+    """
+    ctx = build_ai_day_context(area_data=area_data, **day_input)
+    raw = f"{GEMINI_MODEL}\n{ctx['facts_area']}{ctx['facts_day']}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest(), ctx["full_date"]
+
+class IncrementalStore:
+    """
+    前回の出力 + サイドカー(fingerprints) を読み、ハッシュが一致する日のレコードを返す
+    今回AIで作れた日（再利用分を含む）のハッシュだけを次回用に書き出す
+    reuse=False のときは記録だけする（通常実行でも次回の差分実行に備える）
+    """
+    def __init__(self, output_paths, fingerprint_path, reuse=True):
+        self.fingerprint_path = fingerprint_path
+        self._lock = threading.Lock()
+        self._new = {}
+        self.reused = 0
+        self.missing = 0
+
+        self._prev_days = {}
+        self._prev_fp = {}
+        if not reuse:
+            return
+
+        # v2 / 旧フォーマットのうち最初に読めたもの（どちらも日リストに戻して使う）
+        prev = None
+        for path in output_paths:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    prev = denormalize_output(json.load(f))
+                break
+            except Exception as e:
+                print(f"差分モード: 前回出力を読めません: {path} ({e})", flush=True)
+
+        if isinstance(prev, dict):
+            # 表示用日付ではなく YYYY-MM-DD で引く（フィンガープリントと同じキー）
+            for area_key, days in prev.items():
+                if isinstance(days, list):
+                    self._prev_days[area_key] = {
+                        date_key_from_label(d.get("date")): d
+                        for d in days if isinstance(d, dict) and not d.get("is_long_term")
+                    }
+
+        try:
+            with open(fingerprint_path, "r", encoding="utf-8") as f:
+                self._prev_fp = json.load(f).get("areas", {})
+        except Exception as e:
+            print(f"差分モード: フィンガープリントを読めません ({e})", flush=True)
+
+    def reuse(self, area_key, date_key, fingerprint):
+        prev_fp = (self._prev_fp.get(area_key) or {}).get(date_key)
+        if prev_fp != fingerprint:
+            return None
+        day = (self._prev_days.get(area_key) or {}).get(date_key)
+        with self._lock:
+            if day is not None:
+                self.reused += 1
+            else:
+                # ハッシュは一致したのに前回出力に日が無い（日付が読めない等）。0件再利用の見落とし防止
+                self.missing += 1
+        return day
+
+    def record(self, area_key, date_key, fingerprint):
+        with self._lock:
+            self._new.setdefault(area_key, {})[date_key] = fingerprint
+
+    def recorded(self, area_key):
+        with self._lock:
+            return dict(self._new.get(area_key) or {})
+
+    def save(self):
+        with self._lock:
+            areas = dict(self._new)
+        write_fingerprints(self.fingerprint_path, areas)
+
+def write_fingerprints(path, areas):
+    """{area_key: {date_key: hash}} をサイドカーに書く（--merge でも使う）"""
+    data = {"version": 1, "model": GEMINI_MODEL, "areas": areas}
+    return write_json_atomic(path, data, sort_keys=True)
+
+# main で IncrementalStore が入る（再利用するのは --incremental のときだけ）
+INCREMENTAL_STORE = None
+
+# =========================
+# チェックポイント（中断した実行の再開）
+# =========================
+class RunCheckpoint:
+    """
+    実行途中の結果をディスクに残し、--resume のときは続きから再開する
+    - <dir>/<YYYY-MM-DD>/days/<area_key>/<YYYY-MM-DD>.json: 生成できた日別AIレコード
+    - <dir>/<YYYY-MM-DD>/areas/<area_key>.json: 完了したエリアの RUN_DAYS 日ぶん（+フィンガープリント）
+    実行日（JST）ごとに分け、別の日のチェックポイントは起動時に消す
+    resume=False のときは今日のぶんも消して最初から（保存はする）
+    """
+    def __init__(self, root, run_date, resume=False):
+        self.dir = os.path.join(root, run_date)
+        self.resume = resume
+        self._lock = threading.Lock()
+        if os.path.isdir(root):
+            for name in os.listdir(root):
+                if name != run_date or not resume:
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _area_path(self, area_key):
+        return os.path.join(self.dir, "areas", f"{area_key}.json")
+
+    def _day_path(self, area_key, date_key):
+        return os.path.join(self.dir, "days", area_key, f"{date_key}.json")
+
+    def _load(self, path):
+        if not self.resume:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"チェックポイントを読めません ({path}): {e}", flush=True)
+            return None
+
+    def save_days(self, area_key, days_by_date):
+        for date_key, day in days_by_date.items():
+            if day:
+                write_json_atomic(self._day_path(area_key, date_key), day, separators=(",", ":"))
+
+    def load_day(self, area_key, date_key):
+        day = self._load(self._day_path(area_key, date_key))
+        return day if isinstance(day, dict) else None
+
+    def save_area(self, area_key, days, fingerprints=None):
+        data = {"days": days, "fingerprints": fingerprints or {}}
+        write_json_atomic(self._area_path(area_key), data, separators=(",", ":"))
+
+    def load_area(self, area_key):
+        """返り値: (RUN_DAYS日ぶんのリスト, フィンガープリント) / 無ければ None"""
+        data = self._load(self._area_path(area_key))
+        if not isinstance(data, dict) or not isinstance(data.get("days"), list):
+            return None
+        return data["days"], data.get("fingerprints") or {}
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+# main で RunCheckpoint が入る
+CHECKPOINT = None
+
+def checkpoint_area(area_key, area_forecasts):
+    """
+    エリアを完了済みとして保存する
+    日別AIがフォールバックになったエリアは呼ばない（再開時にその日だけ作り直す）
+    """
+    if CHECKPOINT is None:
+        return
+    store = INCREMENTAL_STORE
+    try:
+        CHECKPOINT.save_area(area_key, area_forecasts, store.recorded(area_key) if store is not None else None)
+    except Exception as e:
+        print(f"Checkpoint Err ({area_key}): {e}", flush=True)
+
+def resume_areas(areas):
+    """
+    チェックポイントで完了済みのエリアを読み、(完了済み dict, 残りの areas) を返す
+    フィンガープリントは IncrementalStore に戻す（次回の差分実行用）
+    """
+    if CHECKPOINT is None or not CHECKPOINT.resume:
+        return {}, areas
+    done = {}
+    for area_key in areas:
+        loaded = CHECKPOINT.load_area(area_key)
+        if loaded is None:
+            continue
+        days, fps = loaded
+        done[area_key] = days
+        if INCREMENTAL_STORE is not None:
+            for date_key, fp in fps.items():
+                INCREMENTAL_STORE.record(area_key, date_key, fp)
+    if done:
+        print(f"⏯️ チェックポイントから再開: 完了済み {len(done)}/{len(areas)} エリア", flush=True)
+        METRICS.count("checkpoint_resumed_areas", len(done))
+    return done, {k: v for k, v in areas.items() if k not in done}
 
 # =========================
 # エリア単位の処理
 # =========================
+def prepare_area_ai_inputs(area_key, area_data, grid, facts_by_date):
+    """
+    直近AI_DAYS日ぶんの入力を天気グリッドから作り、差分モードなら前回レコードを割り当てる
+    返り値: (ai_inputs, ai_results, pending, fingerprints)
+    - ai_inputs: dict[YYYY-MM-DD] = generate_ai_day の引数（area_data以外）
+    - ai_results: 再利用できた日のレコード
+    - pending: これからAIで作る日付
+    """
+    ai_inputs = {}
+    for d in range(min(AI_DAYS, grid.weather_days)):
+        date_key = grid.date_keys[d]
+        ai_inputs[date_key] = {
+            "target_date": grid.dates[d],
+            "day_weather": grid.day_weather(area_key, date_key),
+            "event_traffic_text": (facts_by_date.get(date_key) or "").strip(),
+        }
+
+    # プレランク: ルールのランクが AI_MIN_RULE_RANK 未満の日はAIを呼ばない（assemble でルールの日になる）
+    min_rank = RANK_ORDER.index(AI_MIN_RULE_RANK)
+    ai_keys = [k for k, di in ai_inputs.items() if RANK_ORDER.index(di["day_weather"]["rule"]["rank"]) >= min_rank]
+
+    # 差分モード: 事実セットが前回と同じ日は前回のレコードを使う
+    store = INCREMENTAL_STORE
+    ai_results = {}
+    fingerprints = {}
+    if store is not None:
+        for date_key in ai_keys:
+            di = ai_inputs[date_key]
+            fp, _ = ai_day_fingerprint(area_data, di)
+            fingerprints[date_key] = fp
+            prev_day = store.reuse(area_key, date_key, fp)
+            if prev_day is not None:
+                ai_results[date_key] = prev_day
+
+    # 再開: 前回の実行で生成済みの日はチェックポイントから
+    if CHECKPOINT is not None:
+        for date_key in ai_keys:
+            if date_key not in ai_results:
+                day = CHECKPOINT.load_day(area_key, date_key)
+                if day is not None:
+                    ai_results[date_key] = day
+                    METRICS.count("checkpoint_resumed_days")
+
+    pending = [k for k in ai_keys if k not in ai_results]
+    return ai_inputs, ai_results, pending, fingerprints
+
+def assemble_area_forecasts(area_key, area_data, grid, ai_inputs, ai_results, pending, fingerprints, long_term_text):
+    """
+    RUN_DAYS 日ぶんのリストにする（表示用日付/ランクはグリッドから）
+    - 直近の日: AIの結果 → 無ければルールベースの完全レコード
+    - それ以降: long_term（長期テキスト + カレンダーとエリア特性によるルールのランク / ピーク / 打ち手 / 時間帯アドバイス）
+    """
+    store = INCREMENTAL_STORE
+    area_forecasts = []
+
+    for i, date_key in enumerate(grid.date_keys):
+        di = ai_inputs.get(date_key)
+        if di is None:
+            rule_plan = long_term_rule_plan(area_data, grid.rule(area_key, i))
+            area_forecasts.append(expand_long_term_day(grid.full_dates[i], grid.rule_rank(area_key, i), long_term_text, rule_plan))
+            continue
+
+        data = ai_results.get(date_key)
+        print(f"🤖 {area_data['name']} / {date_key} ", end="", flush=True)
+        if data:
+            print("OK (再利用)" if date_key not in pending else "OK", flush=True)
+            METRICS.area_day(area_key, "reused" if date_key not in pending else "ai")
+            area_forecasts.append(data)
+            if store is not None:
+                store.record(area_key, date_key, fingerprints[date_key])
+        elif date_key not in pending:
+            print("ルール（プレランク）", flush=True)
+            METRICS.area_day(area_key, "rule")
+            area_forecasts.append(build_rule_day(area_data=area_data, **di))
+        else:
+            print("NG → ルールベース fallback", flush=True)
+            METRICS.area_day(area_key, "fallback")
+            area_forecasts.append(build_rule_day(area_data=area_data, **di))
+
+    return area_forecasts
+
 def process_single_area(item):
+    """1エリアを順番に処理する（同期版。main は process_single_area_async を使う）"""
     area_key, area_data = item
     print(f"\n📍 {area_data['name']} 開始", flush=True)
 
-    daily_db, warning_text = get_jma_forecast_data(area_data["jma_code"])
-    om = fetch_openmeteo_hourly(area_data["lat"], area_data["lon"], days=AI_DAYS)
-    facts_by_date = fetch_event_traffic_7days(area_data["name"])
+    grid = build_weather_grid({area_key: area_data})
+    facts_by_date = fetch_event_traffic_for_area(area_key, area_data, plan_event_regions(TARGET_AREAS))
     long_term_text = get_long_term_text_safe(area_data["name"])
 
-    area_forecasts = []
-    today_dt = datetime.now(JST)
-
-    for i in range(RUN_DAYS):
-        target_date = (today_dt + timedelta(days=i))
-        date_key = target_date.strftime("%Y-%m-%d")
-
-        if i < AI_DAYS:
-            day_data = daily_db.get(date_key, {})
-            slot_weather = build_slot_weather(om, target_date)
-            et_text = (facts_by_date.get(date_key) or "").strip()
-
-            print(f"🤖 {area_data['name']} / {date_key} ", end="", flush=True)
-            data = generate_ai_day(
-                area_data=area_data,
-                target_date=target_date,
-                jma_day_data=day_data,
-                warning_text=warning_text,
-                slot_weather=slot_weather,
-                event_traffic_text=et_text
-            )
-            if data:
-                print("OK", flush=True)
-                area_forecasts.append(data)
+    ai_inputs, ai_results, pending, fingerprints = prepare_area_ai_inputs(area_key, area_data, grid, facts_by_date)
+
+    if AI_BATCH_DAYS and pending:
+        print(f"🤖 {area_data['name']} / {len(pending)}日まとめ生成", flush=True)
+        generated = generate_ai_days_batch(area_data, [ai_inputs[k] for k in pending])
+    else:
+        generated = {k: generate_ai_day(area_data=area_data, **ai_inputs[k]) for k in pending}
+    ai_results.update(generated)
+    if CHECKPOINT is not None:
+        CHECKPOINT.save_days(area_key, generated)
+
+    area_forecasts = assemble_area_forecasts(
+        area_key, area_data, grid, ai_inputs, ai_results, pending, fingerprints, long_term_text
+    )
+    if all(ai_results.get(k) for k in pending):
+        checkpoint_area(area_key, area_forecasts)
+    print(f"✅ {area_data['name']} 完了", flush=True)
+    return area_key, area_forecasts
+
+# =========================
+# asyncio パイプライン（全エリアの通信を同時に流す）
+# =========================
+class PipelineLimits:
+    """
+    接続先ごとの同時実行数
+    ブロッキング処理はスレッドで動かすが、セマフォを取ってからスレッドに渡すので
+    待ちでスレッドを占有しない（スレッド数 = 各上限の合計で足りる）
+    """
+    def __init__(self, jma=JMA_CONCURRENCY, openmeteo=OPENMETEO_CONCURRENCY, gemini=GEMINI_CONCURRENCY):
+        self.jma = asyncio.Semaphore(jma)
+        self.openmeteo = asyncio.Semaphore(openmeteo)
+        self.gemini = asyncio.Semaphore(gemini)
+        self.total_threads = jma + openmeteo + gemini + 1
+
+async def _run_limited(sem, fn, *args, **kwargs):
+    if sem is None:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    async with sem:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+async def prefetch_shared_sources_async(areas, limits, openmeteo_days=AI_DAYS):
+    """
+    全エリアが使う JMA 予報区 / AMeDAS 観測所 / Open-Meteo を重複なしで先に取得しておく
+    （エリア処理側は共有キャッシュから受け取るだけになる）
+    """
+    offices = group_areas_by(areas, "jma_code")
+    stations = group_areas_by(areas, "amedas_code")
+    print(f"🛰️ 共有取得: JMA予報区 {len(offices)}件 / AMeDAS {len(stations)}件（{len(areas)}エリア分）", flush=True)
+
+    jobs = [_run_limited(limits.jma, get_jma_forecast_shared, code) for code in offices]
+    jobs += [_run_limited(limits.jma, get_amedas_stats_shared, code) for code in stations]
+    jobs.append(_run_limited(limits.openmeteo, prefetch_openmeteo_bulk, areas, openmeteo_days))
+    for res in await asyncio.gather(*jobs, return_exceptions=True):
+        if isinstance(res, Exception):
+            print(f"Prefetch Err: {res}", flush=True)
+
+# =========================
+# 締切つき優先度スケジューラ（今日 → 7日目 の順にAIを割り当てる）
+# =========================
+class AiDayScheduler:
+    """
+    全エリアの日別AIジョブを1つの優先度キューで捌く
+    - 優先度: 日付オフセット（今日=0が最優先）→ エリアの weight
+    - 締切までに終わらない見積もりのジョブは投げずに None（→ ルールの日）
+    - まとめ生成時は、先頭ジョブと同じエリアの待ちジョブを締切に収まる範囲で束ねる
+    - まとめ生成で作れなかった日は元の優先度でキューに戻し、単発で回す（締切の確認も単発として受け直す）
+    """
+    def __init__(self, deadline, limits, workers=GEMINI_CONCURRENCY):
+        self.deadline = deadline
+        self.limits = limits
+        self.workers = workers
+        self.est_single = float(AI_JOB_EST_SEC)
+        self.est_per_day = float(AI_BATCH_EST_SEC_PER_DAY)
+        self.degraded = 0
+        self._heap = []
+        self._seq = 0
+        self._single_only = set()   # まとめ生成NGで戻した (area_key, date_key)。もう束ねない
+        self._cond = asyncio.Condition()
+        self._tasks = []
+
+    def time_left(self):
+        return self.deadline - time.monotonic()
+
+    def estimate(self, n_days):
+        if n_days <= 1:
+            return self.est_single
+        return max(self.est_single, self.est_per_day * n_days)
+
+    def fits(self, est_sec):
+        return est_sec * DEADLINE_SAFETY <= self.time_left()
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run_area_days(self, area_key, area_data, inputs_by_date, today_date):
+        """エリアの待ち日をキューに入れ、dict[YYYY-MM-DD] = レコード(or None) を返す"""
+        loop = asyncio.get_running_loop()
+        weight = float(area_data.get("weight", AREA_WEIGHT_DEFAULT))
+        futures = {}
+        async with self._cond:
+            for date_key, di in inputs_by_date.items():
+                offset = (di["target_date"].date() - today_date).days
+                fut = loop.create_future()
+                futures[date_key] = fut
+                heapq.heappush(self._heap, (offset, -weight, self._seq, area_key, area_data, date_key, di, fut))
+                self._seq += 1
+            self._cond.notify_all()
+
+        results = await asyncio.gather(*futures.values())
+        return dict(zip(futures.keys(), results))
+
+    def _take_same_area(self, head):
+        """
+        先頭と同じエリアの待ちジョブを、締切に収まる数だけ優先度順に取り出す
+        待ち全体が締切に収まらない状況では、他エリアの待ちより後ろの日は束ねない
+        （束ねた分だけ他エリアの「今日」が後回しにならないように）
+        """
+        area_key = head[3]
+        if (area_key, head[5]) in self._single_only:
+            return []
+        same = sorted(job for job in self._heap if job[3] == area_key and (area_key, job[5]) not in self._single_only)
+        other_offsets = [job[0] for job in self._heap if job[3] != area_key]
+        backlog_sec = self.est_per_day * (len(self._heap) + 1) / max(1, self.workers)
+        relaxed = self.fits(backlog_sec)
+        min_other = min(other_offsets) if other_offsets else None
+
+        taken = []
+        for job in same:
+            if not relaxed and min_other is not None and job[0] > min_other:
+                break
+            if not self.fits(self.estimate(len(taken) + 2)):
+                break
+            taken.append(job)
+        if taken:
+            taken_ids = {id(job) for job in taken}
+            self._heap = [job for job in self._heap if id(job) not in taken_ids]
+            heapq.heapify(self._heap)
+        return taken
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                while not self._heap:
+                    await self._cond.wait()
+                bundle = [heapq.heappop(self._heap)]
+                if AI_BATCH_DAYS:
+                    bundle += self._take_same_area(bundle[0])
+            await self._run_bundle(bundle)
+
+    def _degrade(self, jobs):
+        for job in jobs:
+            _, _, _, _, area_data, date_key, _, fut = job
+            print(f"⏱️ {area_data['name']} / {date_key} 締切に間に合わないためルールで作る", flush=True)
+            self.degraded += 1
+            METRICS.count("deadline_degraded_days")
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _run_bundle(self, bundle):
+        if not self.fits(self.estimate(len(bundle))):
+            self._degrade(bundle)
+            return
+
+        area_data = bundle[0][4]
+        started = time.monotonic()
+        try:
+            if len(bundle) == 1:
+                _, _, _, _, _, date_key, di, _ = bundle[0]
+                day = await _run_limited(self.limits.gemini, generate_ai_day, area_data=area_data, **di)
+                results = {date_key: day}
             else:
-                print("NG → long_term fallback", flush=True)
-                area_forecasts.append(build_long_term_day(target_date, long_term_text))
+                print(f"🤖 {area_data['name']} / {len(bundle)}日まとめ生成", flush=True)
+                results = await _run_limited(
+                    self.limits.gemini, generate_ai_days_batch, area_data, [job[6] for job in bundle], retry_single=False
+                )
+        except Exception as e:
+            print(f"AI job Err ({area_data['name']}): {e}", flush=True)
+            results = {}
+
+        # 実測で見積もりを更新（指数移動平均）
+        elapsed = time.monotonic() - started
+        if len(bundle) == 1:
+            self.est_single = 0.7 * self.est_single + 0.3 * elapsed
         else:
-            area_forecasts.append(build_long_term_day(target_date, long_term_text))
+            self.est_per_day = 0.7 * self.est_per_day + 0.3 * (elapsed / len(bundle))
 
+        if CHECKPOINT is not None and results:
+            try:
+                await asyncio.to_thread(CHECKPOINT.save_days, bundle[0][3], results)
+            except Exception as e:
+                print(f"Checkpoint Err ({area_data['name']}): {e}", flush=True)
+
+        # まとめ生成NGの日はこのスロットで単発リトライせず、元の優先度でキューに戻す
+        requeue = [job for job in bundle if len(bundle) > 1 and results.get(job[5]) is None]
+        if requeue:
+            print(f"🔁 {area_data['name']} / まとめ生成NG {len(requeue)}日 → 単発でキューに戻す", flush=True)
+            METRICS.count("batch_requeued_days", len(requeue))
+            async with self._cond:
+                for job in requeue:
+                    self._single_only.add((job[3], job[5]))
+                    heapq.heappush(self._heap, job)
+                self._cond.notify_all()
+
+        requeued = {id(job) for job in requeue}
+        for job in bundle:
+            fut = job[7]
+            if id(job) not in requeued and not fut.done():
+                fut.set_result(results.get(job[5]))
+
+# =========================
+# asyncio パイプライン（エリア処理 / 全体）
+# =========================
+class RegionEventSearches:
+    """
+    Event/Traffic の地域検索を地域ごとに1タスクだけ走らせる
+    同じ地域のエリアはそのタスクを待つだけ（Gemini の枠を待ちで占有しない）
+    """
+    def __init__(self, areas, limits):
+        self.plan = plan_event_regions(areas)
+        self.limits = limits
+        self._tasks = {}
+
+    async def for_area(self, area_key, area_data):
+        region = self.plan[area_key]
+        task = self._tasks.get(region["key"])
+        if task is None:
+            task = asyncio.ensure_future(_run_limited(self.limits.gemini, fetch_region_events, region))
+            self._tasks[region["key"]] = task
+        facts = filter_region_events(await asyncio.shield(task), region, area_key)
+        if region["localities"] and area_key in EVENT_AREA_LOOKUPS:
+            own = await _run_limited(self.limits.gemini, fetch_event_traffic_7days, area_data["name"])
+            facts = merge_event_facts(facts, own)
+        return facts
+
+async def process_single_area_async(item, limits, grid_ready, scheduler, events):
+    """
+    process_single_area の asyncio 版
+    - イベント検索（地域まとめ）/ 長期テキスト（Gemini）は天気の取得を待たずに開始（締切を過ぎていれば省略）
+    - 天気グリッドが揃ったら日別AIをスケジューラに積む
+    """
+    area_key, area_data = item
+    print(f"\n📍 {area_data['name']} 開始", flush=True)
+
+    async def search_or_skip(name, make_coro, fallback):
+        if not scheduler.fits(scheduler.est_single):
+            print(f"⏱️ {area_data['name']} 締切が近いため {name} を省略", flush=True)
+            METRICS.count(f"deadline_skipped_{name}")
+            return fallback
+        return await make_coro()
+
+    grid, facts_by_date, long_term_text = await asyncio.gather(
+        asyncio.shield(grid_ready),
+        search_or_skip("fetch_event_traffic_7days", lambda: events.for_area(area_key, area_data), {}),
+        search_or_skip(
+            "get_long_term_text_safe",
+            lambda: _run_limited(limits.gemini, get_long_term_text_safe, area_data["name"]),
+            LONG_TERM_FALLBACK_TEXT,
+        ),
+    )
+
+    ai_inputs, ai_results, pending, fingerprints = await asyncio.to_thread(
+        prepare_area_ai_inputs, area_key, area_data, grid, facts_by_date
+    )
+
+    if pending:
+        ai_results.update(await scheduler.run_area_days(
+            area_key, area_data, {k: ai_inputs[k] for k in pending}, grid.today_dt.date()
+        ))
+
+    area_forecasts = assemble_area_forecasts(
+        area_key, area_data, grid, ai_inputs, ai_results, pending, fingerprints, long_term_text
+    )
+    if all(ai_results.get(k) for k in pending):
+        await asyncio.to_thread(checkpoint_area, area_key, area_forecasts)
     print(f"✅ {area_data['name']} 完了", flush=True)
     return area_key, area_forecasts
 
+async def run_pipeline(areas, limits=None, deadline_sec=RUN_DEADLINE_SEC, on_area=None):
+    """
+    全エリアを同時に処理して dict[area_key] = RUN_DAYS日ぶんのリスト を返す
+    キー順は areas の順（完了順にはしない）
+    on_area(area_key, days) を渡すと、エリアが終わるたびに（スレッドで）渡して手放す
+    （返り値の値は None になり、全エリアぶんをメモリに持たない）
+    """
+    all_areas = areas
+    done, areas = resume_areas(all_areas)
+    if on_area is not None:
+        for k in list(done):
+            await asyncio.to_thread(on_area, k, done[k])
+            done[k] = None
+    if not areas:
+        return {k: done[k] for k in all_areas if k in done}
+
+    limits = limits or PipelineLimits()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=limits.total_threads)
+    loop.set_default_executor(executor)
+
+    scheduler = AiDayScheduler(time.monotonic() + deadline_sec, limits)
+    scheduler.start()
+
+    async def weather_grid():
+        # 全エリアの取得が終わってからグリッドを1回だけ作る
+        await prefetch_shared_sources_async(areas, limits)
+        return await asyncio.to_thread(build_weather_grid, areas)
+
+    grid_ready = asyncio.ensure_future(weather_grid())
+    events = RegionEventSearches(areas, limits)
+
+    async def run_area(item):
+        key, data = await process_single_area_async(item, limits, grid_ready, scheduler, events)
+        if on_area is None:
+            return key, data
+        await asyncio.to_thread(on_area, key, data)
+        return key, None
+
+    try:
+        results = await asyncio.gather(*[run_area(item) for item in areas.items()], return_exceptions=True)
+    finally:
+        await scheduler.stop()
+
+    if scheduler.degraded:
+        print(f"⏱️ 締切のためルールで作った日: {scheduler.degraded}", flush=True)
+
+    finished = dict(done)
+    for res in results:
+        if isinstance(res, Exception):
+            print(f"Err: {res}", flush=True)
+            continue
+        key, data = res
+        finished[key] = data
+    return {k: finished[k] for k in all_areas if k in finished}
+
+# =========================
+# 出力（正規化フォーマット v2 / 互換フォーマット）
+# =========================
+def compact_long_term_day(day):
+    """
+    expand_long_term_day と同じ中身の日なら (表示用日付, ランク, 長期テキスト, rule_plan or None) を返す
+    AIの日や中身が違う日は None（そのまま完全レコードで保存する）
+    """
+    if not isinstance(day, dict) or not day.get("is_long_term"):
+        return None
+    full_date = day.get("date")
+    text = day.get("daily_schedule_and_impact") or ""
+    if not isinstance(full_date, str) or not full_date:
+        return None
+    prefix = f"【{full_date.split(' ')[0]}の長期予測】\n\n■長期傾向\n"
+    if not (text.startswith(prefix) and text.endswith("\n")):
+        return None
+    long_term_text = text[len(prefix):-1]
+    rule_plan = None
+    if isinstance(day.get("timeline"), dict):
+        long_term_text, _, outlook = long_term_text.partition(LONG_TERM_RULE_HEADING)
+        long_term_text = long_term_text[:-1] if long_term_text.endswith("\n") else long_term_text
+        try:
+            rule_plan = {
+                "peak_windows": day["peak_windows"],
+                "job_actions": day["job_actions"],
+                "timeline": {name: slot["advice"] for name, slot in day["timeline"].items()},
+                "outlook": outlook,
+            }
+        except (KeyError, TypeError):
+            return None
+    rank = day.get("rank", "C")
+    if expand_long_term_day(full_date, rank, long_term_text, rule_plan) != day:
+        return None
+    return full_date, rank, long_term_text, rule_plan
+
+def normalize_area_days(days):
+    """
+    1エリアの日リストを v2 の形にする
+    - long_term の日は ["01月27日 (火)", "B"]、ルール部分があれば ["01月27日 (火)", "B", long_term_rules の番号]
+    - 長期テキストとルール部分（数種類）はエリアに1回だけ
+    """
+    long_term_text = None
+    rules = []
+    rule_index = {}
+    out_days = []
+    for day in days:
+        compact = compact_long_term_day(day)
+        if compact is not None:
+            full_date, rank, text, rule_plan = compact
+            if long_term_text is None:
+                long_term_text = text
+            if text == long_term_text:
+                if rule_plan is None:
+                    out_days.append([full_date, rank])
+                    continue
+                key = json.dumps(rule_plan, ensure_ascii=False, sort_keys=True)
+                if key not in rule_index:
+                    rule_index[key] = len(rules)
+                    rules.append(rule_plan)
+                out_days.append([full_date, rank, rule_index[key]])
+                continue
+        out_days.append(day)
+    out = {"long_term_text": long_term_text or "", "days": out_days}
+    if rules:
+        out["long_term_rules"] = rules
+    return out
+
+def normalize_output(master_data, generated_at=None):
+    return {
+        "schema_version": OUTPUT_SCHEMA_VERSION,
+        "generated_at": (generated_at or datetime.now(JST)).isoformat(timespec="seconds"),
+        "areas": {area_key: normalize_area_days(days) for area_key, days in master_data.items()},
+    }
+
+def denormalize_area(area):
+    """v2 の1エリアを旧フォーマットの日リストに戻す"""
+    long_term_text = area.get("long_term_text", "")
+    rules = area.get("long_term_rules") or []
+    out = []
+    for day in area.get("days", []):
+        if isinstance(day, list) and len(day) >= 2:
+            rule_plan = rules[day[2]] if len(day) >= 3 and isinstance(day[2], int) and 0 <= day[2] < len(rules) else None
+            out.append(expand_long_term_day(day[0], day[1], long_term_text, rule_plan))
+        elif isinstance(day, dict):
+            out.append(day)
+    return out
+
+def denormalize_output(data):
+    """v2 / 旧フォーマットのどちらでも dict[area_key] = 日リスト にして返す"""
+    if isinstance(data, dict) and data.get("schema_version") and isinstance(data.get("areas"), dict):
+        return {area_key: denormalize_area(area) for area_key, area in data["areas"].items()}
+    return data
+
+def write_area_shard(area_key, normalized, shard_dir=OUTPUT_SHARD_DIR):
+    """v2 の1エリアぶんを <shard_dir>/<area_key>.json に書き、manifest の1行を返す"""
+    shard = {"schema_version": OUTPUT_SCHEMA_VERSION, "area_key": area_key}
+    shard.update(normalized)
+    body = json.dumps(shard, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    write_bytes_atomic(os.path.join(shard_dir, f"{area_key}.json"), body)
+    return {
+        "name": TARGET_AREAS.get(area_key, {}).get("name", area_key),
+        "file": f"{os.path.basename(shard_dir)}/{area_key}.json",
+        "sha256": hashlib.sha256(body).hexdigest(),
+        "bytes": len(body),
+    }
+
+def write_shard_manifest(entries, generated_at, shard_dir=OUTPUT_SHARD_DIR):
+    """
+    一覧・生成時刻・ハッシュ・サイズを manifest.json にまとめる
+    今回の出力に無いエリアのシャードは消す
+    返り値: manifest のパス
+    """
+    for name in os.listdir(shard_dir):
+        if name.endswith(".json") and name != OUTPUT_MANIFEST_NAME and name[:-5] not in entries:
+            os.remove(os.path.join(shard_dir, name))
+
+    manifest = {
+        "schema_version": OUTPUT_SCHEMA_VERSION,
+        "generated_at": generated_at.isoformat(timespec="seconds"),
+        "areas": entries,
+    }
+    return write_json_atomic(os.path.join(shard_dir, OUTPUT_MANIFEST_NAME), manifest, indent=2)
+
+def write_area_shards(master_data, generated_at=None, shard_dir=OUTPUT_SHARD_DIR):
+    """
+    エリアごとに <shard_dir>/<area_key>.json（v2の1エリアぶん）と manifest.json を書く
+    返り値: manifest のパス
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    entries = {
+        area_key: write_area_shard(area_key, normalize_area_days(days), shard_dir)
+        for area_key, days in master_data.items()
+    }
+    return write_shard_manifest(entries, generated_at or datetime.now(JST), shard_dir)
+
+class OutputWriter:
+    """
+    エリアが終わるたびに出力を書き進める（全エリアぶんをメモリに持たない）
+    - add: そのエリアのシャードを仮置きディレクトリに書き、v2 / 旧フォーマットの断片を一時ファイル（spool）に追記する
+    - finish: シャードを shard_dir へ移して manifest と一緒に公開し、断片を指定の順に並べて v2 / 旧フォーマットを組み立てる
+    途中で落ちても shard_dir は前回の manifest と揃ったまま（仮置きは close で消す。残ったものは次回消す）
+    メモリに残るのは断片の位置（エリアごとに数個の整数）と manifest の行だけ
+    """
+    STAGING_PREFIX = ".staging-"
+    STAGING_STALE_SEC = 24 * 3600
+
+    def __init__(self, generated_at=None, shard_dir=None, write_legacy=None):
+        self.generated_at = generated_at or datetime.now(JST)
+        self.shard_dir = shard_dir or OUTPUT_SHARD_DIR
+        self.write_legacy = OUTPUT_WRITE_LEGACY if write_legacy is None else write_legacy
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._index = {}   # area_key -> (v2 の位置, 長さ, 旧フォーマットの位置, 長さ)
+        os.makedirs(self.shard_dir, exist_ok=True)
+        # os.replace で移せるよう shard_dir と同じ階層に置く（manifest の "file" は shard_dir 名で書く）
+        parent = os.path.dirname(os.path.abspath(self.shard_dir))
+        self._prune_staging(parent)
+        self._staging = tempfile.mkdtemp(prefix=f"{self.STAGING_PREFIX}{os.path.basename(self.shard_dir)}-", dir=parent)
+        self._spool = tempfile.TemporaryFile()   # 名前なし（落ちても残らない）
+
+    @classmethod
+    def _prune_staging(cls, parent):
+        """落ちた実行の仮置きディレクトリを消す（並行して書いている実行の分は古いものだけ）"""
+        now = time.time()
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            if name.startswith(cls.STAGING_PREFIX) and os.path.isdir(path):
+                try:
+                    if now - os.path.getmtime(path) > cls.STAGING_STALE_SEC:
+                        shutil.rmtree(path, ignore_errors=True)
+                except OSError:
+                    pass
+
+    def __contains__(self, area_key):
+        return area_key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, area_key, days):
+        normalized = normalize_area_days(days)
+        key = json.dumps(area_key, ensure_ascii=False)
+        v2 = f"{key}:{json.dumps(normalized, ensure_ascii=False, separators=(',', ':'))}".encode("utf-8")
+        legacy = b""
+        if self.write_legacy:
+            # json.dump(master_data, indent=2) の1エリアぶんと同じ字面（2段目なので行頭に2つ足す）
+            body = json.dumps(days, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            legacy = f"  {key}: {body}".encode("utf-8")
+        entry = write_area_shard(area_key, normalized, self._staging)
+        entry["file"] = f"{os.path.basename(self.shard_dir)}/{area_key}.json"
+
+        with self._lock:
+            self._spool.seek(0, os.SEEK_END)
+            pos = self._spool.tell()
+            self._spool.write(v2)
+            self._spool.write(legacy)
+            self._index[area_key] = (pos, len(v2), pos + len(v2), len(legacy))
+            self._entries[area_key] = entry
+
+    def _copy(self, f, pos, length):
+        self._spool.seek(pos)
+        f.write(self._spool.read(length))
+
+    def finish(self, order=None):
+        """
+        order（無ければ add した順）に並べて書き出す。返り値: 書いたパスのリスト
+        どれも一時ファイル → os.replace で置き換える
+        """
+        with self._lock:
+            keys = [k for k in (order if order is not None else self._index) if k in self._index]
+            self._spool.flush()
+
+            for k in keys:
+                os.replace(os.path.join(self._staging, f"{k}.json"), os.path.join(self.shard_dir, f"{k}.json"))
+            written = [write_shard_manifest({k: self._entries[k] for k in keys}, self.generated_at, self.shard_dir)]
+
+            header = json.dumps({
+                "schema_version": OUTPUT_SCHEMA_VERSION,
+                "generated_at": self.generated_at.isoformat(timespec="seconds"),
+            }, ensure_ascii=False, separators=(",", ":"))
+            with atomic_write(OUTPUT_V2_PATH, "wb") as f:
+                f.write(header[:-1].encode("utf-8") + b',"areas":{')
+                for i, k in enumerate(keys):
+                    if i:
+                        f.write(b",")
+                    pos, length, _, _ = self._index[k]
+                    self._copy(f, pos, length)
+                f.write(b"}}")
+            written.append(OUTPUT_V2_PATH)
+
+            if self.write_legacy:
+                with atomic_write(OUTPUT_PATH, "wb") as f:
+                    if not keys:
+                        f.write(b"{}")
+                    else:
+                        f.write(b"{\n")
+                        for i, k in enumerate(keys):
+                            if i:
+                                f.write(b",\n")
+                            _, _, pos, length = self._index[k]
+                            self._copy(f, pos, length)
+                        f.write(b"\n}")
+                written.append(OUTPUT_PATH)
+
+            self.close()
+            return written
+
+    def close(self):
+        if not self._spool.closed:
+            self._spool.close()
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+def write_outputs(master_data, generated_at=None):
+    """
+    エリア分割（+manifest）と v2（インデントなし）を書き、互換用に旧フォーマットも書く
+    返り値: 書いたパスのリスト
+    """
+    writer = OutputWriter(generated_at)
+    try:
+        for area_key, days in master_data.items():
+            writer.add(area_key, days)
+        return writer.finish()
+    finally:
+        writer.close()
+
+# =========================
+# 分割実行（--shard i/N）と結合（--merge）
+# =========================
+def expected_ai_days(area_data):
+    """日別AIを呼ぶ見込みの日数（基準週の曜日ごとのルールランクがプレランクを通る割合から）"""
+    categories = area_categories(area_data)
+    min_rank = RANK_ORDER.index(AI_MIN_RULE_RANK)
+    passed = sum(
+        1 for i in range(7)
+        if RANK_ORDER.index(rank_from_score(rule_day_score(categories, SHARD_REFERENCE_MONDAY + timedelta(days=i))[0])) >= min_rank
+    )
+    return AI_DAYS * passed / 7
+
+def area_cost(area_data):
+    return SHARD_COST_AI_DAY * expected_ai_days(area_data) + SHARD_COST_SEARCH * 2
+
+def partition_areas(areas, shards):
+    """
+    areas を shards 個に分ける（同じ入力なら常に同じ結果）
+    - 同じ JMA 予報区のエリアはまとめて1つのシャードへ（1シャードの目安を超える予報区だけ分ける）
+    - まとまりをコストの大きい順に、その時点で一番軽いシャードへ入れる
+    返り値: シャードごとの dict（中のキー順は areas の順）
+    """
+    costs = {k: area_cost(v) for k, v in areas.items()}
+    target = sum(costs.values()) / shards if areas else 0
+
+    groups = group_areas_by(areas, "jma_code")
+    for k, v in areas.items():
+        if not v.get("jma_code"):
+            groups[f"area:{k}"] = [k]
+
+    units = []
+    for code, keys in groups.items():
+        cost = sum(costs[k] for k in keys) + SHARD_COST_OFFICE
+        n = min(len(keys), max(1, int(-(-cost // target)) if target else 1))
+        for c in range(n):
+            chunk = keys[len(keys) * c // n: len(keys) * (c + 1) // n]
+            units.append((sum(costs[k] for k in chunk) + SHARD_COST_OFFICE, f"{code}#{c}", chunk))
+    units.sort(key=lambda u: (-u[0], u[1]))
+
+    loads = [0.0] * shards
+    owner = {}
+    for cost, _, keys in units:
+        i = min(range(shards), key=lambda j: (loads[j], j))
+        loads[i] += cost
+        for k in keys:
+            owner[k] = i
+    return [{k: v for k, v in areas.items() if owner[k] == i} for i in range(shards)]
+
+def parse_shard_arg(text):
+    """"i/N"（i は 0 始まり）→ (i, N)"""
+    import argparse
+    m = re.fullmatch(r"(\d+)/(\d+)", text.strip())
+    if not m or int(m.group(2)) < 1 or int(m.group(1)) >= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"--shard は i/N（0 <= i < N）で指定: {text}")
+    return int(m.group(1)), int(m.group(2))
+
+def partial_path(index, count, partial_dir=None):
+    return os.path.join(partial_dir or OUTPUT_PARTIAL_DIR, f"shard-{index:03d}-of-{count:03d}.json")
+
+class PartialWriter:
+    """
+    --shard 用: 担当エリアの v2 の1エリアぶん（+フィンガープリント）を spool に溜め、
+    finish で部分ファイル1つにまとめる（シャード/manifest/旧フォーマットは --merge で書く）
+    """
+    def __init__(self, path, index, count, area_keys, generated_at=None):
+        self.path = path
+        self.index = index
+        self.count = count
+        self.area_keys = list(area_keys)
+        self.generated_at = generated_at or datetime.now(JST)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._spool = tempfile.TemporaryFile()
+
+    def __contains__(self, area_key):
+        return area_key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, area_key, days):
+        store = INCREMENTAL_STORE
+        entry = normalize_area_days(days)
+        entry["fingerprints"] = store.recorded(area_key) if store is not None else {}
+        body = f"{json.dumps(area_key, ensure_ascii=False)}:{json.dumps(entry, ensure_ascii=False, separators=(',', ':'))}".encode("utf-8")
+        with self._lock:
+            self._spool.seek(0, os.SEEK_END)
+            self._index[area_key] = (self._spool.tell(), len(body))
+            self._spool.write(body)
+
+    def finish(self):
+        with self._lock:
+            header = json.dumps({
+                "schema_version": OUTPUT_SCHEMA_VERSION,
+                "kind": "partial",
+                "generated_at": self.generated_at.isoformat(timespec="seconds"),
+                "model": GEMINI_MODEL,
+                "shard": {"index": self.index, "count": self.count, "areas": self.area_keys},
+            }, ensure_ascii=False, separators=(",", ":"))
+            keys = [k for k in self.area_keys if k in self._index]
+            with atomic_write(self.path, "wb") as f:
+                f.write(header[:-1].encode("utf-8") + b',"areas":{')
+                for i, k in enumerate(keys):
+                    if i:
+                        f.write(b",")
+                    pos, length = self._index[k]
+                    self._spool.seek(pos)
+                    f.write(self._spool.read(length))
+                f.write(b"}}")
+            self.close()
+            return self.path
+
+    def close(self):
+        if not self._spool.closed:
+            self._spool.close()
+
+def _load_partial(path):
+    """部分ファイルを読み、ヘッダと各エリアの形を確認して (part, shard) を返す（問題があれば ValueError）"""
+    with open(path, "r", encoding="utf-8") as f:
+        part = json.load(f)
+    shard = part.get("shard") if isinstance(part, dict) else None
+    if not isinstance(shard, dict) or part.get("kind") != "partial" or part.get("schema_version") != OUTPUT_SCHEMA_VERSION:
+        raise ValueError(f"部分ファイルではありません: {path}")
+    count, index = shard.get("count"), shard.get("index")
+    if not isinstance(count, int) or count < 1:
+        raise ValueError(f"シャード数がありません: {path} ({count!r})")
+    if not isinstance(index, int) or index not in range(count):
+        raise ValueError(f"シャード番号が範囲外です: {path} ({index!r} / 全 {count})")
+    try:
+        datetime.fromisoformat(part["generated_at"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"generated_at が不正です: {path}")
+
+    expected = shard.get("areas") or []
+    part_areas = part.get("areas") or {}
+    extra = [k for k in part_areas if k not in expected]
+    if extra:
+        raise ValueError(f"担当外のエリアが入っています: {path} {extra}")
+    for area_key, area in part_areas.items():
+        if not isinstance(area, dict) or not isinstance(area.get("days"), list):
+            raise ValueError(f"エリア {area_key} の形式が不正です: {path}")
+    return part, shard
+
+def merge_partials(paths, areas=None):
+    """
+    部分ファイルを検証して最終出力（シャード + manifest / v2 / 旧フォーマット / フィンガープリント）を書く
+    - 同じ実行の N 個がそろっていること（シャード数・番号・実行日・担当エリア）
+    - 担当エリアが重ならず、合わせて areas（既定は TARGET_AREAS）と一致すること
+    1周目で全ファイルを検証し、通ったら2周目で書く（部分ファイルは1つずつ読む。メモリに持つのは1シャードぶん）
+    エリアの順は areas の順
+    問題があれば ValueError（何も書かない）。返り値: (書いたパスのリスト, 出力したエリア数, 欠けたエリア)
+    """
+    areas = TARGET_AREAS if areas is None else areas
+    if not paths:
+        raise ValueError("部分ファイルがありません")
+    paths = sorted(paths)
+
+    seen_shards = {}
+    owner = {}
+    run_dates = set()
+    generated = []
+    count = None
+    for path in paths:
+        part, shard = _load_partial(path)
+        if count is None:
+            count = shard["count"]
+        if shard["count"] != count:
+            raise ValueError(f"シャード数が違います: {path} ({shard['count']} != {count})")
+        index = shard["index"]
+        if index in seen_shards:
+            raise ValueError(f"シャード {index} が重複しています: {seen_shards[index]} / {path}")
+        seen_shards[index] = path
+
+        generated_at = datetime.fromisoformat(part["generated_at"])
+        run_dates.add(generated_at.astimezone(JST).strftime("%Y-%m-%d"))
+        generated.append(generated_at)
+
+        for k in shard.get("areas") or []:
+            if k in owner:
+                raise ValueError(f"エリア {k} がシャード {owner[k]} と {index} の両方に入っています")
+            owner[k] = index
+        del part
+
+    if len(run_dates) > 1:
+        raise ValueError(f"別の日の実行が混ざっています: {sorted(run_dates)}")
+    missing_shards = [i for i in range(count) if i not in seen_shards]
+    if missing_shards:
+        raise ValueError(f"シャードが足りません: {missing_shards}（全 {count}）")
+    if set(owner) != set(areas):
+        unknown = sorted(set(owner) - set(areas))
+        unassigned = sorted(set(areas) - set(owner))
+        raise ValueError(f"担当エリアが対象エリアと一致しません（対象外 {unknown} / 未割り当て {unassigned}）")
+
+    writer = OutputWriter(generated_at=min(generated))
+    fingerprints = {}
+    try:
+        for path in paths:
+            part, _ = _load_partial(path)
+            for area_key, area in (part.get("areas") or {}).items():
+                fingerprints[area_key] = area.get("fingerprints") or {}
+                writer.add(area_key, denormalize_area(area))
+            del part
+
+        order = [k for k in areas if k in writer]
+        missing_areas = [k for k in areas if k not in writer]
+        written = writer.finish(order)
+        written.append(write_fingerprints(FINGERPRINT_PATH, {k: fingerprints[k] for k in order if fingerprints.get(k)}))
+        return written, len(order), missing_areas
+    finally:
+        writer.close()
+
+# =========================
+# 天気だけの更新（--weather-only。AIは呼ばない）
+# =========================
+TIMELINE_WEATHER_FIELDS = ["weather", "temp", "temp_high", "temp_low", "humidity", "rain"]
+
+def load_output():
+    """前回の出力を dict[area_key] = 日リスト で読む（v2 優先、無ければ旧フォーマット）。無ければ None"""
+    for path in (OUTPUT_V2_PATH, OUTPUT_PATH):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return denormalize_output(json.load(f))
+        except Exception as e:
+            print(f"前回出力を読めません: {path} ({e})", flush=True)
+    return None
+
+def patch_day_weather(day, dw):
+    """
+    1日ぶんの weather_overview と timeline の天気欄だけを day_weather の値で置き換える
+    （ランク・文章・advice などAIが書いたところは触らない）
+    """
+    wo = day.get("weather_overview") if isinstance(day.get("weather_overview"), dict) else {}
+    wo.update({
+        "condition": dw["w_emoji"],
+        "high": f"最高{dw['high']}℃",
+        "low": f"最低{dw['low']}℃",
+        "rain": dw["rain_display"],
+        "rain_am": dw["rain_am"],
+        "rain_pm": dw["rain_pm"],
+        "rain_night": dw["rain_ng"],
+        "warning": dw["warning_text"],
+    })
+    day["weather_overview"] = wo
+
+    tl = day.get("timeline")
+    if isinstance(tl, dict):
+        for name, base in dw["slot_weather"].items():
+            slot = tl.get(name)
+            if not isinstance(slot, dict):
+                continue
+            for field in TIMELINE_WEATHER_FIELDS:
+                slot[field] = str(base.get(field) or "-")
+    return day
+
+def is_rule_day(day):
+    """build_rule_day で作った日か（見出しで見分ける。AIの日・long_term は False）"""
+    if not isinstance(day, dict) or day.get("is_long_term") or not isinstance(day.get("date"), str):
+        return False
+    text = day.get("daily_schedule_and_impact") or ""
+    return isinstance(text, str) and text.startswith(f"【{day['date'].split(' ')[0]}のルールベース予測】")
+
+def refresh_weather(master_data, grid, today=None):
+    """
+    master_data の AI/ルールの日（long_term 以外）を grid の天気で書き換える
+    - 今日（JST）より前の日は long_term も含めて落とす（前回出力が昨日のものでも昨日を出し続けない）
+    - ルールの日は build_rule_day で作り直す（ランク・スコア・文章の数字も新しい天気に揃える。事実セットは前回のまま）
+    - AIの日は天気欄だけ置き換える（ランク・文章・advice はAIが書いたまま）
+    日付は表示用日付（または YYYY-MM-DD）で突き合わせる（前回出力が昨日のものでも今日以降の日だけが対象になる）
+    返り値: 書き換えた日数
+    """
+    date_by_label = {label: grid.date_keys[i] for i, label in enumerate(grid.full_dates)}
+    date_by_label.update({k: k for k in grid.date_keys})
+    today = today or datetime.now(JST).date()
+    today_key = today.strftime("%Y-%m-%d")
+    patched = 0
+    for area_key, days in master_data.items():
+        kept = [
+            d for d in days
+            if not isinstance(d, dict) or (date_key_from_label(d.get("date"), today) or today_key) >= today_key
+        ]
+        if len(kept) != len(days):
+            METRICS.count("weather_only_past_days_dropped", len(days) - len(kept))
+            days[:] = kept
+        if area_key not in grid.area_index:
+            continue
+        area_data = grid.area_data[grid.area_index[area_key]]
+        for i, day in enumerate(days):
+            if not isinstance(day, dict) or day.get("is_long_term"):
+                continue
+            date_key = date_by_label.get(day.get("date"))
+            dw = grid.day_weather(area_key, date_key) if date_key else None
+            if dw is None:
+                continue
+            if is_rule_day(day):
+                facts = "\n".join(f"- {x}" for x in day.get("event_traffic_facts") or [])
+                days[i] = build_rule_day(area_data, grid.dates[grid.date_index[date_key]], dw, facts)
+                METRICS.count("weather_only_rule_days_rebuilt")
+            else:
+                patch_day_weather(day, dw)
+            patched += 1
+    return patched
+
+async def refresh_weather_only_async(master_data, areas, limits=None):
+    """前回出力に載っているエリアの JMA / 警報 / AMeDAS / Open-Meteo を取り直して天気欄だけ更新する"""
+    areas = {k: v for k, v in areas.items() if k in master_data}
+    if not areas:
+        return 0
+    await prefetch_shared_sources_async(areas, limits or PipelineLimits())
+    grid = await asyncio.to_thread(build_weather_grid, areas)
+    return refresh_weather(master_data, grid)
+
 # =========================
 # main
 # =========================
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Eagle Eye assets writer")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="前回出力と事実セットのハッシュが一致する日はAIを呼ばずに再利用する",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="今日のチェックポイントが残っていれば、完了済みのエリア/日別AIを飛ばして続きから実行する",
+    )
+    parser.add_argument(
+        "--deadline-min", type=float, default=RUN_DEADLINE_SEC / 60,
+        help="実行全体の締切（分）。間に合わない日別AIはルールの日にする",
+    )
+    parser.add_argument(
+        "--weather-only", action="store_true",
+        help="前回出力の天気欄（weather_overview / timeline の天気）だけを取り直して書き換える。AIは呼ばない",
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard_arg, metavar="i/N",
+        help="エリアを N 個に分けた i 番目（0始まり）だけを処理し、部分ファイルを書く（--merge でまとめる）",
+    )
+    parser.add_argument(
+        "--merge", nargs="*", metavar="PARTIAL",
+        help="部分ファイルを検証して最終出力にまとめる（省略時は部分ファイルの置き場にあるもの全部）",
+    )
+    parser.add_argument("--partial-dir", default=OUTPUT_PARTIAL_DIR, help="部分ファイルの置き場")
+    parser.add_argument(
+        "--write-legacy", action="store_true",
+        help="旧フォーマット（assets/eagle_eye_data.json）も書き出す。アプリは読まないので互換確認用",
+    )
+    args = parser.parse_args()
+    if args.write_legacy:
+        OUTPUT_WRITE_LEGACY = True
+
     today = datetime.now(JST)
     print(f"🦅 Eagle Eye (assets writer) 起動: {today.strftime('%Y/%m/%d %H:%M')}", flush=True)
 
     out_dir = os.path.dirname(OUTPUT_PATH)
     os.makedirs(out_dir, exist_ok=True)
 
-    master_data = {}
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_single_area, item) for item in TARGET_AREAS.items()]
-        for future in as_completed(futures):
-            try:
-                key, data = future.result()
-                master_data[key] = data
-            except Exception as e:
-                print(f"Err: {e}", flush=True)
+    if args.weather_only:
+        master_data = load_output()
+        if not master_data:
+            raise SystemExit("❌ 天気だけの更新: 前回出力がありません（先に通常実行が必要）")
+        patched = asyncio.run(refresh_weather_only_async(master_data, TARGET_AREAS))
+        written = write_outputs(master_data, generated_at=today)
+        print(f"🌦️ 天気だけ更新: {patched}日ぶん", flush=True)
+        for path in written:
+            print(f"✅ 保存完了: {path} ({os.path.getsize(path) // 1024}KB)", flush=True)
+        report_path = METRICS.write(RUN_REPORT_PATH, extra={
+            "mode": "weather_only",
+            "areas_total": len(master_data),
+            "days_patched": patched,
+            "outputs": {os.path.basename(p): os.path.getsize(p) for p in written},
+        })
+        print(f"📊 実行レポート: {report_path}", flush=True)
+        raise SystemExit(0)
+
+    if args.merge is not None:
+        paths = args.merge
+        if not paths and os.path.isdir(args.partial_dir):
+            paths = [
+                os.path.join(args.partial_dir, name)
+                for name in sorted(os.listdir(args.partial_dir)) if re.fullmatch(r"shard-\d+-of-\d+\.json", name)
+            ]
+        try:
+            written, n_ok, missing = merge_partials(paths)
+        except (OSError, ValueError, KeyError) as e:
+            raise SystemExit(f"❌ 結合できません: {e}")
+        if missing:
+            print(f"⚠️ 出力の無いエリア: {missing}", flush=True)
+        for path in written:
+            print(f"✅ 保存完了: {path} ({os.path.getsize(path) // 1024}KB)", flush=True)
+        print(f"🧩 {len(paths)}個の部分ファイルを結合: {n_ok}/{len(TARGET_AREAS)} エリア", flush=True)
+        raise SystemExit(0)
+
+    areas = TARGET_AREAS
+    checkpoint_dir = CHECKPOINT_DIR
+    report_path = RUN_REPORT_PATH
+    if args.shard:
+        shard_index, shard_count = args.shard
+        areas = partition_areas(TARGET_AREAS, shard_count)[shard_index]
+        # シャードごとに別の置き場（同じマシンで並べても互いのチェックポイントを消さない）
+        checkpoint_dir = os.path.join(CHECKPOINT_DIR, f"shard-{shard_index}-of-{shard_count}")
+        partial = partial_path(shard_index, shard_count, args.partial_dir)
+        report_path = f"{partial[:-len('.json')]}.report.json"
+        print(f"🧩 シャード {shard_index}/{shard_count}: {len(areas)}/{len(TARGET_AREAS)} エリア", flush=True)
+
+    INCREMENTAL_STORE = IncrementalStore((OUTPUT_V2_PATH, OUTPUT_PATH), FINGERPRINT_PATH, reuse=args.incremental)
+    CHECKPOINT = RunCheckpoint(checkpoint_dir, today.strftime("%Y-%m-%d"), resume=args.resume)
+
+    # エリアが終わるたびに書き進め、最後に areas の順で組み立てる
+    # （通常: シャード + v2 / 旧フォーマット、--shard: 部分ファイル1つ）
+    if args.shard:
+        writer = PartialWriter(partial, shard_index, shard_count, list(areas), generated_at=today)
+    else:
+        writer = OutputWriter(generated_at=today)
+    try:
+        master_data = asyncio.run(run_pipeline(areas, deadline_sec=args.deadline_min * 60, on_area=writer.add))
+        written = [writer.finish()] if args.shard else writer.finish([k for k in areas if k in writer])
+    finally:
+        writer.close()
+
+    if not args.shard:
+        INCREMENTAL_STORE.save()   # --shard のときは部分ファイルに入れ、--merge で書く
+    # 全エリアが揃って書き出せたときだけ消す（欠けたエリアは次の --resume で続きから作る）
+    if written and len(master_data) == len(areas):
+        CHECKPOINT.clear()
+    else:
+        print(
+            f"⏸️ {len(areas) - len(master_data)}エリアが未完了のためチェックポイントを残します"
+            f"（--resume で続きから再開できます: {CHECKPOINT.dir}）",
+            flush=True,
+        )
+    if args.incremental:
+        print(f"♻️ 差分モード: {INCREMENTAL_STORE.reused}日ぶん前回のAIレコードを再利用", flush=True)
+        if INCREMENTAL_STORE.missing:
+            print(f"⚠️ 差分モード: ハッシュが一致したのに前回出力に無い日が {INCREMENTAL_STORE.missing}日ぶん（AIで作り直し）", flush=True)
+        METRICS.count("incremental_reused_days", INCREMENTAL_STORE.reused)
+        METRICS.count("incremental_missing_days", INCREMENTAL_STORE.missing)
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(master_data, f, ensure_ascii=False, indent=2)
+    for path in written:
+        print(f"\n✅ 保存完了: {path} ({os.path.getsize(path) // 1024}KB)", flush=True)
+    print(f"📦 {GEMINI_CACHE.summary_text()}", flush=True)
+    GEMINI_CONTEXT.clear()
 
-    print(f"\n✅ 保存完了: {OUTPUT_PATH}", flush=True)
+    report_path = METRICS.write(report_path, extra={
+        "areas_total": len(areas),
+        "areas_ok": len(master_data),
+        "gemini_cache": {"hits": GEMINI_CACHE.hits, "misses": GEMINI_CACHE.misses},
+        "outputs": {os.path.basename(p): os.path.getsize(p) for p in written},
+    })
+    print(f"📊 実行レポート: {report_path}", flush=True)
     print("✅ 全工程完了", flush=True)
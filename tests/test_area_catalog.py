@@ -0,0 +1,70 @@
+import math
+
+import main
+
+STATIONS = [
+    {"code": "11001", "office": "011000", "lat": 45.415, "lon": 141.678, "name": "稚内"},
+    {"code": "23411", "office": "", "lat": 41.815, "lon": 140.753, "name": "函館"},
+    {"code": "44132", "office": "130000", "lat": 35.692, "lon": 139.750, "name": "東京"},
+    {"code": "62078", "office": "270000", "lat": 34.682, "lon": 135.518, "name": "大阪"},
+    {"code": "91197", "office": "471000", "lat": 26.207, "lon": 127.686, "name": "那覇"},
+]
+
+
+def brute_nearest(lat, lon, where=None):
+    q = main._unit_vector(lat, lon)
+    candidates = [st for st in STATIONS if where is None or where(st)]
+    return min(candidates, key=lambda st: math.dist(q, main._unit_vector(st["lat"], st["lon"])))
+
+
+def test_station_index_nearest_matches_brute_force():
+    index = main.StationIndex(STATIONS)
+    for lat, lon in [(41.77, 140.73), (35.68, 139.77), (34.7, 135.5), (26.3, 127.8), (43.0, 141.3), (38.0, 138.0)]:
+        assert index.nearest(lat, lon) is brute_nearest(lat, lon)
+
+
+def test_station_index_nearest_with_where():
+    index = main.StationIndex(STATIONS)
+    has_office = lambda st: bool(st["office"])
+    assert index.nearest(41.77, 140.73)["code"] == "23411"
+    assert index.nearest(41.77, 140.73, where=has_office) is brute_nearest(41.77, 140.73, has_office)
+    assert index.nearest(41.77, 140.73, where=lambda st: False) is None
+
+
+def test_station_index_empty():
+    assert main.StationIndex([]).nearest(35.0, 139.0) is None
+
+
+def write_stations(path):
+    lines = ["# テスト用", "code,office,lat,lon,name"]
+    lines += [f"{st['code']},{st['office']},{st['lat']},{st['lon']},{st['name']}" for st in STATIONS]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_area_resolver_resolves_and_caches(tmp_path):
+    stations = tmp_path / "stations.csv"
+    cache = tmp_path / "resolutions.json"
+    write_stations(stations)
+
+    resolver = main.AreaResolver(str(stations), str(cache))
+    res = resolver.resolve(41.77, 140.73)
+    assert res == {"jma_code": brute_nearest(41.77, 140.73, lambda st: bool(st["office"]))["office"], "amedas_code": "23411"}
+    resolver.save()
+
+    # 同じ観測所表ならキャッシュから返す（表は読まない）
+    again = main.AreaResolver(str(stations), str(cache))
+    again._index = "unused"
+    assert again.resolve(41.77, 140.73) == res
+
+
+def test_area_resolver_rebuilds_when_table_changes(tmp_path):
+    stations = tmp_path / "stations.csv"
+    cache = tmp_path / "resolutions.json"
+    write_stations(stations)
+    resolver = main.AreaResolver(str(stations), str(cache))
+    resolver.resolve(41.77, 140.73)
+    resolver.save()
+
+    stations.write_text("code,office,lat,lon,name\n99999,999999,41.77,140.73,新\n", encoding="utf-8")
+    changed = main.AreaResolver(str(stations), str(cache))
+    assert changed.resolve(41.77, 140.73) == {"jma_code": "999999", "amedas_code": "99999"}
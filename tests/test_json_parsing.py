@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```\n[{"a": 1}, {"a": 2}]\n```', [{"a": 1}, {"a": 2}]),
+    ('[{"a": 1}]', [{"a": 1}]),
+    ('結果です:\n{"a": [1, 2]}\n以上', {"a": [1, 2]}),
+    # 配列の中のオブジェクトだけを拾わない
+    ('```json\n[{"a": 1}, {"b": 2}]\n```', [{"a": 1}, {"b": 2}]),
+])
+def test_extract_json_block(text, expected):
+    assert json.loads(main.extract_json_block(text)) == expected
+
+
+def test_extract_json_block_without_json_returns_text():
+    assert main.extract_json_block("JSONなし") == "JSONなし"
+
+
+def feed_all(check, text, step=7):
+    for i in range(0, len(text), step):
+        reason = check.feed(text[i:i + step])
+        if reason:
+            return reason
+    return check.finish()
+
+
+def test_stream_check_accepts_fenced_records():
+    check = main.JsonStreamCheck(required=("rank", "date"), record_depth=2, top="[")
+    text = '```json\n[{"rank": "A", "date": "x"}, {"date": "y", "rank": "B"}]\n```'
+    assert feed_all(check, text) is None
+    assert check.records == 2
+
+
+def test_stream_check_reports_missing_key_early():
+    check = main.JsonStreamCheck(required=("rank",), record_depth=2, top="[")
+    reason = check.feed('[{"date": "x"}, {"rank": ')
+    assert reason == "rank がない"
+
+
+def test_stream_check_ignores_keys_in_values_and_nested_objects():
+    check = main.JsonStreamCheck(required=("rank",), record_depth=1)
+    reason = feed_all(check, '{"note": "\\"rank\\"", "inner": {"rank": 1}}')
+    assert reason == "rank がない"
+
+
+@pytest.mark.parametrize("text, reason", [
+    ('はい、どうぞ {"a": 1}', "JSONの前に文章"),
+    ('{"a": [1}', "括弧の対応が合わない"),
+    ('{"a": 1', "JSONが途中で終わった"),
+    ("", "JSONがない"),
+])
+def test_stream_check_rejects(text, reason):
+    assert feed_all(main.JsonStreamCheck(), text).startswith(reason)
+
+
+def test_stream_check_rejects_wrong_top_level():
+    assert main.JsonStreamCheck(top="[").feed('{"a": 1}') == "先頭が {"
@@ -0,0 +1,143 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+
+RULE_PLAN = {
+    "peak_windows": {"morning": "-", "daytime": "-", "night": "22:00-24:00"},
+    "job_actions": {"taxi": "夜の繁華街で待機", "delivery": "-"},
+    "timeline": {"morning": {"taxi": "-"}, "daytime": {"taxi": "-"}, "night": {"taxi": "駅前"}},
+    "outlook": "需要のピークは夜の時間帯の見込み。",
+}
+
+
+@pytest.mark.parametrize("rule_plan", [None, RULE_PLAN])
+def test_long_term_day_round_trip(rule_plan):
+    day = main.expand_long_term_day("01月27日 (火)", "B", "長期の傾向\n2行目", rule_plan)
+    assert main.compact_long_term_day(day) == ("01月27日 (火)", "B", "長期の傾向\n2行目", rule_plan)
+
+
+def test_compact_long_term_day_rejects_edited_or_ai_days():
+    day = main.expand_long_term_day("01月27日 (火)", "B", "長期の傾向", RULE_PLAN)
+    day["weather_overview"]["high"] = "最高5℃"
+    assert main.compact_long_term_day(day) is None
+    assert main.compact_long_term_day({"date": "01月27日 (火)", "rank": "A"}) is None
+
+
+def test_normalize_area_days_round_trip():
+    other = dict(RULE_PLAN, outlook="需要のピークは朝の時間帯の見込み。")
+    days = [
+        {"date": "01月20日 (火)", "rank": "A", "daily_schedule_and_impact": "AIの日"},
+        main.expand_long_term_day("01月27日 (火)", "B", "長期", RULE_PLAN),
+        main.expand_long_term_day("01月28日 (水)", "C", "長期", other),
+        main.expand_long_term_day("01月29日 (木)", "C", "長期", RULE_PLAN),
+        main.expand_long_term_day("01月30日 (金)", "C", "長期"),
+    ]
+    normalized = main.normalize_area_days(days)
+    assert normalized["days"][1:] == [["01月27日 (火)", "B", 0], ["01月28日 (水)", "C", 1], ["01月29日 (木)", "C", 0], ["01月30日 (金)", "C"]]
+    assert len(normalized["long_term_rules"]) == 2
+    assert main.denormalize_area(json.loads(json.dumps(normalized))) == days
+
+
+def test_partition_areas_is_complete_and_keeps_offices_together():
+    areas = {k: main.TARGET_AREAS[k] for k in list(main.TARGET_AREAS)[:12]}
+    shards = main.partition_areas(areas, 3)
+    assert shards == main.partition_areas(areas, 3)
+    assert sorted(k for s in shards for k in s) == sorted(areas)
+    for code, keys in main.group_areas_by(areas, "jma_code").items():
+        if len(keys) * main.area_cost(areas[keys[0]]) < sum(map(main.area_cost, areas.values())) / 3:
+            assert len({i for i, s in enumerate(shards) for k in keys if k in s}) == 1
+
+
+@pytest.mark.parametrize("text", ["1", "3/3", "-1/2", "1/0", "a/b"])
+def test_parse_shard_arg_rejects(text):
+    with pytest.raises(Exception):
+        main.parse_shard_arg(text)
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    out = tmp_path / "assets"
+    monkeypatch.setattr(main, "OUTPUT_PATH", str(out / "eagle_eye_data.json"))
+    monkeypatch.setattr(main, "OUTPUT_V2_PATH", str(out / "eagle_eye_data.v2.json"))
+    monkeypatch.setattr(main, "OUTPUT_SHARD_DIR", str(out / "areas"))
+    monkeypatch.setattr(main, "FINGERPRINT_PATH", str(out / "eagle_eye_data.fingerprints.json"))
+    return out
+
+
+def write_partial(path, index, count, area_keys, generated_at="2026-01-27T05:05:00+09:00", **overrides):
+    part = {
+        "schema_version": main.OUTPUT_SCHEMA_VERSION,
+        "kind": "partial",
+        "generated_at": generated_at,
+        "shard": {"index": index, "count": count, "areas": list(area_keys)},
+        "areas": {k: {"long_term_text": "", "days": [{"date": "01月27日 (火)", "rank": "A"}]} for k in area_keys},
+    }
+    part.update(overrides)
+    path.write_text(json.dumps(part, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def test_merge_partials_writes_outputs(tmp_path, output_dir):
+    paths = [write_partial(tmp_path / "p0.json", 0, 2, ["a"]), write_partial(tmp_path / "p1.json", 1, 2, ["b"])]
+    written, n_ok, missing = main.merge_partials(paths, areas={"a": {}, "b": {}})
+    assert n_ok == 2 and missing == []
+    assert sorted(json.load(open(main.OUTPUT_V2_PATH, encoding="utf-8"))["areas"]) == ["a", "b"]
+
+
+@pytest.mark.parametrize("make", [
+    lambda d: [write_partial(d / "p0.json", 0, 2, ["a"])],                                              # シャード不足
+    lambda d: [write_partial(d / "p0.json", 0, 2, ["a"]), write_partial(d / "p1.json", 0, 2, ["b"])],   # 番号の重複
+    lambda d: [write_partial(d / "p0.json", 0, 2, ["a"]), write_partial(d / "p1.json", 1, 3, ["b"])],   # シャード数違い
+    lambda d: [write_partial(d / "p0.json", 0, 2, ["a", "b"]), write_partial(d / "p1.json", 1, 2, ["b"])],  # エリアの重複
+    lambda d: [write_partial(d / "p0.json", 0, 1, ["a"])],                                              # 未割り当てのエリア
+    lambda d: [write_partial(d / "p0.json", 9, 4, ["a", "b"])],                                          # 番号が範囲外
+    lambda d: [write_partial(d / "p0.json", 0, 1, ["a", "b"], shard={"index": 0, "areas": ["a", "b"]})],  # シャード数なし
+    lambda d: [write_partial(d / "p0.json", 0, 2, ["a"]),
+               write_partial(d / "p1.json", 1, 2, ["b"], generated_at="2026-01-28T05:05:00+09:00")],  # 別の日
+    lambda d: [write_partial(d / "p0.json", 0, 1, ["a", "b"], areas={"a": {"days": []}, "c": {"days": []}})],  # 担当外
+    lambda d: [write_partial(d / "p0.json", 0, 1, ["a", "b"], areas={"a": {"days": "x"}})],              # 形式不正
+    lambda d: [],
+])
+def test_merge_partials_rejects_without_writing(tmp_path, output_dir, make):
+    paths = make(tmp_path)
+    with pytest.raises(ValueError):
+        main.merge_partials(paths, areas={"a": {}, "b": {}})
+    assert not output_dir.exists() or not any(output_dir.rglob("*.json"))
+
+
+def test_incremental_store_reuses_by_iso_date(tmp_path):
+    today = datetime.now(main.JST).date()
+    tomorrow = today + timedelta(days=1)
+    label = main.full_date_label(tomorrow)
+    key = tomorrow.strftime("%Y-%m-%d")
+    ai_day = {"date": label, "rank": "A", "daily_schedule_and_impact": "AIの日"}
+    v2 = {
+        "schema_version": main.OUTPUT_SCHEMA_VERSION,
+        "areas": {"a": main.normalize_area_days([ai_day, main.expand_long_term_day(label, "C", "長期")])},
+    }
+    v2_path = tmp_path / "eagle_eye_data.v2.json"
+    v2_path.write_text(json.dumps(v2, ensure_ascii=False), encoding="utf-8")
+    fp_path = tmp_path / "fingerprints.json"
+    fp_path.write_text(json.dumps({"version": 1, "areas": {"a": {key: "h1"}}}), encoding="utf-8")
+
+    store = main.IncrementalStore((str(v2_path), str(tmp_path / "missing.json")), str(fp_path))
+    assert store.reuse("a", key, "h2") is None
+    assert store.reuse("a", key, "h1") == ai_day
+    assert store.reused == 1 and store.missing == 0
+
+    # ハッシュは一致したのに前回出力に日が無い
+    fp_path.write_text(json.dumps({"version": 1, "areas": {"a": {"2000-01-01": "h1"}}}), encoding="utf-8")
+    store = main.IncrementalStore((str(v2_path),), str(fp_path))
+    assert store.reuse("a", "2000-01-01", "h1") is None
+    assert store.missing == 1
+
+
+def test_incremental_store_without_reuse_reads_nothing(tmp_path):
+    store = main.IncrementalStore((str(tmp_path / "nothing.json"),), str(tmp_path / "fp.json"), reuse=False)
+    assert store.reuse("a", "2026-01-27", "h1") is None
+    store.record("a", "2026-01-27", "h1")
+    store.save()
+    assert json.load(open(tmp_path / "fp.json", encoding="utf-8"))["areas"] == {"a": {"2026-01-27": "h1"}}
@@ -0,0 +1,132 @@
+"""
+JMA の AMeDAS 観測所表（amedastable.json）から catalog/stations.csv を作り直す
+
+    python tools/import_amedas_table.py
+    python tools/import_amedas_table.py --source amedastable.json   # 保存済みのファイルから
+
+気温を観測している観測所だけを使う。府県予報区（office）は観測所番号の先頭2桁（AMeDAS の府県番号）から
+AMEDAS_PREFIX_OFFICES で決める。表に無い番号は空のまま（AreaResolver は office が空の観測所を予報区の候補にしない）
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import urllib.request
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+
+import main  # noqa: E402
+
+SOURCE_URL = "https://www.jma.go.jp/bosai/amedas/const/amedastable.json"
+
+# AMeDAS の府県番号（観測所番号の先頭2桁）→ 府県予報区（forecast/data/forecast/<office>.json）
+AMEDAS_PREFIX_OFFICES = {
+    "11": "011000",                  # 宗谷
+    "12": "012000", "13": "012000",  # 上川・留萌
+    "14": "016000", "15": "016000", "16": "016000",  # 石狩・空知・後志
+    "17": "013000",                  # 網走・北見・紋別
+    "18": "014100", "19": "014100",  # 根室・釧路
+    "20": "014030",                  # 十勝
+    "21": "015000", "22": "015000",  # 胆振・日高
+    "23": "017000", "24": "017000",  # 渡島・檜山
+    "31": "020000",  # 青森
+    "32": "050000",  # 秋田
+    "33": "030000",  # 岩手
+    "34": "040000",  # 宮城
+    "35": "060000",  # 山形
+    "36": "070000",  # 福島
+    "40": "080000",  # 茨城
+    "41": "090000",  # 栃木
+    "42": "100000",  # 群馬
+    "43": "110000",  # 埼玉
+    "44": "130000",  # 東京（伊豆諸島・小笠原を含む）
+    "45": "120000",  # 千葉
+    "46": "140000",  # 神奈川
+    "48": "200000",  # 長野
+    "49": "190000",  # 山梨
+    "50": "220000",  # 静岡
+    "51": "230000",  # 愛知
+    "52": "210000",  # 岐阜
+    "53": "240000",  # 三重
+    "54": "150000",  # 新潟
+    "55": "160000",  # 富山
+    "56": "170000",  # 石川
+    "57": "180000",  # 福井
+    "60": "250000",  # 滋賀
+    "61": "260000",  # 京都
+    "62": "270000",  # 大阪
+    "63": "280000",  # 兵庫
+    "64": "290000",  # 奈良
+    "65": "300000",  # 和歌山
+    "66": "330000",  # 岡山
+    "67": "340000",  # 広島
+    "68": "320000",  # 島根
+    "69": "310000",  # 鳥取
+    "71": "360000",  # 徳島
+    "72": "370000",  # 香川
+    "73": "380000",  # 愛媛
+    "74": "390000",  # 高知
+    "81": "350000",  # 山口
+    "82": "400000",  # 福岡
+    "83": "440000",  # 大分
+    "84": "420000",  # 長崎
+    "85": "410000",  # 佐賀
+    "86": "430000",  # 熊本
+    "87": "450000",  # 宮崎
+    "88": "460100",  # 鹿児島（奄美は office_for_station で 460040）
+    "91": "471000",  # 沖縄本島
+    "92": "472000",  # 大東島
+    "93": "473000",  # 宮古島
+    "94": "474000",  # 八重山
+}
+AMAMI_OFFICE = "460040"
+AMAMI_MAX_LAT = 28.9   # 鹿児島県のうちこれより南（喜界島・奄美大島以南）は奄美地方
+
+
+def office_for_station(code, lat):
+    """観測所番号から府県予報区を決める。決められなければ空文字"""
+    office = AMEDAS_PREFIX_OFFICES.get(str(code)[:2], "")
+    if office == "460100" and lat < AMAMI_MAX_LAT:
+        return AMAMI_OFFICE
+    return office
+
+
+def load_source(source):
+    if source.startswith("http"):
+        with urllib.request.urlopen(source, timeout=30) as res:
+            return json.loads(res.read().decode("utf-8"))
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def degrees(v):
+    """[度, 分] → 10進の度"""
+    return round(v[0] + v[1] / 60, 4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="amedastable.json → catalog/stations.csv")
+    parser.add_argument("--source", default=SOURCE_URL)
+    parser.add_argument("--out", default=main.STATION_TABLE_PATH)
+    args = parser.parse_args()
+
+    stations = []
+    unknown = 0
+    for code, st in sorted(load_source(args.source).items()):
+        elems = st.get("elems") or ""
+        if not elems.startswith("1"):   # 先頭の桁が気温
+            continue
+        lat, lon = degrees(st["lat"]), degrees(st["lon"])
+        office = office_for_station(code, lat)
+        if not office:
+            unknown += 1
+        stations.append([code, office, lat, lon, st.get("kjName", "")])
+
+    with open(args.out, "w", encoding="utf-8", newline="") as f:
+        f.write(f"# AMeDAS 観測所 → 府県予報区（office）。{os.path.basename(args.source)} から tools/import_amedas_table.py で作成\n")
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["code", "office", "lat", "lon", "name"])
+        writer.writerows(stations)
+    print(f"OK {len(stations)} stations → {args.out}（office 不明 {unknown}）", flush=True)